@@ -0,0 +1,140 @@
+"""
+How many concurrent "Generate AI Response" requests one server process can hold
+
+Runs the app under the WSGI development server (`manage.py runserver`) and
+under a single uvicorn ASGI worker, points the Grok client at a mock LLM
+that answers after --latency seconds, and fires --concurrency requests at
+/generate-ai-reply/<id>/ at once. With the async view, the uvicorn worker
+keeps every request in flight on one event loop; under WSGI each waiting
+request occupies a thread.
+
+Usage:
+    python benchmarks/ai_concurrency.py --concurrency 200 --latency 2
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import (  # noqa: E402
+    free_port, process_status, setup_django, staff_session, start_server, summarize,
+)
+from benchmarks.mock_llm import start_in_thread  # noqa: E402
+
+SERVERS = {
+    'wsgi-runserver': lambda port: [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+    'asgi-uvicorn': lambda port: [
+        sys.executable, '-m', 'uvicorn', 'customer_support.asgi:application',
+        '--port', str(port), '--workers', '1', '--log-level', 'warning',
+        '--backlog', '4096',
+    ],
+}
+
+
+async def fire(url, concurrency, auth):
+    import httpx
+
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(cookies=auth['cookies'], headers=auth['headers'], limits=limits, timeout=300) as client:
+        async def one():
+            nonlocal errors
+            start = time.perf_counter()
+            try:
+                response = await client.post(url)
+                # A reply from the template fallback means the mock was never reached
+                if response.status_code != 200 or response.json().get('provider') != 'grok':
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    return latencies, errors, wall
+
+
+def run_server(name, ticket_id, auth, mock, args):
+    port = free_port()
+    env = {
+        'DJANGO_SETTINGS_MODULE': 'benchmarks.settings',
+        'GROK_API_KEY': 'benchmark',
+        'GROK_API_URL': f'http://127.0.0.1:{mock.port}',
+        # Grok only, with limits no run reaches, so every request waits on the mock
+        'AI_PROVIDER_CHAIN': 'grok',
+        'GROK_RPM': '1000000',
+        'GROK_TPM': '1000000000',
+        'AI_DRAFT_IN_PROCESS': 'False',
+    }
+    process = start_server(SERVERS[name](port), port, env)
+
+    peak = {'rss_mb': 0.0, 'threads': 0}
+    sampling = threading.Event()
+
+    def sample():
+        while not sampling.is_set():
+            status = process_status(process.pid)
+            peak['rss_mb'] = max(peak['rss_mb'], status['rss_mb'])
+            peak['threads'] = max(peak['threads'], status['threads'])
+            time.sleep(0.05)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    mock.reset_stats()
+    try:
+        # ?regenerate=1 skips the response cache so every request reaches the provider
+        url = f'http://127.0.0.1:{port}/generate-ai-reply/{ticket_id}/?regenerate=1'
+        latencies, errors, wall = asyncio.run(fire(url, args.concurrency, auth))
+    finally:
+        sampling.set()
+        sampler.join()
+        process.terminate()
+        process.wait()
+
+    return {
+        'server': name,
+        'requests': args.concurrency,
+        'errors': errors,
+        'wall_s': round(wall, 2),
+        'req_per_s': round(args.concurrency / wall, 1),
+        'peak_provider_in_flight': mock.peak_in_flight,
+        'peak_rss_mb': round(peak['rss_mb'], 1),
+        'peak_threads': peak['threads'],
+        **summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=200, help='Simultaneous AI requests')
+    parser.add_argument('--latency', type=float, default=2.0, help='Mock provider latency in seconds')
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from support.models import Ticket
+
+    auth = staff_session()
+    customer, _ = User.objects.get_or_create(username='bench-customer')
+    ticket = Ticket.objects.create(customer=customer, subject='Password reset', message='I forgot my password')
+
+    mock = start_in_thread(latency=args.latency)
+    results = [run_server(name, ticket.id, auth, mock, args) for name in args.servers]
+
+    columns = ['server', 'requests', 'errors', 'wall_s', 'req_per_s', 'p50_ms', 'p95_ms',
+               'peak_provider_in_flight', 'peak_threads', 'peak_rss_mb']
+    print(' | '.join(columns))
+    for result in results:
+        print(' | '.join(str(result[column]) for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Throughput of the ticket category classifier
+
+Trains support.classifier on synthetic tickets from a few categories,
+then times triage of held-out tickets one at a time, the way a ticket is
+classified when it is submitted: hashed n-gram features, one sparse
+matrix-vector product, softmax and the priority score. Reports accuracy,
+per-ticket latency percentiles and tickets per second.
+
+Usage:
+    python benchmarks/classify_throughput.py --tickets 20000 --categories 8
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import setup_django, summarize  # noqa: E402
+
+COMMON_WORDS = (
+    'hi hello please help my the a i have with an issue problem since yesterday thanks team '
+    'order account again still not working need urgent asap today week'
+).split()
+
+
+def synthetic_tickets(count, categories, rng):
+    """(subject, message, class index) tuples; each category has its own vocabulary plus shared words"""
+    vocabularies = [[f'topic{c}word{w}' for w in range(30)] for c in range(categories)]
+    tickets = []
+    for _ in range(count):
+        label = rng.randrange(categories)
+        words = rng.sample(vocabularies[label], 4) + rng.sample(COMMON_WORDS, 12)
+        # Some noise: a word from another category
+        words.append(rng.choice(vocabularies[rng.randrange(categories)]))
+        rng.shuffle(words)
+        tickets.append((' '.join(words[:4]), ' '.join(words * 2), label))
+    return tickets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=20000, help='Synthetic tickets generated')
+    parser.add_argument('--categories', type=int, default=8, help='Number of categories')
+    parser.add_argument('--dimensions', type=int, default=16384, help='Hash buckets')
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--holdout', type=float, default=0.2, help='Share of tickets classified for the timing')
+    args = parser.parse_args()
+
+    setup_django(migrate=False)
+    import numpy as np
+    from support.classifier import predict_proba, priority_score, train
+
+    rng = random.Random(0)
+    tickets = synthetic_tickets(args.tickets, args.categories, rng)
+    held_out = int(len(tickets) * args.holdout)
+    test, training = tickets[:held_out], tickets[held_out:]
+
+    start = time.perf_counter()
+    model = train(training, list(range(args.categories)), dimensions=args.dimensions, epochs=args.epochs)
+    train_seconds = time.perf_counter() - start
+
+    latencies = []
+    correct = 0
+    start = time.perf_counter()
+    for subject, message, label in test:
+        ticket_start = time.perf_counter()
+        probabilities = predict_proba(model, subject, message)
+        priority_score(subject, message)
+        latencies.append(time.perf_counter() - ticket_start)
+        correct += int(np.argmax(probabilities)) == label
+    wall = time.perf_counter() - start
+
+    model_kb = (model['weights'].nbytes + model['bias'].nbytes) / 1024
+    result = {
+        'train_tickets': len(training),
+        'train_s': round(train_seconds, 2),
+        'model_kb': round(model_kb),
+        'accuracy': round(correct / len(test), 3),
+        'tickets_per_s': round(len(test) / wall),
+        **summarize(latencies),
+    }
+    columns = list(result)
+    print(' | '.join(columns))
+    print(' | '.join(str(result[column]) for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Helpers shared by the benchmark scripts"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(migrate=True):
+    """Configure Django with the benchmark settings and an up-to-date benchmark database"""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    import django
+    django.setup()
+
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(latencies):
+    """p50/p95/p99/max of a list of latencies in seconds, reported in milliseconds"""
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0) * 1000, 2),
+    }
+
+
+def staff_session(username='bench-staff'):
+    """
+    Create (or reuse) a staff user and a logged-in session for HTTP clients
+
+    Returns:
+        dict: Cookies and headers that authenticate requests and pass CSRF checks
+    """
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.utils.crypto import get_random_string
+
+    user, _ = User.objects.get_or_create(username=username, defaults={'is_staff': True})
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+
+    csrf_secret = get_random_string(32)
+    return {
+        'cookies': {settings.SESSION_COOKIE_NAME: session.session_key, settings.CSRF_COOKIE_NAME: csrf_secret},
+        'headers': {'X-CSRFToken': csrf_secret, 'Referer': 'http://127.0.0.1/'},
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, env=None, timeout=30):
+    """Start an app server subprocess and wait until it accepts connections"""
+    process = subprocess.Popen(
+        command, cwd=BASE_DIR, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Server did not start: {' '.join(command)}")
+
+
+def process_status(pid):
+    """Resident memory (MB) and thread count of a process, from /proc on Linux"""
+    status = {'rss_mb': 0.0, 'threads': 0}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    status['rss_mb'] = int(line.split()[1]) / 1024
+                elif line.startswith('Threads:'):
+                    status['threads'] = int(line.split()[1])
+    except OSError:
+        pass
+    return status
@@ -0,0 +1,154 @@
+"""
+Mock LLM server standing in for the Groq (OpenAI-compatible) and Gemini APIs
+
+Responds after a configurable latency so benchmarks measure how the app
+behaves while waiting on a provider, without network access or API spend.
+
+Usage:
+    python benchmarks/mock_llm.py --port 8090 --latency 2.0
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+
+REPLY = "Thanks for reaching out! Please try resetting your password from the login page, and let us know if the problem continues."
+
+
+class MockLLMServer:
+    def __init__(self, latency=1.0, jitter=0.0, token_interval=0.02):
+        self.latency = latency
+        self.jitter = jitter
+        # Delay between streamed words; latency is the time to the first one
+        self.token_interval = token_interval
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def reset_stats(self):
+        self.requests = 0
+        self.peak_in_flight = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                self.requests += 1
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                try:
+                    await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+                finally:
+                    self.in_flight -= 1
+
+                path = path.split('?')[0]
+                if path.endswith(':streamGenerateContent') or b'"stream": true' in body:
+                    await self.stream(writer, path)
+                else:
+                    body = json.dumps(self.response_for(path)).encode()
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                        + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                        + body
+                    )
+                    await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def stream(self, writer, path):
+        """Send the reply word by word as chunked Server-Sent Events"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+        async def send(data):
+            frame = f"data: {data}\n\n".encode()
+            writer.write(f"{len(frame):x}\r\n".encode() + frame + b"\r\n")
+            await writer.drain()
+
+        for word in REPLY.split(' '):
+            text = word + ' '
+            if path.endswith(':streamGenerateContent'):
+                await send(json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]}))
+            else:
+                await send(json.dumps({'choices': [{'delta': {'content': text}}]}))
+            await asyncio.sleep(self.token_interval)
+        if not path.endswith(':streamGenerateContent'):
+            await send('[DONE]')
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def response_for(self, path):
+        if path.endswith(':generateContent'):
+            return {'candidates': [{'content': {'parts': [{'text': REPLY}]}}]}
+        if path.endswith('/models'):
+            return {'data': [{'id': 'mock-model'}]}
+        return {'choices': [{'message': {'role': 'assistant', 'content': REPLY}}]}
+
+    async def serve(self, host='127.0.0.1', port=0):
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+
+def start_in_thread(latency=1.0, jitter=0.0):
+    """
+    Run a mock server on an ephemeral port in a background thread
+
+    Returns:
+        MockLLMServer: The running server; its base URL is http://127.0.0.1:<port>
+    """
+    mock = MockLLMServer(latency, jitter)
+    started = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(mock.serve())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return mock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=1.0, help='Seconds before each response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds added to the latency')
+    args = parser.parse_args()
+
+    async def run():
+        mock = MockLLMServer(args.latency, args.jitter)
+        server = await mock.serve(args.host, args.port)
+        print(f"Mock LLM listening on http://{args.host}:{mock.port} (latency {args.latency}s)")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
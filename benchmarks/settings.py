@@ -0,0 +1,23 @@
+"""
+Settings for benchmark runs: the project settings with a separate database
+so benchmarks never touch db.sqlite3.
+"""
+
+from customer_support.settings import *  # noqa: F401,F403
+
+DATABASES['default']['NAME'] = os.getenv('BENCH_DB', str(BASE_DIR / 'benchmarks' / 'bench.sqlite3'))
+
+# Plain django.db.backends.sqlite3 with its defaults, for before/after comparisons
+if os.getenv('BENCH_SQLITE_DEFAULTS') == '1':
+    DATABASES['default'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': DATABASES['default']['NAME']}
+
+# Keep the file caches and indexes of the app out of it too: benchmark
+# ticket and customer ids overlap the real ones
+BENCH_CACHE_DIR = BASE_DIR / 'benchmarks' / '.cache'
+CACHES['fragments']['LOCATION'] = str(BENCH_CACHE_DIR / 'fragments')
+CACHES['ai_state']['LOCATION'] = str(BENCH_CACHE_DIR / 'ai_state')
+SIMILAR_TICKETS_INDEX_DIR = str(BENCH_CACHE_DIR / 'similar_tickets')
+TICKET_CLASSIFIER_PATH = str(BENCH_CACHE_DIR / 'ticket_classifier.npz')
+
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost', 'testserver']
+DEBUG = False
@@ -0,0 +1,206 @@
+"""
+Concurrent reply submissions to SQLite from several worker processes
+
+Starts --workers processes that each submit --replies replies, while
+--readers processes keep loading the admin dashboard queries. Each
+database configuration is run with each write path:
+
+    legacy   what the reply views did before support.services existed:
+             a full-row ticket.save() and Reply.objects.create() in
+             separate autocommit transactions
+    service  support.services.submit_reply: one transaction, an UPDATE
+             of status/updated_at only, and the form's idempotency key
+
+Database configurations are Django's default SQLite settings and the
+project settings (WAL, busy timeout, BEGIN IMMEDIATE, persistent
+connections). A --double-submit fraction of the submissions is sent twice
+with the same key, like a double-clicked Send button. Reports "database is
+locked" errors, duplicate replies, writes per second and write latency.
+
+Usage:
+    python benchmarks/sqlite_writes.py --workers 8 --replies 200 --readers 2
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import BASE_DIR, setup_django, summarize  # noqa: E402
+
+# BENCH_SQLITE_DEFAULTS switches benchmarks.settings to the stock SQLite backend
+CONFIGS = {
+    'django-default': {'BENCH_SQLITE_DEFAULTS': '1'},
+    'tuned': {'BENCH_SQLITE_DEFAULTS': '0'},
+}
+PATHS = ['legacy', 'service']
+
+
+def setup_database(args):
+    """Create a fresh database with a staff user and tickets to reply to"""
+    setup_django()
+    from django.contrib.auth.models import User
+    from support.models import Ticket
+
+    User.objects.create(username='bench-staff', is_staff=True)
+    customer = User.objects.create(username='bench-customer')
+    Ticket.objects.bulk_create([
+        Ticket(customer=customer, subject=f'SQLite write {i}', message='Concurrent write test')
+        for i in range(50)
+    ])
+
+
+def write_worker(args):
+    """Submit replies as fast as possible and print a JSON summary"""
+    setup_django(migrate=False)
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, close_old_connections
+    from support.models import Reply, Ticket
+    from support.services import submit_reply
+
+    def legacy(ticket_id, message, key):
+        ticket = Ticket.objects.get(id=ticket_id)
+        ticket.status = 'replied'
+        ticket.save()
+        Reply.objects.create(ticket=ticket, responder=staff, message=message)
+        return True
+
+    def service(ticket_id, message, key):
+        ticket = Ticket.objects.get(id=ticket_id)
+        return submit_reply(ticket, staff, message, idempotency_key=key)[1]
+
+    write = legacy if args.path == 'legacy' else service
+    rng = random.Random(args.worker)
+
+    staff = User.objects.get(username='bench-staff')
+    ticket_ids = list(Ticket.objects.filter(subject__startswith='SQLite write').values_list('id', flat=True))
+
+    while time.time() < args.start_at:
+        time.sleep(0.005)
+
+    latencies = []
+    errors = created = 0
+    for i in range(args.replies):
+        ticket_id = ticket_ids[(args.worker + i) % len(ticket_ids)]
+        key = uuid.uuid4()
+        for _ in range(2 if rng.random() < args.double_submit else 1):
+            start = time.perf_counter()
+            try:
+                created += write(ticket_id, f'Reply {i} from worker {args.worker}', key)
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+            # What the request/response cycle does between requests
+            close_old_connections()
+
+    print(json.dumps({'latencies': latencies, 'errors': errors, 'created': created}))
+
+
+def read_worker(args):
+    """Run the dashboard feed query until the writers are done"""
+    setup_django(migrate=False)
+    from django.db import OperationalError, close_old_connections
+    from django.http import QueryDict
+    from support.pagination import keyset_page
+    from support.views import admin_ticket_queryset
+
+    while time.time() < args.start_at:
+        time.sleep(0.005)
+
+    reads = errors = 0
+    while time.time() < args.stop_at:
+        try:
+            keyset_page(admin_ticket_queryset(QueryDict())[0], None, 25)
+            reads += 1
+        except OperationalError:
+            errors += 1
+        close_old_connections()
+    print(json.dumps({'reads': reads, 'errors': errors}))
+
+
+def run_config(config, write_path, args):
+    path = str(BASE_DIR / 'benchmarks' / f'sqlite_writes_{config}.sqlite3')
+    for suffix in ('', '-wal', '-shm'):
+        Path(path + suffix).unlink(missing_ok=True)
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'benchmarks.settings', 'BENCH_DB': path, **CONFIGS[config]}
+    subprocess.run([sys.executable, __file__, '--role', 'setup'], env=env, check=True)
+
+    start_at = time.time() + 2
+    common = [sys.executable, __file__, '--start-at', str(start_at)]
+    writers = [
+        subprocess.Popen(common + ['--role', 'writer', '--worker', str(i), '--replies', str(args.replies),
+                                   '--path', write_path, '--double-submit', str(args.double_submit)],
+                         stdout=subprocess.PIPE, text=True, env=env)
+        for i in range(args.workers)
+    ]
+    readers = [
+        subprocess.Popen(common + ['--role', 'reader', '--stop-at', str(start_at + 3600)],
+                         stdout=subprocess.PIPE, text=True, env=env)
+        for _ in range(args.readers)
+    ]
+
+    write_results = [json.loads(process.communicate()[0].strip().splitlines()[-1]) for process in writers]
+    wall = time.time() - start_at
+    for process in readers:
+        process.terminate()
+        process.wait()
+
+    latencies = [latency for result in write_results for latency in result['latencies']]
+    errors = sum(result['errors'] for result in write_results)
+    created = sum(result['created'] for result in write_results)
+    return {
+        'config': config,
+        'path': write_path,
+        'writes': len(latencies),
+        'locked_errors': errors,
+        # Replies created beyond one per distinct submission
+        'duplicates': max(0, created - args.workers * args.replies),
+        'wall_s': round(wall, 2),
+        'writes_per_s': round((len(latencies) - errors) / wall, 1),
+        **summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help='Writer processes')
+    parser.add_argument('--replies', type=int, default=200, help='Replies submitted per writer')
+    parser.add_argument('--readers', type=int, default=2, help='Processes reading the dashboard meanwhile')
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument('--paths', nargs='+', choices=PATHS, default=PATHS)
+    parser.add_argument('--double-submit', type=float, default=0.1,
+                        help='Fraction of submissions sent twice with the same idempotency key')
+    # Used when the script starts itself as a worker process
+    parser.add_argument('--role', choices=['setup', 'writer', 'reader'], help=argparse.SUPPRESS)
+    parser.add_argument('--worker', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--path', choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument('--start-at', type=float, help=argparse.SUPPRESS)
+    parser.add_argument('--stop-at', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == 'setup':
+        return setup_database(args)
+    if args.role == 'writer':
+        return write_worker(args)
+    if args.role == 'reader':
+        return read_worker(args)
+
+    results = [run_config(config, write_path, args) for config in args.configs for write_path in args.paths]
+
+    columns = ['config', 'path', 'writes', 'locked_errors', 'duplicates', 'wall_s', 'writes_per_s', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+    print(' | '.join(columns))
+    for result in results:
+        print(' | '.join(str(result[column]) for column in columns))
+
+
+if __name__ == '__main__':
+    main()
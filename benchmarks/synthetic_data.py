@@ -0,0 +1,166 @@
+"""
+Synthetic support data for the benchmark database
+
+Creates --customers customers, a few staff users, --tickets tickets spread
+over the customers and the last 180 days, and about --replies replies per
+answered ticket, with bulk_create in batches. Ticket counters, status
+totals and the search index are rebuilt at the end, the way import_sqlite
+leaves them. The same --seed always produces the same tickets (dated
+relative to now), so runs are comparable. Users are named bench-staff-N
+and bench-customer-N, with the password BENCH_PASSWORD.
+
+Usage:
+    python benchmarks/synthetic_data.py --customers 500 --tickets 20000 --replies 2 --reset
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import setup_django  # noqa: E402
+
+BENCH_PASSWORD = 'bench-password'
+STAFF_USERS = 5
+CATEGORIES = ['Technical', 'Billing', 'Account', 'Shipping', 'General']
+
+ISSUES = [
+    ('Cannot reset password', 'I never get the password reset email so I cannot log in to my account'),
+    ('Charged twice', 'My card was charged twice for order {order}, please refund the extra payment'),
+    ('Order not delivered', 'Order {order} was supposed to arrive last week and tracking has not moved'),
+    ('App crashes on start', 'The mobile app closes right after the splash screen since the last update'),
+    ('Change billing address', 'How do I change the billing address on my invoices?'),
+    ('Refund status', 'I returned order {order} two weeks ago and still have no refund'),
+    ('Account locked', 'My account got locked after too many login attempts, please unlock it'),
+    ('Wrong item received', 'I received a different item than the one I ordered in {order}'),
+]
+OPENERS = ['', 'Hi, ', 'Hello team, ', 'Urgent: ', 'Good morning, ']
+REPLIES = [
+    'Thanks for reaching out. We have looked into this and fixed it on our side.',
+    'Sorry for the trouble! Could you send us a screenshot of the error?',
+    'We have issued the refund; it should appear on your statement within 5 business days.',
+    'Your account is unlocked now. Please try logging in again.',
+]
+
+
+def generate(customers, tickets, replies, seed=0, batch_size=2000, log=print):
+    """
+    Add synthetic users, categories, tickets and replies to the configured database
+
+    Args:
+        customers (int): Customer accounts to create
+        tickets (int): Tickets to create
+        replies (float): Average replies per answered ticket
+        seed (int): Random seed
+        batch_size (int): Rows per bulk_create
+        log (callable): Progress output
+
+    Returns:
+        dict: Rows created per model
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from django.utils import timezone
+    from support.models import Category, Reply, Ticket
+    from support.search import rebuild_index, search_backend
+    from support.services import rebuild_status_counts, refresh_reply_summaries
+
+    rng = random.Random(seed)
+    # Hashing once: every user shares the password
+    password = make_password(BENCH_PASSWORD)
+
+    # Existing benchmark users are reused, so the generator can be run again to add tickets
+    staff_names = [f'bench-staff-{i}' for i in range(STAFF_USERS)]
+    customer_names = [f'bench-customer-{i}' for i in range(customers)]
+    User.objects.bulk_create(
+        [User(username=name, password=password, is_staff=True) for name in staff_names]
+        + [User(username=name, password=password) for name in customer_names],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+    staff_ids = list(User.objects.filter(username__in=staff_names).order_by('id').values_list('id', flat=True))
+    customer_ids = []
+    for start in range(0, customers, batch_size):
+        customer_ids += User.objects.filter(
+            username__in=customer_names[start:start + batch_size],
+        ).order_by('id').values_list('id', flat=True)
+    category_ids = [Category.objects.get_or_create(name=name)[0].id for name in CATEGORIES]
+
+    now = timezone.now()
+    ticket_count = reply_count = 0
+    first_id = None
+    for start in range(0, tickets, batch_size):
+        batch = []
+        for _ in range(min(batch_size, tickets - start)):
+            subject, message = rng.choice(ISSUES)
+            created_at = now - timedelta(seconds=rng.randint(0, 180 * 86400))
+            batch.append(Ticket(
+                customer_id=rng.choice(customer_ids),
+                subject=subject,
+                message=rng.choice(OPENERS) + message.format(order=rng.randint(10000, 99999)),
+                category_id=rng.choice(category_ids + [None]),
+                status=rng.choices(['pending', 'replied', 'closed'], weights=[4, 4, 2])[0],
+                priority=rng.randint(0, 100),
+                created_at=created_at,
+            ))
+        with transaction.atomic():
+            created = Ticket.objects.bulk_create(batch)
+            if not all(ticket.id for ticket in created):
+                # Backends that don't return ids from bulk inserts
+                created = list(Ticket.objects.order_by('-id')[:len(batch)])[::-1]
+
+            reply_batch = []
+            for ticket in created:
+                if ticket.status == 'pending':
+                    continue
+                for n in range(max(1, round(rng.expovariate(1 / replies)))):
+                    reply_batch.append(Reply(
+                        ticket_id=ticket.id,
+                        responder_id=rng.choice(staff_ids) if n % 2 == 0 else ticket.customer_id,
+                        message=rng.choice(REPLIES),
+                        created_at=ticket.created_at + timedelta(hours=n + 1),
+                    ))
+            Reply.objects.bulk_create(reply_batch, batch_size=batch_size)
+        ticket_count += len(created)
+        first_id = first_id or created[0].id
+        reply_count += len(reply_batch)
+        log(f"  {ticket_count}/{tickets} tickets, {reply_count} replies")
+
+    # bulk_create sends no signals
+    if first_id:
+        with transaction.atomic():
+            refresh_reply_summaries(Ticket.objects.filter(id__gte=first_id))
+    rebuild_status_counts()
+    if search_backend():
+        with transaction.atomic():
+            for _ in rebuild_index():
+                pass
+
+    return {'users': customers + STAFF_USERS, 'tickets': ticket_count, 'replies': reply_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=500)
+    parser.add_argument('--tickets', type=int, default=20000)
+    parser.add_argument('--replies', type=float, default=2.0, help='Average replies per answered ticket')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reset', action='store_true', help='Empty the benchmark database first')
+    args = parser.parse_args()
+
+    setup_django()
+    if args.reset:
+        from django.core.management import call_command
+        call_command('flush', interactive=False, verbosity=0)
+
+    start = time.perf_counter()
+    counts = generate(args.customers, args.tickets, args.replies, args.seed)
+    print(f"Created {counts} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Latency and query counts of the main support workflow, request by request
+
+Each iteration plays one customer and one agent through the app:
+
+    login               customer signs in (password check included)
+    customer_dashboard  customer's ticket list and form
+    submit_ticket       customer submits a new ticket
+    customer_ticket     customer opens it
+    admin_dashboard     agent loads the ticket feed
+    ticket_detail       agent opens the ticket
+    ai_reply            agent asks for an AI draft (mock LLM, --llm-latency)
+    reply               agent posts the reply from the ticket page
+
+Requests go through Django's test client in this process, against the
+benchmark database filled by benchmarks/synthetic_data.py (generated on
+the first run), so every run sees the same data and no network. Reports
+p50/p95/p99 latency, requests/s and queries per request for each step.
+--save writes the results as a JSON baseline; --compare checks a run
+against one and exits with status 1 if a step's median latency grew
+by more than --tolerance or it ran more queries than before.
+
+For concurrency see ai_concurrency.py and sqlite_writes.py.
+
+Usage:
+    python benchmarks/workflows.py --iterations 200 --save benchmarks/baselines/workflows.json
+    python benchmarks/workflows.py --iterations 200 --compare benchmarks/baselines/workflows.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import BASE_DIR, setup_django, summarize  # noqa: E402
+from benchmarks.mock_llm import start_in_thread  # noqa: E402
+from benchmarks.synthetic_data import BENCH_PASSWORD, ISSUES, OPENERS, REPLIES, generate  # noqa: E402
+
+STEPS = [
+    'login', 'customer_dashboard', 'submit_ticket', 'customer_ticket',
+    'admin_dashboard', 'ticket_detail', 'ai_reply', 'reply',
+]
+
+
+class Recorder:
+    """Times requests and counts their queries, per workflow step"""
+
+    def __init__(self):
+        self.steps = {name: {'latencies': [], 'queries': [], 'errors': 0} for name in STEPS}
+        self.enabled = True
+
+    def request(self, name, method, path, data=None, expect=(200,)):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = method(path, data or {})
+            elapsed = time.perf_counter() - start
+        ok = response.status_code in expect
+        if ok and response.get('Content-Type', '').startswith('application/json'):
+            ok = response.json().get('success', True)
+        if self.enabled:
+            step = self.steps[name]
+            step['latencies'].append(elapsed)
+            step['queries'].append(len(queries))
+            step['errors'] += not ok
+        return response
+
+    def results(self, wall):
+        steps = {}
+        for name, step in self.steps.items():
+            latencies, queries = step['latencies'], step['queries']
+            steps[name] = {
+                **summarize(latencies),
+                'errors': step['errors'],
+                'req_per_s': round(len(latencies) / sum(latencies), 1) if latencies else 0.0,
+                'queries_avg': round(sum(queries) / len(queries), 1) if queries else 0.0,
+                'queries_max': max(queries, default=0),
+            }
+        requests = sum(step['count'] for step in steps.values())
+        return {'steps': steps, 'requests': requests, 'wall_s': round(wall, 2), 'req_per_s': round(requests / wall, 1)}
+
+
+def workflow(recorder, customer_name, staff, rng):
+    """One customer submits a ticket and an agent answers it"""
+    from django.test import Client
+    from support.models import Ticket
+
+    customer = Client()
+    recorder.request('login', customer.post, '/login/',
+                     {'username': customer_name, 'password': BENCH_PASSWORD}, expect=(302,))
+    recorder.request('customer_dashboard', customer.get, '/')
+    subject, message = rng.choice(ISSUES)
+    recorder.request('submit_ticket', customer.post, '/', {
+        'subject': subject,
+        'message': rng.choice(OPENERS) + message.format(order=rng.randint(10000, 99999)),
+        'category': '',
+    }, expect=(302,))
+    ticket_id = Ticket.objects.filter(customer__username=customer_name).order_by('-id').values_list('id', flat=True)[0]
+    recorder.request('customer_ticket', customer.get, f'/customer-ticket/{ticket_id}/')
+
+    recorder.request('admin_dashboard', staff.get, '/admin-dashboard/')
+    recorder.request('ticket_detail', staff.get, f'/ticket/{ticket_id}/')
+    # regenerate=1 skips the reply cache, so every draft waits on the mock provider
+    recorder.request('ai_reply', staff.post, f'/generate-ai-reply/{ticket_id}/?regenerate=1')
+    recorder.request('reply', staff.post, f'/ticket/{ticket_id}/', {
+        'message': rng.choice(REPLIES), 'idempotency_key': str(uuid.uuid4()),
+    }, expect=(302,))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline, tolerance):
+    """
+    Print each step's latency and query count against a baseline
+
+    A step regresses when its median latency grew by more than tolerance
+    (p95 is shown, but over a few hundred requests it is too noisy to
+    gate on) or when a request ran more queries than any in the baseline.
+
+    Returns:
+        list: Names of the steps that regressed
+    """
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('created_at', '')}):")
+    print('step | p50_ms before | p50_ms now | change | p95_ms before | p95_ms now | '
+          'queries_max before | queries_max now | status')
+    for name in STEPS:
+        before, now = baseline['steps'].get(name), result['steps'][name]
+        if not before:
+            continue
+        change = (now['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0.0
+        slower = change > tolerance
+        more_queries = now['queries_max'] > before['queries_max']
+        status = 'REGRESSION' if slower or more_queries else 'ok'
+        if status != 'ok':
+            regressions.append(name)
+        print(f"{name} | {before['p50_ms']} | {now['p50_ms']} | {change:+.0%} | {before['p95_ms']} | {now['p95_ms']} | "
+              f"{before['queries_max']} | {now['queries_max']} | {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100, help='Workflows measured')
+    parser.add_argument('--warmup', type=int, default=5, help='Workflows run first and not measured')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Mock provider latency in seconds')
+    parser.add_argument('--llm-jitter', type=float, default=0.0, help='Random +/- seconds added to the latency')
+    parser.add_argument('--customers', type=int, default=500, help='Customers generated for an empty database')
+    parser.add_argument('--tickets', type=int, default=20000, help='Tickets generated for an empty database')
+    parser.add_argument('--replies', type=float, default=2.0, help='Replies per answered ticket when generating')
+    parser.add_argument('--reset', action='store_true', help='Regenerate the benchmark data first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='PATH', help='Write the results to this JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='Baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed median slowdown per step with --compare (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    # The provider client reads its URL from the settings, so the mock must
+    # be running before Django is set up
+    mock = start_in_thread(latency=args.llm_latency, jitter=args.llm_jitter)
+    os.environ.update({
+        'GROK_API_KEY': 'benchmark',
+        'GROK_API_URL': f'http://127.0.0.1:{mock.port}',
+        'AI_PROVIDER_CHAIN': 'grok,template',
+        'GROK_RPM': '1000000',
+        'GROK_TPM': '1000000000',
+        # Drafts are queued but not generated in the background, so they don't compete for the CPU
+        'AI_DRAFT_IN_PROCESS': 'False',
+    })
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from support.models import Reply, Ticket
+
+    if args.reset:
+        call_command('flush', interactive=False, verbosity=0)
+    if not User.objects.filter(username='bench-customer-0').exists():
+        print(f"Generating {args.customers} customers and {args.tickets} tickets...")
+        generate(args.customers, args.tickets, args.replies, args.seed, log=lambda line: None)
+
+    customers = list(User.objects.filter(username__startswith='bench-customer-').values_list('username', flat=True))
+    data = {'tickets': Ticket.objects.count(), 'replies': Reply.objects.count(), 'customers': len(customers)}
+    print(f"Data: {data['tickets']} tickets, {data['replies']} replies, {data['customers']} customers")
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    staff = Client()
+    staff.post('/login/', {'username': 'bench-staff-0', 'password': BENCH_PASSWORD})
+
+    recorder.enabled = False
+    for _ in range(args.warmup):
+        workflow(recorder, rng.choice(customers), staff, rng)
+    recorder.enabled = True
+
+    mock.reset_stats()
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        workflow(recorder, rng.choice(customers), staff, rng)
+    result = recorder.results(time.perf_counter() - start)
+
+    columns = ['step', 'count', 'errors', 'req_per_s', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_avg', 'queries_max']
+    print(' | '.join(columns))
+    for name in STEPS:
+        print(' | '.join(str(value) for value in [name] + [result['steps'][name][column] for column in columns[1:]]))
+    print(f"{result['requests']} requests in {result['wall_s']}s ({result['req_per_s']} req/s, "
+          f"{args.iterations / result['wall_s']:.1f} workflows/s; {mock.requests} provider calls)")
+
+    result.update({
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'data': data,
+        'options': {
+            'iterations': args.iterations, 'warmup': args.warmup,
+            'llm_latency': args.llm_latency, 'llm_jitter': args.llm_jitter, 'seed': args.seed,
+        },
+    })
+    if args.save:
+        path = Path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(result, indent=2) + '\n')
+        print(f"Saved the results to {path}")
+    if args.compare:
+        regressions = compare(result, json.loads(Path(args.compare).read_text()), args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend for several worker processes sharing one database file
+
+    Two extra OPTIONS are understood:
+
+    pragmas: PRAGMA statements run on every new connection, e.g. WAL mode
+    and a busy timeout so that writers wait for each other instead of
+    failing with "database is locked".
+
+    transaction_mode: 'IMMEDIATE' starts atomic blocks with BEGIN IMMEDIATE.
+    A plain BEGIN only takes the write lock at the first write, and a
+    transaction that has already read cannot wait for it: SQLite fails it
+    at once regardless of the busy timeout.
+    """
+
+    pragmas = {}
+    transaction_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Category, Ticket, Reply
+from django.db.models import Q
+from django.utils import timezone
+from .models import Category, Ticket, Reply, AIDraft, ArchivedTicket, TicketStatusCount
+from .search import search_backend, search_ticket_ids
+from .services import reply_summary_expressions
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -8,10 +12,21 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
-    list_display = ['subject', 'customer', 'category', 'status', 'created_at']
-    list_filter = ['status', 'category', 'created_at']
+    list_display = ['subject', 'customer', 'category', 'status', 'priority', 'reply_count', 'last_reply_at', 'created_at']
+    list_filter = ['status', 'category', 'auto_categorized', 'created_at']
     search_fields = ['subject', 'message', 'customer__username']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'reply_count', 'last_reply_at', 'last_responder']
+    raw_id_fields = ['duplicate_of']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Subject and message go through the full-text index instead of
+        # LIKE '%term%' scans; usernames are still matched directly
+        if not search_term or search_backend() is None:
+            return super().get_search_results(request, queryset, search_term)
+        ticket_ids = search_ticket_ids(search_term)
+        return queryset.filter(
+            Q(id__in=ticket_ids) | Q(customer__username__icontains=search_term)
+        ), False
 
 @admin.register(Reply)
 class ReplyAdmin(admin.ModelAdmin):
@@ -19,3 +34,38 @@ class ReplyAdmin(admin.ModelAdmin):
     list_filter = ['is_ai_generated', 'created_at']
     search_fields = ['message', 'ticket__subject', 'responder__username']
     readonly_fields = ['created_at']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Replies added or edited here skip submit_reply, so recompute the
+        # ticket's summary and touch updated_at for the ticket page ETag
+        Ticket.objects.filter(pk=obj.ticket_id).update(updated_at=timezone.now(), **reply_summary_expressions())
+
+@admin.register(ArchivedTicket)
+class ArchivedTicketAdmin(admin.ModelAdmin):
+    list_display = ['id', 'subject', 'customer', 'category', 'reply_count', 'created_at', 'archived_at']
+    list_filter = ['category', 'archived_at']
+    search_fields = ['subject', 'customer__username']
+    # Written only by archive_closed_tickets
+    readonly_fields = [field.name for field in ArchivedTicket._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(AIDraft)
+class AIDraftAdmin(admin.ModelAdmin):
+    list_display = ['ticket', 'provider', 'status', 'created_at', 'updated_at']
+    list_filter = ['status', 'provider']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(TicketStatusCount)
+class TicketStatusCountAdmin(admin.ModelAdmin):
+    list_display = ['status', 'count']
+    # Maintained by signals and repair_ticket_counters
+    readonly_fields = ['status', 'count']
+
+    def has_add_permission(self, request):
+        return False
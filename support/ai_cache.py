@@ -0,0 +1,148 @@
+import hashlib
+import json
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+CACHE_ALIAS = 'ai_responses'
+STATS_KEY = 'ai-response-cache:stats:{}'
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace so trivially different tickets share a key"""
+    return re.sub(r'\s+', ' ', (text or '')).strip().lower()
+
+def response_cache_key(provider, model, subject, message, prompt_version=1):
+    """
+    Build a content-addressed cache key for an AI response
+
+    Args:
+        provider (str): Provider name, e.g. 'grok' or 'gemini'
+        model (str): Model name sent to the provider
+        subject (str): Ticket subject
+        message (str): Customer message
+        prompt_version (int): Version of the provider's prompt template
+
+    Returns:
+        str: Cache key derived from a SHA-256 of the normalized inputs
+    """
+    content = json.dumps([
+        prompt_version, provider, model, normalize_text(subject), normalize_text(message)
+    ])
+    return 'ai-response:' + hashlib.sha256(content.encode()).hexdigest()
+
+def cached_response(provider, model, subject, message, generate, prompt_version=1, bypass=False):
+    """
+    Return a cached AI response, calling generate() on a miss
+
+    Only successful responses are stored: if generate() raises, the
+    exception propagates and nothing is cached.
+
+    Args:
+        provider (str): Provider name, e.g. 'grok' or 'gemini'
+        model (str): Model name sent to the provider
+        subject (str): Ticket subject
+        message (str): Customer message
+        generate (callable): Produces the response on a miss
+        prompt_version (int): Version of the provider's prompt template
+        bypass (bool): Skip the lookup and store a fresh response ("regenerate")
+
+    Returns:
+        str: AI-generated response
+    """
+    cache = caches[CACHE_ALIAS]
+    key = response_cache_key(provider, model, subject, message, prompt_version)
+
+    if not bypass:
+        entry = cache.get(key)
+        if entry is not None:
+            _record('hits')
+            _record('saved_ms', int(entry['latency'] * 1000))
+            return entry['response']
+
+    _record('bypasses' if bypass else 'misses')
+    start_time = time.time()
+    response = generate()
+    cache.set(key, {'response': response, 'latency': time.time() - start_time})
+    return response
+
+async def acached_response(provider, model, subject, message, agenerate, prompt_version=1, bypass=False):
+    """
+    Async variant of cached_response for async views
+
+    Args:
+        agenerate (callable): Returns an awaitable producing the response on a miss
+
+    Returns:
+        str: AI-generated response
+    """
+    if not bypass:
+        response = await aget_cached_response(provider, model, subject, message, prompt_version)
+        if response is not None:
+            return response
+
+    await arecord_miss(bypass)
+    start_time = time.time()
+    response = await agenerate()
+    await aset_cached_response(provider, model, subject, message, response, time.time() - start_time, prompt_version)
+    return response
+
+async def aget_cached_response(provider, model, subject, message, prompt_version=1):
+    """
+    Look up a cached response, counting a hit when one is found
+
+    Returns:
+        str: The cached response, or None on a miss (not counted; the
+        caller records the miss when it generates a response)
+    """
+    entry = await caches[CACHE_ALIAS].aget(response_cache_key(provider, model, subject, message, prompt_version))
+    if entry is None:
+        return None
+    await sync_to_async(_record)('hits')
+    await sync_to_async(_record)('saved_ms', int(entry['latency'] * 1000))
+    return entry['response']
+
+async def aset_cached_response(provider, model, subject, message, response, latency, prompt_version=1):
+    """Store a response generated outside acached_response, e.g. assembled from a stream"""
+    await caches[CACHE_ALIAS].aset(
+        response_cache_key(provider, model, subject, message, prompt_version),
+        {'response': response, 'latency': latency},
+    )
+
+async def arecord_miss(bypass=False):
+    await sync_to_async(_record)('bypasses' if bypass else 'misses')
+
+def cache_stats():
+    """
+    Return hit/miss counters for the AI response cache
+
+    Returns:
+        dict: hits, misses, bypasses, hit_ratio and seconds of provider
+        latency saved by hits
+    """
+    cache = caches[CACHE_ALIAS]
+    counters = cache.get_many([STATS_KEY.format(name) for name in ('hits', 'misses', 'bypasses', 'saved_ms')])
+    hits = counters.get(STATS_KEY.format('hits'), 0)
+    misses = counters.get(STATS_KEY.format('misses'), 0)
+    bypasses = counters.get(STATS_KEY.format('bypasses'), 0)
+    lookups = hits + misses
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'bypasses': bypasses,
+        'hit_ratio': hits / lookups if lookups else 0.0,
+        'saved_seconds': counters.get(STATS_KEY.format('saved_ms'), 0) / 1000,
+    }
+
+def _record(name, amount=1):
+    cache = caches[CACHE_ALIAS]
+    key = STATS_KEY.format(name)
+    # Counters never expire; add() is a no-op if the counter already exists
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, amount, timeout=None)
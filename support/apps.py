@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class SupportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'support'
+
+    def ready(self):
+        # Keep the full-text search index in sync with tickets and replies
+        from . import signals  # noqa: F401
+
+        # Build the pooled AI provider client once per process
+        from .grok_integration import init_grok_client
+        init_grok_client()
@@ -0,0 +1,92 @@
+"""
+Retention: closed tickets that haven't changed for TICKET_ARCHIVE_AFTER_DAYS
+move, with their replies, from Ticket and Reply into ArchivedTicket and
+ArchivedReply, so the dashboard tables and their indexes only hold the
+tickets still being worked on.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard_cache import invalidate_customer
+from .models import AIDraft, ArchivedReply, ArchivedTicket, Reply, Ticket, TicketLSHBucket
+from .search import remove_tickets
+from .services import move_status_count
+
+def archive_cutoff(days=None):
+    """Closed tickets last updated before this are archived"""
+    if days is None:
+        days = getattr(settings, 'TICKET_ARCHIVE_AFTER_DAYS', 90)
+    return timezone.now() - timedelta(days=days)
+
+def archivable_tickets(cutoff):
+    return Ticket.objects.filter(status='closed', updated_at__lt=cutoff)
+
+def archive_batch(cutoff, batch_size=500):
+    """
+    Move up to batch_size archivable tickets and their replies in one transaction
+
+    Either the whole batch is copied and deleted or nothing is, so an
+    interrupted run leaves every ticket in exactly one place and the next
+    run picks up where it stopped.
+
+    Args:
+        cutoff (datetime): Archive closed tickets last updated before this
+        batch_size (int): Tickets moved per transaction
+
+    Returns:
+        tuple: (tickets moved, replies moved)
+    """
+    with transaction.atomic():
+        tickets = list(
+            archivable_tickets(cutoff).select_for_update().order_by('id')
+            .only(
+                'id', 'customer_id', 'subject', 'message', 'category_id', 'status', 'priority',
+                'duplicate_of_id', 'created_at', 'updated_at', 'reply_count', 'last_reply_at',
+            )[:batch_size]
+        )
+        if not tickets:
+            return 0, 0
+        ticket_ids = [ticket.id for ticket in tickets]
+
+        ArchivedTicket.objects.bulk_create([
+            ArchivedTicket(
+                id=ticket.id, customer_id=ticket.customer_id, subject=ticket.subject, message=ticket.message,
+                category_id=ticket.category_id, status=ticket.status, priority=ticket.priority,
+                duplicate_of_id=ticket.duplicate_of_id, created_at=ticket.created_at,
+                updated_at=ticket.updated_at, reply_count=ticket.reply_count, last_reply_at=ticket.last_reply_at,
+            )
+            for ticket in tickets
+        ])
+        replies = [
+            ArchivedReply(
+                id=reply.id, ticket_id=reply.ticket_id, responder_id=reply.responder_id, message=reply.message,
+                is_ai_generated=reply.is_ai_generated, is_modified=reply.is_modified, created_at=reply.created_at,
+            )
+            for reply in Reply.objects.filter(ticket_id__in=ticket_ids).order_by('id')
+        ]
+        ArchivedReply.objects.bulk_create(replies)
+
+        # Deleted without signals: a regular delete re-indexes and re-counts
+        # the ticket for every reply it removes, holding the write lock for
+        # thousands of queries. The search index, status counts and cached
+        # dashboards are updated once for the batch instead.
+        for queryset in (
+            Reply.objects.filter(ticket_id__in=ticket_ids),
+            AIDraft.objects.filter(ticket_id__in=ticket_ids),
+            TicketLSHBucket.objects.filter(ticket_id__in=ticket_ids),
+        ):
+            queryset._raw_delete(queryset.db)
+        # duplicate_of is SET_NULL; archived tickets keep theirs in ArchivedTicket
+        Ticket.objects.filter(duplicate_of_id__in=ticket_ids).update(duplicate_of=None)
+        tickets_queryset = Ticket.objects.filter(id__in=ticket_ids)
+        tickets_queryset._raw_delete(tickets_queryset.db)
+
+        remove_tickets(ticket_ids)
+        move_status_count('closed', None, len(tickets))
+        for customer_id in {ticket.customer_id for ticket in tickets}:
+            invalidate_customer(customer_id)
+    return len(tickets), len(replies)
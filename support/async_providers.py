@@ -0,0 +1,286 @@
+import asyncio
+import json
+import random
+import weakref
+
+import httpx
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .ai_cache import acached_response
+from .gemini_integration import PROMPT_VERSION as GEMINI_PROMPT_VERSION
+from .gemini_integration import build_gemini_prompt, get_gemini_model
+from .grok_integration import PROMPT_VERSION as GROK_PROMPT_VERSION
+from .grok_integration import GROK_MODEL, RETRY_STATUS_CODES, build_grok_payload, clip_response
+
+# One pooled client per event loop, with the task that closes it: uvicorn
+# runs a single long-lived loop, while async views under WSGI get a fresh
+# loop per request
+_clients = weakref.WeakKeyDictionary()
+
+async def _close_with_loop(client):
+    """Wait until the loop shuts down, then close the client and its connections"""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.create_future()
+    finally:
+        # The task refers to the loop, so the weak key alone would never let go of it
+        _clients.pop(loop, None)
+        await client.aclose()
+
+def get_async_client():
+    """
+    Return the pooled httpx.AsyncClient for the running event loop
+
+    The client is closed when its loop finishes: asyncio.run(), which both
+    uvicorn and async_to_sync use, cancels the remaining tasks before
+    closing the loop, so the per-request loops of async views under WSGI
+    don't leave their connections open.
+
+    Returns:
+        httpx.AsyncClient: Client with keep-alive connections shared by all provider calls
+    """
+    loop = asyncio.get_running_loop()
+    client, _ = _clients.get(loop, (None, None))
+    if client is None:
+        pool_size = getattr(settings, 'GROK_POOL_SIZE', 10)
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                getattr(settings, 'GROK_READ_TIMEOUT', 30),
+                connect=getattr(settings, 'GROK_CONNECT_TIMEOUT', 3.05),
+            ),
+            # Retries refused/failed connections; status retries are handled below.
+            # Limits go on the transport: the client ignores them once one is given.
+            transport=httpx.AsyncHTTPTransport(
+                retries=getattr(settings, 'GROK_MAX_RETRIES', 3),
+                limits=httpx.Limits(
+                    max_connections=getattr(settings, 'AI_ASYNC_MAX_CONNECTIONS', 500),
+                    max_keepalive_connections=pool_size,
+                ),
+            ),
+        )
+        # The entry holds the task, since the loop only keeps a weak reference to it
+        _clients[loop] = (client, loop.create_task(_close_with_loop(client)))
+    return client
+
+async def _post_json(url, payload, headers=None, params=None):
+    """
+    POST JSON and return the decoded response, retrying 429/5xx with jittered backoff
+
+    Raises:
+        httpx.HTTPError: If the request fails or the final response is an error
+    """
+    client = get_async_client()
+    max_retries = getattr(settings, 'GROK_MAX_RETRIES', 3)
+
+    for attempt in range(max_retries + 1):
+        response = await client.post(url, json=payload, headers=headers, params=params)
+        if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+            break
+        retry_after = response.headers.get('Retry-After', '')
+        delay = float(retry_after) if retry_after.isdigit() else 0.5 * 2 ** attempt
+        await asyncio.sleep(delay + random.uniform(0, 0.5))
+
+    response.raise_for_status()
+    return response.json()
+
+async def arequest_grok_completion(subject, message):
+    """
+    Generate an AI response with the Grok API without blocking the event loop
+
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+
+    Returns:
+        str: AI-generated response
+
+    Raises:
+        ImproperlyConfigured: If GROK_API_KEY is not set
+        httpx.HTTPError: If the API request fails
+    """
+    api_key = getattr(settings, 'GROK_API_KEY', None)
+    if not api_key:
+        raise ImproperlyConfigured("Grok API key not configured. Please set GROK_API_KEY in environment variables.")
+
+    result = await _post_json(
+        f"{settings.GROK_API_URL.rstrip('/')}/chat/completions",
+        build_grok_payload(subject, message),
+        headers={"Authorization": f"Bearer {api_key}"},
+    )
+    return clip_response(result['choices'][0]['message']['content'])
+
+def _gemini_headers():
+    """
+    Authentication header for the Gemini REST API
+
+    The key goes in a header rather than the ?key= parameter, so it never
+    ends up in the URL that httpx errors (and the logs they reach) include.
+
+    Raises:
+        ImproperlyConfigured: If GEMINI_API_KEY is not set
+    """
+    api_key = getattr(settings, 'GEMINI_API_KEY', None)
+    if not api_key:
+        raise ImproperlyConfigured("Gemini API key not configured. Please set GEMINI_API_KEY in environment variables.")
+    return {"x-goog-api-key": api_key}
+
+async def arequest_gemini_completion(subject, message, model_type='flash'):
+    """
+    Generate an AI response with the Gemini REST API without blocking the event loop
+
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+        model_type (str): 'pro' for Gemini 1.5 Pro, 'flash' for Gemini 1.5 Flash
+
+    Returns:
+        str: AI-generated response
+
+    Raises:
+        ImproperlyConfigured: If GEMINI_API_KEY is not set
+        httpx.HTTPError: If the API request fails
+    """
+    headers = _gemini_headers()
+    model_name, char_limit = get_gemini_model(model_type)
+    result = await _post_json(
+        f"{settings.GEMINI_API_URL.rstrip('/')}/models/{model_name}:generateContent",
+        {"contents": [{"parts": [{"text": build_gemini_prompt(subject, message, char_limit)}]}]},
+        headers=headers,
+    )
+    parts = result['candidates'][0]['content']['parts']
+    return ''.join(part.get('text', '') for part in parts)
+
+async def agenerate_grok_response(subject, message, regenerate=False):
+    """
+    Async counterpart of generate_grok_response
+
+    Returns:
+        str: AI-generated response or error message
+    """
+    try:
+        return await acached_response(
+            'grok', GROK_MODEL, subject, message,
+            lambda: arequest_grok_completion(subject, message),
+            prompt_version=GROK_PROMPT_VERSION,
+            bypass=regenerate,
+        )
+
+    except ImproperlyConfigured as e:
+        return str(e)
+
+    except httpx.HTTPStatusError as e:
+        print(f"Grok API Request Error: {e}")
+        try:
+            error_data = e.response.json()
+            return f"API Error: {error_data.get('error', {}).get('message', str(e))}"
+        except ValueError:
+            return f"API Error: {e.response.text}"
+
+    except httpx.HTTPError as e:
+        print(f"Grok API Request Error: {e}")
+        return "Network error occurred while connecting to Grok API."
+
+    except Exception as e:
+        print(f"Grok Integration Error: {e}")
+        return "An unexpected error occurred while generating the AI response."
+
+async def agenerate_ai_response(subject, message, model_type='flash', regenerate=False):
+    """
+    Async counterpart of gemini_integration.generate_ai_response
+
+    Returns:
+        str: AI-generated response or error message
+    """
+    model_name, _ = get_gemini_model(model_type)
+    try:
+        return await acached_response(
+            'gemini', model_name, subject, message,
+            lambda: arequest_gemini_completion(subject, message, model_type),
+            prompt_version=GEMINI_PROMPT_VERSION,
+            bypass=regenerate,
+        )
+
+    except ImproperlyConfigured as e:
+        return str(e)
+
+    except Exception as e:
+        print(f"Gemini API Error ({model_type}): {e}")
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+            return "The AI response generation limit has been exceeded. Please try again later or check your API usage."
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404:
+            if model_type != 'flash':
+                return await agenerate_ai_response(subject, message, 'flash', regenerate)
+            return "The AI model is currently unavailable. Please try again later."
+        return "An error occurred while generating the AI response. Please try again."
+
+async def _stream_sse_json(url, payload, headers=None, params=None):
+    """
+    POST a streaming request and yield each JSON object from its "data:" lines
+
+    Both Groq (OpenAI-compatible stream=True) and Gemini (alt=sse) stream
+    Server-Sent Events whose data lines are JSON, ending with [DONE] for Groq.
+    """
+    client = get_async_client()
+    async with client.stream('POST', url, json=payload, headers=headers, params=params) as response:
+        if response.is_error:
+            await response.aread()
+            response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            if data:
+                yield json.loads(data)
+
+async def astream_grok_completion(subject, message):
+    """Yield text chunks of a Grok completion as the model produces them"""
+    api_key = getattr(settings, 'GROK_API_KEY', None)
+    if not api_key:
+        raise ImproperlyConfigured("Grok API key not configured. Please set GROK_API_KEY in environment variables.")
+
+    chunks = _stream_sse_json(
+        f"{settings.GROK_API_URL.rstrip('/')}/chat/completions",
+        {**build_grok_payload(subject, message), "stream": True},
+        headers={"Authorization": f"Bearer {api_key}"},
+    )
+    async for chunk in chunks:
+        for choice in chunk.get('choices', []):
+            text = choice.get('delta', {}).get('content')
+            if text:
+                yield text
+
+async def astream_gemini_completion(subject, message, model_type='flash'):
+    """Yield text chunks of a Gemini completion as the model produces them"""
+    headers = _gemini_headers()
+    model_name, char_limit = get_gemini_model(model_type)
+    chunks = _stream_sse_json(
+        f"{settings.GEMINI_API_URL.rstrip('/')}/models/{model_name}:streamGenerateContent",
+        {"contents": [{"parts": [{"text": build_gemini_prompt(subject, message, char_limit)}]}]},
+        headers=headers,
+        params={"alt": "sse"},
+    )
+    async for chunk in chunks:
+        for candidate in chunk.get('candidates', []):
+            for part in candidate.get('content', {}).get('parts', []):
+                if part.get('text'):
+                    yield part['text']
+
+async def aclip_stream(chunks, char_limit=None):
+    """
+    Pass streamed text through, stopping at a character limit like clip_response
+
+    Args:
+        chunks: Async iterator of text chunks
+        char_limit (int): Maximum response length, or None for no limit
+    """
+    length = 0
+    async for text in chunks:
+        if char_limit and length + len(text) > char_limit:
+            # Same cut as clip_response: 247 characters and an ellipsis
+            yield text[:max(0, char_limit - 8 - length)] + "..."
+            break
+        length += len(text)
+        yield text
@@ -0,0 +1,183 @@
+"""
+Ticket category classifier: hashed word n-grams and a softmax linear model,
+stored as a small NumPy .npz file and applied in-process when a ticket is
+submitted. `manage.py train_ticket_classifier` trains it from tickets whose
+category was chosen by a person.
+"""
+
+import threading
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .text_features import hashed_counts, ticket_text, tokenize, word_ngrams
+
+# Words that make a ticket more urgent, with their weight in the priority score
+URGENCY_TERMS = {
+    'urgent': 1.0, 'urgently': 1.0, 'asap': 1.0, 'immediately': 0.8, 'emergency': 1.0,
+    'charged twice': 1.0, 'double charged': 1.0, 'fraud': 1.2, 'unauthorized': 1.0,
+    'cannot log': 0.6, 'locked out': 0.8, 'not working': 0.5, 'down': 0.4, 'broken': 0.5,
+    'refund': 0.4, 'complaint': 0.5, 'cancel': 0.4, 'lawyer': 1.0, 'legal': 0.8,
+    'still': 0.3, 'again': 0.3, 'days': 0.2, 'weeks': 0.3,
+}
+
+_model = None
+_model_lock = threading.Lock()
+
+def model_path():
+    return Path(getattr(settings, 'TICKET_CLASSIFIER_PATH', Path(settings.BASE_DIR) / '.cache' / 'ticket_classifier.npz'))
+
+def ticket_features(subject, message, dimensions):
+    """
+    Sparse hashed features of a ticket: bucket indices and L2-normalized values
+
+    Returns:
+        tuple: (bucket indices, values) as NumPy arrays
+    """
+    tokens = tokenize(ticket_text(subject, message))
+    buckets, signs, counts = hashed_counts(word_ngrams(tokens, 2), dimensions)
+    values = signs * (1 + np.log(counts))
+    norm = np.linalg.norm(values)
+    return buckets, (values / norm if norm else values)
+
+def priority_score(subject, message):
+    """
+    Urgency of a ticket from 0 to 100, from the words it uses
+
+    Returns:
+        int: Priority score; higher is more urgent
+    """
+    tokens = tokenize(ticket_text(subject, message))
+    terms = set(word_ngrams(tokens, 2))
+    weight = sum(value for term, value in URGENCY_TERMS.items() if term in terms)
+    # Exclamation marks and shouting count a little too
+    text = ticket_text(subject, message)
+    weight += 0.2 * min(text.count('!'), 3)
+    if subject and len(subject) > 3 and subject.isupper():
+        weight += 0.5
+    return int(round(100 * (1 - np.exp(-weight))))
+
+def train(examples, classes, dimensions=16384, epochs=10, learning_rate=0.5, l2=1e-5, batch_size=256, seed=0):
+    """
+    Fit a softmax regression with mini-batch gradient descent on sparse features
+
+    Args:
+        examples (list): (subject, message, class index) tuples
+        classes (list): Category id of each class index
+        dimensions (int): Number of hash buckets
+        epochs (int): Passes over the examples
+        learning_rate (float): Step size
+        l2 (float): Weight decay
+        batch_size (int): Examples per gradient step
+        seed (int): Shuffling seed
+
+    Returns:
+        dict: weights (dimensions x classes), bias, classes and dimensions
+    """
+    rng = np.random.default_rng(seed)
+    features = [ticket_features(subject, message, dimensions) for subject, message, _ in examples]
+    labels = np.array([label for _, _, label in examples], dtype=np.int64)
+    n_classes = len(classes)
+
+    weights = np.zeros((dimensions, n_classes), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    for _ in range(epochs):
+        order = rng.permutation(len(examples))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            buckets, values, rows = _stack([features[i] for i in batch])
+            probabilities = _softmax(_logits(weights, bias, buckets, values, rows, len(batch)))
+            # Gradient of the cross-entropy: predicted minus actual
+            delta = probabilities
+            delta[np.arange(len(batch)), labels[batch]] -= 1
+            delta /= len(batch)
+
+            gradient = np.zeros_like(weights)
+            np.add.at(gradient, buckets, values[:, None] * delta[rows])
+            weights -= learning_rate * (gradient + l2 * weights)
+            bias -= learning_rate * delta.sum(axis=0)
+
+    return {'weights': weights, 'bias': bias, 'classes': np.array(classes, dtype=np.int64), 'dimensions': dimensions}
+
+def predict_proba(model, subject, message):
+    """Probability of each class for one ticket"""
+    buckets, values = ticket_features(subject, message, model['dimensions'])
+    logits = model['bias'] + values @ model['weights'][buckets]
+    return _softmax(logits[None, :])[0]
+
+def save_model(model, path=None):
+    path = Path(path or model_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written next to the target then renamed, so workers never load half a file
+    tmp = path.with_name(path.stem + '.tmp.npz')
+    np.savez(tmp, weights=model['weights'], bias=model['bias'], classes=model['classes'],
+             dimensions=np.array(model['dimensions']))
+    tmp.replace(path)
+
+def load_model():
+    """The trained model, reloaded when the file changes, or None if there is none"""
+    global _model
+    path = model_path()
+    try:
+        stamp = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _model_lock:
+        if _model is None or _model['stamp'] != stamp:
+            with np.load(path) as data:
+                _model = {
+                    'stamp': stamp,
+                    'weights': data['weights'],
+                    'bias': data['bias'],
+                    'classes': data['classes'],
+                    'dimensions': int(data['dimensions']),
+                }
+        return _model
+
+def classify(subject, message):
+    """
+    Predict a ticket's category
+
+    Returns:
+        tuple: (category id, confidence), or (None, 0.0) without a trained model
+    """
+    model = load_model()
+    if model is None:
+        return None, 0.0
+    probabilities = predict_proba(model, subject, message)
+    best = int(np.argmax(probabilities))
+    return int(model['classes'][best]), float(probabilities[best])
+
+def triage(ticket):
+    """
+    Fill in a new ticket's priority, and its category when none was chosen
+    and the classifier is confident enough (TICKET_CLASSIFIER_MIN_CONFIDENCE)
+
+    Args:
+        ticket (Ticket): Unsaved ticket from the submission form
+    """
+    ticket.priority = priority_score(ticket.subject, ticket.message)
+    if ticket.category_id is not None:
+        return
+    category_id, confidence = classify(ticket.subject, ticket.message)
+    if category_id is not None and confidence >= getattr(settings, 'TICKET_CLASSIFIER_MIN_CONFIDENCE', 0.5):
+        ticket.category_id = category_id
+        ticket.auto_categorized = True
+
+def _stack(features):
+    """Concatenate per-ticket sparse features, with the row each value belongs to"""
+    buckets = np.concatenate([b for b, _ in features])
+    values = np.concatenate([v for _, v in features]).astype(np.float32)
+    rows = np.repeat(np.arange(len(features)), [len(b) for b, _ in features])
+    return buckets, values, rows
+
+def _logits(weights, bias, buckets, values, rows, n_rows):
+    logits = np.tile(bias, (n_rows, 1))
+    np.add.at(logits, rows, values[:, None] * weights[buckets])
+    return logits
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CACHE_ALIAS = 'fragments'
+TEMPLATE = 'support/_customer_ticket_list.html'
+VERSION_KEY = 'customer-dashboard:version:{}'
+FRAGMENT_KEY = 'customer-dashboard:{}:v{}'
+STATS_KEY = 'customer-dashboard:stats:{}'
+
+# Rendered in place of the CSRF token, so one cached fragment serves every
+# session of the customer; the request's own token is substituted on the way out
+CSRF_PLACEHOLDER = '__customer_dashboard_csrf_token__'
+
+def cache_enabled():
+    return getattr(settings, 'CUSTOMER_DASHBOARD_CACHE', True)
+
+def customer_ticket_list(request):
+    """
+    Rendered ticket list for the customer dashboard, from the cache when current
+
+    Args:
+        request (HttpRequest): Request of the customer viewing the dashboard
+
+    Returns:
+        SafeString: HTML of the customer's ticket list
+    """
+    customer_id = request.user.id
+    if not cache_enabled():
+        return mark_safe(_render(customer_id).replace(CSRF_PLACEHOLDER, get_token(request)))
+
+    cache = caches[CACHE_ALIAS]
+    key = FRAGMENT_KEY.format(customer_id, _version(cache, customer_id))
+    html = cache.get(key)
+    if html is None:
+        _record('misses')
+        html = _render(customer_id)
+        cache.set(key, html, timeout=getattr(settings, 'CUSTOMER_DASHBOARD_CACHE_TIMEOUT', 3600))
+    else:
+        _record('hits')
+    return mark_safe(html.replace(CSRF_PLACEHOLDER, get_token(request)))
+
+def invalidate_customer(customer_id):
+    """
+    Make the customer's cached ticket list stale by bumping its version
+
+    Runs after the current transaction commits, so a request can't cache the
+    old rows under the new version in between.
+
+    Args:
+        customer_id (int): Owner of the tickets that changed
+    """
+    if not cache_enabled() or customer_id is None:
+        return
+    transaction.on_commit(lambda: _bump_version(customer_id))
+
+def cache_stats():
+    """
+    Return hit/miss counters for the customer dashboard cache
+
+    Returns:
+        dict: enabled, hits, misses, invalidations and hit_ratio
+    """
+    cache = caches[CACHE_ALIAS]
+    counters = cache.get_many([STATS_KEY.format(name) for name in ('hits', 'misses', 'invalidations')])
+    hits = counters.get(STATS_KEY.format('hits'), 0)
+    misses = counters.get(STATS_KEY.format('misses'), 0)
+    lookups = hits + misses
+
+    return {
+        'enabled': cache_enabled(),
+        'hits': hits,
+        'misses': misses,
+        'invalidations': counters.get(STATS_KEY.format('invalidations'), 0),
+        'hit_ratio': hits / lookups if lookups else 0.0,
+    }
+
+def _render(customer_id):
+    from .models import Ticket
+    tickets = (
+        Ticket.objects.filter(customer_id=customer_id)
+        .select_related('customer', 'category')
+        .order_by('-created_at')
+    )
+    return render_to_string(TEMPLATE, {'tickets': tickets, 'csrf_token': CSRF_PLACEHOLDER})
+
+def _version(cache, customer_id):
+    key = VERSION_KEY.format(customer_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1: if the version was evicted,
+        # fragments cached under the old numbers must not be reused
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+def _bump_version(customer_id):
+    cache = caches[CACHE_ALIAS]
+    key = VERSION_KEY.format(customer_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version yet: nothing cached that could be stale
+        cache.add(key, time.time_ns(), timeout=None)
+    _record('invalidations')
+
+def _record(name, amount=1):
+    cache = caches[CACHE_ALIAS]
+    key = STATS_KEY.format(name)
+    # Counters never expire; add() is a no-op if the counter already exists
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, amount, timeout=None)
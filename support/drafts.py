@@ -0,0 +1,206 @@
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import AIDraft, Ticket
+from .provider_router import get_chain, route
+from .similarity import reusable_reply
+
+# Drafts left 'running' longer than this are assumed to belong to a dead worker
+STALE_DRAFT_AGE = timedelta(minutes=10)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+class DraftWorkerPool:
+    """
+    Local thread pool that generates AI drafts in the background
+
+    Jobs wait in a bounded queue so a burst of new tickets cannot grow
+    memory without limit, and each provider has its own semaphore so the
+    workers never hold more concurrent calls to one API than its quota allows.
+    """
+
+    def __init__(self, workers=4, queue_size=100, provider_concurrency=None):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.provider_slots = {
+            provider: threading.BoundedSemaphore(limit)
+            for provider, limit in (provider_concurrency or {}).items()
+        }
+        self.threads = [
+            threading.Thread(target=self._work, name=f'ai-draft-worker-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, draft_id, block=False, timeout=None):
+        """
+        Queue a draft for generation
+
+        Args:
+            draft_id (int): Primary key of a queued AIDraft
+            block (bool): Wait for room in the queue instead of giving up
+            timeout (float): Maximum seconds to wait when blocking
+
+        Returns:
+            bool: False if the queue was full; the draft stays queued in the
+            database for run_draft_workers to pick up
+        """
+        try:
+            self.queue.put(draft_id, block=block, timeout=timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def join(self):
+        """Wait until every queued draft has been processed"""
+        self.queue.join()
+
+    def _work(self):
+        while True:
+            draft_id = self.queue.get()
+            try:
+                process_draft(draft_id, self.provider_slots)
+            except Exception as e:
+                print(f"AI draft worker error ({draft_id}): {e}")
+            finally:
+                # Worker threads hold their own DB connection
+                close_old_connections()
+                self.queue.task_done()
+
+def get_draft_pool():
+    """Return the process-wide worker pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DraftWorkerPool(
+                workers=getattr(settings, 'AI_DRAFT_WORKERS', 4),
+                queue_size=getattr(settings, 'AI_DRAFT_QUEUE_SIZE', 100),
+                provider_concurrency=getattr(settings, 'AI_DRAFT_PROVIDER_CONCURRENCY', {}),
+            )
+    return _pool
+
+def enqueue_draft(ticket):
+    """
+    Record a queued AI draft for a new ticket and hand it to the local pool
+
+    The AIDraft row is the durable job: if the pool is full, disabled or
+    the process exits, run_draft_workers still finds the queued draft.
+    """
+    draft, created = AIDraft.objects.get_or_create(
+        ticket=ticket,
+        defaults={'provider': getattr(settings, 'AI_DRAFT_PROVIDER', 'grok')},
+    )
+    if created and getattr(settings, 'AI_DRAFT_IN_PROCESS', True):
+        # Start generating only once the ticket row is visible to other connections
+        transaction.on_commit(lambda: get_draft_pool().submit(draft.id))
+    return draft
+
+def process_draft(draft_id, provider_slots=None):
+    """
+    Generate the response for one queued draft
+
+    The draft is claimed with a conditional UPDATE so that several workers
+    (threads or run_draft_workers processes) never generate it twice.
+    """
+    claimed = AIDraft.objects.filter(id=draft_id, status='queued').update(
+        status='running', updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+
+    draft = AIDraft.objects.select_related('ticket').get(id=draft_id)
+    generate_draft(draft, provider_slots)
+    draft.save(update_fields=['message', 'provider', 'status', 'error', 'updated_at'])
+
+def generate_draft(draft, provider_slots=None):
+    """
+    Fill in a draft's response, or its error, without saving it
+
+    Args:
+        draft (AIDraft): Draft with its ticket loaded
+        provider_slots (dict): Optional semaphores limiting concurrent calls per provider
+
+    Returns:
+        AIDraft: The same draft, with status 'ready' or 'failed'
+    """
+    try:
+        # A near-identical ticket was already answered: draft from its reply
+        # without calling an LLM
+        reused = reusable_reply(draft.ticket)
+        if reused:
+            draft.message, source = reused
+            draft.provider = 'similar'
+            draft.status = 'ready'
+            draft.error = ''
+            print(f"AI draft for ticket {draft.ticket_id} reused the reply to ticket {source.id} ({source.similarity:.2f})")
+            return draft
+    except Exception as e:
+        print(f"Similar-ticket lookup failed for ticket {draft.ticket_id}: {e}")
+
+    try:
+        # Start with the draft's provider and fail over along the chain, but
+        # never store the canned template reply as a draft
+        draft.message, draft.provider = route(
+            draft.ticket.subject, draft.ticket.message,
+            chain=get_chain(prefer=draft.provider, template=False),
+            provider_slots=provider_slots,
+            # Background work can wait for rate budget longer than a click can
+            max_wait=getattr(settings, 'AI_DRAFT_RATE_LIMIT_MAX_WAIT', 30),
+        )
+        draft.status = 'ready'
+        draft.error = ''
+    except Exception as e:
+        print(f"AI draft generation failed for ticket {draft.ticket_id}: {e}")
+        draft.status = 'failed'
+        draft.error = str(e)
+    return draft
+
+def requeue_stale_drafts(max_age):
+    """
+    Return drafts stuck in 'running' (e.g. after a worker crashed) to the queue
+
+    Args:
+        max_age (timedelta): How long a draft may stay running
+
+    Returns:
+        int: Number of drafts requeued
+    """
+    return AIDraft.objects.filter(
+        status='running', updated_at__lt=timezone.now() - max_age
+    ).update(status='queued')
+
+def backfill_drafts(provider=None, batch_size=500):
+    """
+    Queue drafts for pending tickets that have none, and retry failed ones
+
+    Returns:
+        int: Number of drafts queued
+    """
+    provider = provider or getattr(settings, 'AI_DRAFT_PROVIDER', 'grok')
+    requeued = AIDraft.objects.filter(status='failed', ticket__status='pending').update(status='queued')
+
+    # Read the ids up front rather than inserting while the SELECT is open
+    ticket_ids = list(
+        Ticket.objects.filter(status='pending', ai_draft__isnull=True, duplicate_of__isnull=True)
+        .values_list('id', flat=True)
+    )
+    for start in range(0, len(ticket_ids), batch_size):
+        AIDraft.objects.bulk_create(
+            [AIDraft(ticket_id=ticket_id, provider=provider) for ticket_id in ticket_ids[start:start + batch_size]],
+            ignore_conflicts=True,
+        )
+    return requeued + len(ticket_ids)
+
+def queued_draft_ids(limit):
+    """Oldest queued drafts first"""
+    return list(
+        AIDraft.objects.filter(status='queued')
+        .order_by('created_at')
+        .values_list('id', flat=True)[:limit]
+    )
@@ -0,0 +1,178 @@
+"""
+Near-duplicate tickets with MinHash and locality-sensitive hashing.
+
+A ticket's word shingles are reduced to a MinHash signature: the share of
+positions two signatures agree on estimates the Jaccard similarity of
+their shingle sets. The signature is cut into bands, and each band is
+stored as one TicketLSHBucket key, so a new ticket only has to be compared
+with the few tickets that share a band with it.
+"""
+
+import zlib
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Ticket, TicketLSHBucket
+from .text_features import ticket_text, tokenize
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+
+# Universal hash functions (a * x + b) mod p, with fixed parameters so every
+# process computes the same signatures
+_PRIME = (1 << 61) - 1
+_A = np.array([zlib.crc32(f'minhash-a-{i}'.encode()) | 1 for i in range(PERMUTATIONS)], dtype=np.uint64)
+_B = np.array([zlib.crc32(f'minhash-b-{i}'.encode()) for i in range(PERMUTATIONS)], dtype=np.uint64)
+
+def shingles(subject, message):
+    """Overlapping runs of SHINGLE_SIZE words (the whole text if it is shorter)"""
+    tokens = tokenize(ticket_text(subject, message))
+    if len(tokens) <= SHINGLE_SIZE:
+        return {' '.join(tokens)} if tokens else set()
+    return {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+def signature(subject, message):
+    """
+    MinHash signature of a ticket
+
+    Returns:
+        ndarray: PERMUTATIONS uint32 values, or None for a ticket without words
+    """
+    items = shingles(subject, message)
+    if not items:
+        return None
+    hashes = np.fromiter((zlib.crc32(item.encode()) for item in items), dtype=np.uint64, count=len(items))
+    # uint64 arithmetic wraps on overflow, which still gives a fixed hash per shingle
+    permuted = (hashes[:, None] * _A[None, :] + _B[None, :]) % _PRIME
+    return (permuted.min(axis=0) & 0xFFFFFFFF).astype(np.uint32)
+
+def to_bytes(sig):
+    return sig.astype('<u4').tobytes()
+
+def from_bytes(data):
+    return np.frombuffer(bytes(data), dtype='<u4')
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(sig_a == sig_b))
+
+def band_keys(sig):
+    """One 64-bit key per band: the band number and a hash of its rows"""
+    return [
+        (band << 32) | zlib.crc32(sig[band * ROWS:(band + 1) * ROWS].astype('<u4').tobytes())
+        for band in range(BANDS)
+    ]
+
+def check_duplicate(ticket):
+    """
+    Set a new ticket's signature, and duplicate_of when the same customer sent
+    a near-identical ticket within DUPLICATE_TICKET_WINDOW_DAYS that is still
+    pending (a replied or closed one wouldn't be answered again)
+
+    Args:
+        ticket (Ticket): Unsaved ticket with customer, subject and message
+
+    Returns:
+        Ticket: The original ticket, or None
+    """
+    sig = signature(ticket.subject, ticket.message)
+    ticket.minhash = to_bytes(sig) if sig is not None else None
+    if sig is None:
+        return None
+
+    since = timezone.now() - timedelta(days=getattr(settings, 'DUPLICATE_TICKET_WINDOW_DAYS', 7))
+    candidate_ids = set(
+        TicketLSHBucket.objects.filter(
+            key__in=band_keys(sig), ticket__customer_id=ticket.customer_id, ticket__created_at__gte=since,
+            ticket__status='pending',
+        ).values_list('ticket_id', flat=True)
+    )
+    if not candidate_ids:
+        return None
+
+    threshold = getattr(settings, 'DUPLICATE_TICKET_THRESHOLD', 0.8)
+    best, best_score = None, threshold
+    for candidate in Ticket.objects.filter(id__in=candidate_ids).only('id', 'minhash'):
+        score = similarity(sig, from_bytes(candidate.minhash))
+        if score >= best_score:
+            best, best_score = candidate, score
+    if best is None:
+        return None
+
+    # Duplicates are closed when linked, so a pending candidate is always an original
+    ticket.duplicate_of_id = best.id
+    return ticket.duplicate_of
+
+def touch_original(original_id):
+    """
+    Bump the original's updated_at after a duplicate was merged into it, so
+    its page ETag and the admin dashboard's changes feed show the duplicate
+    """
+    Ticket.objects.filter(id=original_id).update(updated_at=timezone.now())
+
+def index_signature(ticket):
+    """Store the LSH band keys of a saved ticket's signature"""
+    if ticket.minhash is None:
+        return
+    TicketLSHBucket.objects.bulk_create([
+        TicketLSHBucket(key=key, ticket_id=ticket.id) for key in band_keys(from_bytes(ticket.minhash))
+    ])
+
+def find_clusters(tickets, threshold=0.8):
+    """
+    Group near-identical tickets, comparing only tickets that share a band
+
+    Within a bucket, each ticket not yet matched is compared with all the
+    others in one vectorized step (greedy, so a few borderline pairs may
+    be left to another band to connect).
+
+    Args:
+        tickets (iterable): (id, minhash bytes) of the tickets to group
+        threshold (float): Lowest estimated Jaccard similarity to link two tickets
+
+    Returns:
+        list: Clusters (sorted lists of ticket ids) with more than one ticket
+    """
+    ids = []
+    rows = []
+    for ticket_id, data in tickets:
+        if data:
+            ids.append(ticket_id)
+            rows.append(from_bytes(data))
+    if not rows:
+        return []
+    signatures = np.stack(rows)
+
+    # Band hashes for every ticket at once
+    banded = signatures.reshape(len(ids), BANDS, ROWS)
+    buckets = {}
+    for band in range(BANDS):
+        for row, key in enumerate(map(bytes, banded[:, band, :])):
+            buckets.setdefault((band, key), []).append(row)
+
+    parent = list(range(len(ids)))
+
+    def root(row):
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    for members in buckets.values():
+        remaining = np.array(members)
+        while len(remaining) > 1:
+            head, rest = remaining[0], remaining[1:]
+            scores = (signatures[rest] == signatures[head]).mean(axis=1)
+            for row in rest[scores >= threshold]:
+                parent[root(row)] = root(head)
+            remaining = rest[scores < threshold]
+
+    clusters = {}
+    for row, ticket_id in enumerate(ids):
+        clusters.setdefault(root(row), []).append(ticket_id)
+    return [sorted(members) for members in clusters.values() if len(members) > 1]
@@ -1,3 +1,5 @@
+import uuid
+
 from django import forms
 from .models import Ticket, Reply, Category
 
@@ -26,6 +28,9 @@ class TicketForm(forms.ModelForm):
         }
 
 class ReplyForm(forms.ModelForm):
+    # A new key each time the form is rendered; resubmitting the same page sends the same key
+    idempotency_key = forms.UUIDField(required=False, initial=uuid.uuid4, widget=forms.HiddenInput)
+    
     class Meta:
         model = Reply
         fields = ['message', 'is_ai_generated']
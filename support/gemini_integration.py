@@ -2,13 +2,102 @@ import os
 import google.generativeai as genai
 from django.conf import settings
 import time
+from concurrent.futures import ThreadPoolExecutor
+from .ai_cache import cached_response
 
 def configure_gemini():
     """Configure Gemini API with the API key"""
     genai.configure(api_key=settings.GEMINI_API_KEY)
     return genai
 
-def generate_ai_response(subject, message, model_type='flash'):
+# Bump when the prompt in build_gemini_prompt changes so cached responses are not reused
+PROMPT_VERSION = 1
+
+GEMINI_MODELS = {
+    # model_type: (model name, character limit)
+    'pro': ('gemini-1.5-pro-latest', 500),  # Pro can handle longer responses
+    'flash': ('gemini-1.5-flash-latest', 250),
+}
+
+def get_gemini_model(model_type):
+    """Return (model name, character limit) for 'pro' or 'flash'"""
+    if model_type.lower() == 'pro':
+        return GEMINI_MODELS['pro']
+    return GEMINI_MODELS['flash']
+
+def build_gemini_prompt(subject, message, char_limit):
+    """Create prompt optimized for the selected model"""
+    return f"""
+        As a customer support agent, please provide a professional and helpful response to the following customer query.
+        
+        IMPORTANT: Your response MUST be under {char_limit} characters total.
+        
+        Ticket Subject: {subject}
+        Customer Message: {message}
+        
+        Provide a concise, empathetic, and solution-oriented response. 
+        Keep it professional, customer-friendly, and within the character limit.
+        Focus on the most important information and solutions.
+        """
+
+def request_gemini_completion(subject, message, model_type='flash', timeout=None):
+    """
+    Generate AI response with the Gemini API, raising on failure
+    
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+        model_type (str): 'pro' for Gemini 1.5 Pro, 'flash' for Gemini 1.5 Flash
+        timeout (float): Seconds for a single attempt without retries; if None,
+            the client's default timeout and retries
+    
+    Returns:
+        str: AI-generated response
+    """
+    # Configure Gemini API
+    genai = configure_gemini()
+    
+    # Select model based on type
+    model_name, char_limit = get_gemini_model(model_type)
+    
+    # Create model instance
+    model = genai.GenerativeModel(model_name)
+    
+    # Generate response with timing
+    start_time = time.time()
+    # retry=None turns off the client's retries, which would apply the timeout again per attempt
+    request_options = {'timeout': timeout, 'retry': None} if timeout is not None else None
+    response = model.generate_content(build_gemini_prompt(subject, message, char_limit), request_options=request_options)
+    response_time = time.time() - start_time
+    
+    # Log performance (optional - can be removed in production)
+    print(f"{model_name.upper()} Response generated in {response_time:.2f}s")
+    print(f"Response length: {len(response.text)} characters")
+    
+    return response.text
+
+def cached_gemini_completion(subject, message, model_type='flash', regenerate=False):
+    """
+    Generate AI response with the Gemini API through the response cache, raising on failure
+    
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+        model_type (str): 'pro' for Gemini 1.5 Pro, 'flash' for Gemini 1.5 Flash
+        regenerate (bool): Skip the response cache and ask the model again
+    
+    Returns:
+        str: AI-generated response
+    """
+    model_name, _ = get_gemini_model(model_type)
+    return cached_response(
+        'gemini', model_name, subject, message,
+        lambda: request_gemini_completion(subject, message, model_type),
+        prompt_version=PROMPT_VERSION,
+        bypass=regenerate,
+    )
+
+def generate_ai_response(subject, message, model_type='flash', regenerate=False):
     """
     Generate AI response using Google Gemini API with model selection
     
@@ -16,49 +105,13 @@ def generate_ai_response(subject, message, model_type='flash'):
         subject (str): Ticket subject
         message (str): Customer message
         model_type (str): 'pro' for Gemini 1.5 Pro, 'flash' for Gemini 1.5 Flash
+        regenerate (bool): Skip the response cache and ask the model again
     
     Returns:
         str: AI-generated response
     """
     try:
-        # Configure Gemini API
-        genai = configure_gemini()
-        
-        # Select model based on type
-        if model_type.lower() == 'pro':
-            model_name = 'gemini-1.5-pro-latest'
-            char_limit = 500  # Pro can handle longer responses
-        else:
-            model_name = 'gemini-1.5-flash-latest'
-            char_limit = 250 
-        
-        # Create model instance
-        model = genai.GenerativeModel(model_name)
-        
-        # Create prompt optimized for the selected model
-        prompt = f"""
-        As a customer support agent, please provide a professional and helpful response to the following customer query.
-        
-        IMPORTANT: Your response MUST be under {char_limit} characters total.
-        
-        Ticket Subject: {subject}
-        Customer Message: {message}
-        
-        Provide a concise, empathetic, and solution-oriented response. 
-        Keep it professional, customer-friendly, and within the character limit.
-        Focus on the most important information and solutions.
-        """
-        
-        # Generate response with timing
-        start_time = time.time()
-        response = model.generate_content(prompt)
-        response_time = time.time() - start_time
-        
-        # Log performance (optional - can be removed in production)
-        print(f"{model_name.upper()} Response generated in {response_time:.2f}s")
-        print(f"Response length: {len(response.text)} characters")
-        
-        return response.text
+        return cached_gemini_completion(subject, message, model_type, regenerate)
         
     except Exception as e:
         # Log the error for debugging
@@ -70,43 +123,76 @@ def generate_ai_response(subject, message, model_type='flash'):
         elif "model" in str(e).lower() and "not found" in str(e).lower():
             # Fallback to default model if specified model is not available
             if model_type != 'flash':
-                return generate_ai_response(subject, message, 'flash')
+                return generate_ai_response(subject, message, 'flash', regenerate)
             return "The AI model is currently unavailable. Please try again later."
         else:
             return "An error occurred while generating the AI response. Please try again."
 
-def compare_models(subject, message):
+def get_comparison_providers():
+    """
+    Return the models compare_models can fan out to, by name
+    
+    Each entry takes (subject, message, timeout) and raises on failure. The
+    response cache is bypassed so the comparison measures real model latency.
+    """
+    from .grok_integration import request_grok_completion
+    
+    return {
+        'pro': lambda subject, message, timeout: request_gemini_completion(subject, message, 'pro', timeout),
+        'flash': lambda subject, message, timeout: request_gemini_completion(subject, message, 'flash', timeout),
+        'grok': request_grok_completion,
+    }
+
+def compare_models(subject, message, providers=('pro', 'flash'), timeouts=None, default_timeout=30):
     """
-    Compare responses from both Pro and Flash models
+    Compare responses from several models, calling them all at the same time
+    
+    Wall time is that of the slowest model rather than the sum of all of
+    them. Each timeout is passed to the provider's own request as a single
+    attempt without retries, so a model that exceeds it fails like any other
+    error and no call keeps running after the comparison returns. A failed model is reported with an error
+    and does not affect the others' results.
+    
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+        providers (iterable): Names from get_comparison_providers(), e.g. 'pro', 'flash', 'grok'
+        timeouts (dict): Per-provider timeout in seconds
+        default_timeout (float): Timeout for providers missing from timeouts
     
     Returns:
-        dict: Responses and performance metrics from both models
+        dict: Response and performance metrics per model, plus 'wall_time'.
+        When both 'pro' and 'flash' succeed, also 'time_difference' and 'time_ratio'.
     """
+    available = get_comparison_providers()
+    timeouts = timeouts or {}
     results = {}
     
-    # Test Pro model
-    start_time = time.time()
-    pro_response = generate_ai_response(subject, message, 'pro')
-    pro_time = time.time() - start_time
+    def timed_call(name):
+        call_start = time.time()
+        try:
+            response = available[name](subject, message, timeouts.get(name, default_timeout))
+            return response, time.time() - call_start, None
+        except Exception as e:
+            return None, time.time() - call_start, str(e)
     
-    # Test Flash model  
     start_time = time.time()
-    flash_response = generate_ai_response(subject, message, 'flash')
-    flash_time = time.time() - start_time
-    
-    results['pro'] = {
-        'response': pro_response,
-        'response_time': pro_time,
-        'length': len(pro_response)
-    }
-    
-    results['flash'] = {
-        'response': flash_response,
-        'response_time': flash_time,
-        'length': len(flash_response)
-    }
+    with ThreadPoolExecutor(max_workers=len(providers)) as executor:
+        futures = {name: executor.submit(timed_call, name) for name in providers}
+        for name, future in futures.items():
+            response, response_time, error = future.result()
+            results[name] = {
+                'response': response,
+                'response_time': response_time,
+                'length': len(response) if response else 0,
+                'error': error,
+            }
+    results['wall_time'] = time.time() - start_time
     
-    results['time_difference'] = pro_time - flash_time
-    results['time_ratio'] = pro_time / flash_time if flash_time > 0 else float('inf')
+    pro, flash = results.get('pro'), results.get('flash')
+    if pro and flash and pro['error'] is None and flash['error'] is None:
+        pro_time, flash_time = pro['response_time'], flash['response_time']
+        results['time_difference'] = pro_time - flash_time
+        results['time_ratio'] = pro_time / flash_time if flash_time > 0 else float('inf')
     
     return results
@@ -2,36 +2,142 @@ import os
 import requests
 import json
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .ai_cache import cached_response
 
-def generate_grok_response(subject, message):
+GROK_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+# Bump when the prompt in build_grok_payload changes so cached responses are not reused
+PROMPT_VERSION = 1
+
+# Responses the API may succeed on if asked again
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_client = None
+
+class GrokClient:
     """
-    Generate AI response using Grok API (Llama model)
+    Pooled, keep-alive HTTP client for the Grok (Groq OpenAI-compatible) API
+    
+    One instance is shared by the whole process so connections, DNS lookups
+    and TLS sessions are reused between requests instead of being set up
+    again for every AI reply.
+    """
+    
+    def __init__(self, api_key, base_url, pool_size=10, connect_timeout=3.05,
+                 read_timeout=30, max_retries=3, backoff_factor=0.5):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        
+        # Retry refused connections and 429/5xx responses with jittered
+        # exponential backoff, honouring Retry-After. Read errors are not
+        # retried because the completion may already have been generated.
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=None,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.session = self._build_session(
+            api_key, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        )
+        # Same pool settings without retries, for calls with a deadline
+        self.single_attempt_session = self._build_session(
+            api_key, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        )
+    
+    @staticmethod
+    def _build_session(api_key, adapter):
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        })
+        return session
+    
+    def chat_completion(self, payload, deadline=None):
+        """
+        POST a chat completion request and return the decoded JSON body
+        
+        Args:
+            payload (dict): Request body
+            deadline (float): If set, make a single attempt with this connect
+                and read timeout, instead of retrying with the configured ones
+        """
+        if deadline is None:
+            session, timeout = self.session, self.timeout
+        else:
+            session, timeout = self.single_attempt_session, (min(self.timeout[0], deadline), deadline)
+        response = session.post(f"{self.base_url}/chat/completions", json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    
+    def list_models(self):
+        """Return the models available to the configured API key"""
+        response = self.session.get(f"{self.base_url}/models", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get('data', [])
+    
+    def close(self):
+        self.session.close()
+        self.single_attempt_session.close()
+
+def init_grok_client():
+    """
+    Build the shared Grok client from settings
+    
+    Called once from SupportConfig.ready() at startup.
+    
+    Returns:
+        GrokClient: The shared client, or None if no API key is configured
+    """
+    global _client
+    
+    if _client is not None:
+        _client.close()
+        _client = None
+    
+    api_key = getattr(settings, 'GROK_API_KEY', None) or os.getenv('GROK_API_KEY')
+    if api_key:
+        _client = GrokClient(
+            api_key,
+            base_url=getattr(settings, 'GROK_API_URL', "https://api.groq.com/openai/v1"),
+            pool_size=getattr(settings, 'GROK_POOL_SIZE', 10),
+            connect_timeout=getattr(settings, 'GROK_CONNECT_TIMEOUT', 3.05),
+            read_timeout=getattr(settings, 'GROK_READ_TIMEOUT', 30),
+            max_retries=getattr(settings, 'GROK_MAX_RETRIES', 3),
+        )
+    return _client
+
+def get_grok_client():
+    """Return the shared Grok client, building it on first use outside of app startup"""
+    if _client is None:
+        init_grok_client()
+    return _client
+
+def build_grok_payload(subject, message):
+    """
+    Build the chat completion payload for a ticket
     
     Args:
         subject (str): Ticket subject
         message (str): Customer message
     
     Returns:
-        str: AI-generated response or error message
+        dict: Request payload for the chat completions endpoint
     """
-    try:
-        # Get API key from environment or settings
-        api_key = os.getenv('GROK_API_KEY') or getattr(settings, 'GROK_API_KEY', None)
-        
-        if not api_key:
-            return "Grok API key not configured. Please set GROK_API_KEY in environment variables."
-        
-        # Grok API endpoint
-        url = "https://api.groq.com/openai/v1/chat/completions"
-        
-        # Headers
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-        
-        # Create prompt for customer support
-        prompt = f"""
+    # Create prompt for customer support
+    prompt = f"""
         As a customer support agent, please provide a professional and helpful response to the following customer query.
         
         IMPORTANT: Your response MUST be under 255 characters total and focus on being concise yet helpful.
@@ -41,41 +147,94 @@ def generate_grok_response(subject, message):
         
         Provide a solution-oriented response that addresses the customer's concern while maintaining a professional and empathetic tone.
         """
-        
-        # Request payload
-        payload = {
-            "model": "meta-llama/llama-4-scout-17b-16e-instruct",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are a helpful customer support assistant. Provide concise, professional responses that solve customer problems efficiently."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 150,  # Limit response length
-            "temperature": 0.7
-        }
-        
-        # Make API request
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        # Parse response
-        result = response.json()
-        ai_response = result['choices'][0]['message']['content'].strip()
-        
-        # Ensure response is within character limit
-        if len(ai_response) > 255:
-            ai_response = ai_response[:247] + "..."
-            
-        return ai_response
+    
+    return {
+        "model": GROK_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a helpful customer support assistant. Provide concise, professional responses that solve customer problems efficiently."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "max_tokens": 150,  # Limit response length
+        "temperature": 0.7
+    }
+
+def clip_response(ai_response):
+    """Ensure a response is within the 255 character limit"""
+    ai_response = ai_response.strip()
+    if len(ai_response) > 255:
+        ai_response = ai_response[:247] + "..."
+    return ai_response
+
+def request_grok_completion(subject, message, timeout=None):
+    """
+    Generate an AI response with the Grok API, raising on failure
+    
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+        timeout (float): Seconds for a single attempt without retries; if None,
+            the configured timeouts with retries
+    
+    Returns:
+        str: AI-generated response
+    
+    Raises:
+        ImproperlyConfigured: If GROK_API_KEY is not set
+        requests.exceptions.RequestException: If the API request fails
+    """
+    client = get_grok_client()
+    if client is None:
+        raise ImproperlyConfigured("Grok API key not configured. Please set GROK_API_KEY in environment variables.")
+    
+    result = client.chat_completion(build_grok_payload(subject, message), deadline=timeout)
+    return clip_response(result['choices'][0]['message']['content'])
+
+def cached_grok_completion(subject, message, regenerate=False):
+    """
+    Generate an AI response with the Grok API through the response cache, raising on failure
+    
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+        regenerate (bool): Skip the response cache and ask the model again
+    
+    Returns:
+        str: AI-generated response
+    """
+    return cached_response(
+        'grok', GROK_MODEL, subject, message,
+        lambda: request_grok_completion(subject, message),
+        prompt_version=PROMPT_VERSION,
+        bypass=regenerate,
+    )
+
+def generate_grok_response(subject, message, regenerate=False):
+    """
+    Generate AI response using Grok API (Llama model)
+    
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+        regenerate (bool): Skip the response cache and ask the model again
+    
+    Returns:
+        str: AI-generated response or error message
+    """
+    try:
+        return cached_grok_completion(subject, message, regenerate)
+    
+    except ImproperlyConfigured as e:
+        return str(e)
         
     except requests.exceptions.RequestException as e:
         print(f"Grok API Request Error: {e}")
-        if hasattr(e, 'response') and e.response:
+        if hasattr(e, 'response') and e.response is not None:
             try:
                 error_data = e.response.json()
                 return f"API Error: {error_data.get('error', {}).get('message', str(e))}"
@@ -93,21 +252,14 @@ def test_grok_connection():
     Returns True if successful, False otherwise
     """
     try:
-        api_key = os.getenv('GROK_API_KEY') or getattr(settings, 'GROK_API_KEY', None)
-        if not api_key:
+        client = get_grok_client()
+        if client is None:
             print("GROK_API_KEY not found")
             return False
-            
-        url = "https://api.groq.com/openai/v1/models"
-        headers = {
-            "Authorization": f"Bearer {api_key}"
-        }
         
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+        models = client.list_models()
         
         print("Grok API connection successful")
-        models = response.json().get('data', [])
         print(f"Available models: {len(models)}")
         return True
         
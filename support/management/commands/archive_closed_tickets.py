@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from support.archive import archive_batch, archivable_tickets, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed tickets not updated for N days, with their replies, into the archive tables "
+        "in batches; safe to interrupt and run again"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'TICKET_ARCHIVE_AFTER_DAYS', 90),
+            help='Archive closed tickets last updated more than this many days ago',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Tickets moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the tickets that would be archived')
+
+    def handle(self, *args, **options):
+        # Fixed for the whole run, so tickets closing meanwhile don't extend it
+        cutoff = archive_cutoff(options['days'])
+        total = archivable_tickets(cutoff).count()
+        self.stdout.write(f"{total} closed tickets last updated before {cutoff:%Y-%m-%d %H:%M}")
+        if options['dry_run'] or not total:
+            return
+
+        start_time = time.time()
+        moved = moved_replies = 0
+        while True:
+            tickets, replies = archive_batch(cutoff, options['batch_size'])
+            if not tickets:
+                break
+            moved += tickets
+            moved_replies += replies
+            elapsed = time.time() - start_time
+            self.stdout.write(f"  {moved}/{total} tickets ({moved / elapsed if elapsed else 0:.0f} tickets/s)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} tickets and {moved_replies} replies in {time.time() - start_time:.1f}s"
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from support.models import ArchivedTicket, Ticket
+from support.similarity import build_index, index_dir
+
+
+class Command(BaseCommand):
+    help = "Build the similar-ticket index (hashed TF-IDF vectors in a memory-mapped file) from every ticket, archived ones included"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Tickets read per query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        def load_batches():
+            # Archived tickets too: their past replies are still worth suggesting
+            for model in (Ticket, ArchivedTicket):
+                # Keyset batches rather than one long-running cursor
+                last_id = 0
+                while True:
+                    batch = list(
+                        model.objects.filter(id__gt=last_id).order_by('id')
+                        .values_list('id', 'subject', 'message')[:batch_size]
+                    )
+                    if not batch:
+                        break
+                    yield batch
+                    last_id = batch[-1][0]
+
+        start_time = time.time()
+        count = build_index(load_batches, progress=lambda done: self.stdout.write(f"Indexed {done} tickets"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Built the similar-ticket index in {index_dir()}: {count} tickets in {time.time() - start_time:.1f}s"
+        ))
@@ -0,0 +1,97 @@
+import json
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+
+from support.gemini_integration import compare_models, get_comparison_providers
+from support.models import Ticket
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = "Compare AI models side by side over a sample of tickets and report latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--providers', nargs='+', default=['pro', 'flash', 'grok'],
+            help='Models to compare (default: pro flash grok)',
+        )
+        parser.add_argument('--sample', type=int, default=20, help='Number of most recent tickets to run')
+        parser.add_argument('--status', help='Only sample tickets with this status')
+        parser.add_argument(
+            '--timeout', action='append', default=[], metavar='PROVIDER=SECONDS',
+            help='Per-provider timeout, e.g. --timeout pro=45 (repeatable)',
+        )
+        parser.add_argument('--default-timeout', type=float, default=30, help='Timeout for other providers')
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+
+    def handle(self, *args, **options):
+        providers = options['providers']
+        unknown = set(providers) - set(get_comparison_providers())
+        if unknown:
+            raise CommandError(f"Unknown providers: {', '.join(sorted(unknown))}")
+
+        timeouts = {}
+        for value in options['timeout']:
+            name, _, seconds = value.partition('=')
+            try:
+                timeouts[name] = float(seconds)
+            except ValueError:
+                raise CommandError(f"Invalid --timeout {value!r}, expected PROVIDER=SECONDS")
+
+        tickets = Ticket.objects.only('id', 'subject', 'message').order_by('-created_at')
+        if options['status']:
+            tickets = tickets.filter(status=options['status'])
+        tickets = list(tickets[:options['sample']])
+        if not tickets:
+            raise CommandError("No tickets to sample")
+
+        latencies = {name: [] for name in providers}
+        errors = {name: 0 for name in providers}
+        wall_times = []
+
+        for i, ticket in enumerate(tickets, 1):
+            results = compare_models(
+                ticket.subject, ticket.message, providers,
+                timeouts=timeouts, default_timeout=options['default_timeout'],
+            )
+            wall_times.append(results['wall_time'])
+            for name in providers:
+                if results[name]['error']:
+                    errors[name] += 1
+                else:
+                    latencies[name].append(results[name]['response_time'])
+            if not options['json']:
+                self.stdout.write(f"[{i}/{len(tickets)}] ticket {ticket.id}: {results['wall_time']:.2f}s")
+
+        summary = {'tickets': len(tickets), 'providers': {}}
+        for name in providers:
+            values = latencies[name]
+            summary['providers'][name] = {
+                'ok': len(values),
+                'errors': errors[name],
+                **({
+                    f'p{pct}': round(percentile(values, pct), 3) for pct in (50, 90, 95, 99)
+                } if values else {}),
+                'max': round(max(values), 3) if values else None,
+            }
+        summary['wall_p50'] = round(percentile(wall_times, 50), 3)
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        self.stdout.write('')
+        self.stdout.write(f"{'model':<8} {'ok':>4} {'err':>4} {'p50':>7} {'p90':>7} {'p95':>7} {'p99':>7} {'max':>7}")
+        for name, stats in summary['providers'].items():
+            cells = [
+                f"{stats[key]:>7.2f}" if stats.get(key) is not None else f"{'-':>7}"
+                for key in ('p50', 'p90', 'p95', 'p99', 'max')
+            ]
+            self.stdout.write(f"{name:<8} {stats['ok']:>4} {stats['errors']:>4} " + ' '.join(cells))
+        self.stdout.write(f"\nParallel wall time p50: {summary['wall_p50']:.2f}s")
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+
+from support.drafts import generate_draft
+from support.models import AIDraft, Ticket
+
+DEFAULT_CHECKPOINT = Path(settings.BASE_DIR) / '.cache' / 'draft_pending.json'
+
+
+class Command(BaseCommand):
+    help = "Generate AI drafts for all pending tickets in batches, e.g. to clear a backlog after an outage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--provider', choices=['grok', 'gemini-flash', 'gemini-pro'],
+            default=getattr(settings, 'AI_DRAFT_PROVIDER', 'grok'),
+            help='Provider tried first; failures fall over along AI_PROVIDER_CHAIN',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=getattr(settings, 'AI_DRAFT_WORKERS', 4),
+            help='Maximum provider calls in flight',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=50,
+            help='Tickets read, generated and written per batch',
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Stop after this many tickets',
+        )
+        parser.add_argument(
+            '--regenerate', action='store_true',
+            help='Replace drafts that are already ready',
+        )
+        parser.add_argument(
+            '--checkpoint', default=str(DEFAULT_CHECKPOINT),
+            help='File recording the last ticket written, for resuming an interrupted run',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore the checkpoint and start from the first pending ticket',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = Path(options['checkpoint'])
+        start_after = 0 if options['restart'] else self.read_checkpoint(checkpoint)
+        if start_after:
+            self.stdout.write(f"Resuming after ticket {start_after}")
+
+        # Drafts being generated by run_draft_workers are left alone, and
+        # duplicates are answered on their original ticket
+        skip = ['running'] if options['regenerate'] else ['running', 'ready']
+        tickets = (
+            Ticket.objects.filter(status='pending', duplicate_of__isnull=True)
+            .exclude(ai_draft__status__in=skip)
+            .only('id', 'subject', 'message')
+            .order_by('id')
+        )
+
+        total = tickets.filter(id__gt=start_after).count()
+        if options['limit']:
+            total = min(total, options['limit'])
+        self.stdout.write(f"Drafting {total} pending tickets with {options['concurrency']} concurrent calls")
+
+        provider_slots = {
+            provider: threading.BoundedSemaphore(limit)
+            for provider, limit in getattr(settings, 'AI_DRAFT_PROVIDER_CONCURRENCY', {}).items()
+        }
+
+        def draft(ticket):
+            try:
+                return generate_draft(AIDraft(ticket=ticket, provider=options['provider']), provider_slots)
+            finally:
+                # Pool threads hold their own DB connection (used by the rate limiter)
+                close_old_connections()
+
+        done = failed = 0
+        start_time = time.time()
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for chunk in self.chunks(tickets, start_after, options['chunk_size'], total):
+                drafts = list(executor.map(draft, chunk))
+                self.save_drafts(drafts)
+                self.write_checkpoint(checkpoint, chunk[-1].id)
+
+                done += len(drafts)
+                failed += sum(1 for d in drafts if d.status == 'failed')
+                elapsed = time.time() - start_time
+                self.stdout.write(
+                    f"{done}/{total} tickets ({failed} failed) - "
+                    f"{done / elapsed if elapsed else 0:.2f} tickets/s"
+                )
+
+        elapsed = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f"Drafted {done - failed} tickets, {failed} failed, in {elapsed:.1f}s "
+            f"({done / elapsed if elapsed else 0:.2f} tickets/s)"
+        ))
+        if not options['limit']:
+            # A complete pass: the next run starts over and retries failures
+            checkpoint.unlink(missing_ok=True)
+
+    def chunks(self, tickets, start_after, size, total):
+        """
+        Yield the tickets in id order, one chunk at a time
+
+        Each chunk is a separate keyset query that is fully read before its
+        drafts are written. A single long-running iterator() would keep a
+        read cursor open for the whole run, and on SQLite that blocks every
+        other connection from committing (the pool threads' rate limiter).
+        """
+        remaining = total
+        while remaining > 0:
+            chunk = list(tickets.filter(id__gt=start_after)[:min(size, remaining)].iterator())
+            if not chunk:
+                return
+            yield chunk
+            start_after = chunk[-1].id
+            remaining -= len(chunk)
+
+    def save_drafts(self, drafts):
+        """Insert the chunk's drafts, replacing any queued or failed draft for the same ticket"""
+        with transaction.atomic():
+            AIDraft.objects.bulk_create(
+                drafts,
+                update_conflicts=True,
+                unique_fields=['ticket'],
+                update_fields=['provider', 'message', 'status', 'error', 'updated_at'],
+            )
+
+    def read_checkpoint(self, path):
+        try:
+            return json.loads(path.read_text())['last_ticket_id']
+        except (FileNotFoundError, ValueError, KeyError):
+            return 0
+
+    def write_checkpoint(self, path, ticket_id):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({'last_ticket_id': ticket_id}))
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import QueryDict
+
+from support.models import Ticket, Reply
+from support.pagination import changes_queryset, encode_cursor, keyset_queryset
+from support.views import ADMIN_CHANGES_PAGE_SIZE, ADMIN_FEED_PAGE_SIZE, admin_ticket_queryset
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the dashboard and ticket detail queries and fail if any does a full table scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-fail',
+            action='store_true',
+            help='Report full scans without exiting with an error',
+        )
+
+    def handle(self, *args, **options):
+        full_scans = []
+        queries = self.get_queries()
+
+        for name, queryset in queries:
+            plan = queryset.explain()
+            scans = self.find_full_scans(plan)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if scans:
+                full_scans.append(name)
+                self.stdout.write(self.style.ERROR(f"Full scan: {', '.join(scans)}"))
+            self.stdout.write('')
+
+        if full_scans and not options['no_fail']:
+            raise CommandError(f"Full table scans in: {', '.join(full_scans)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {len(queries)} queries, {len(full_scans)} with full scans"
+        ))
+
+    def get_queries(self):
+        """Build the querysets the views run, using real ids where the tables have rows"""
+        ticket = Ticket.objects.only('id', 'customer_id', 'created_at', 'updated_at').first()
+        ticket_id = ticket.id if ticket else 1
+        customer_id = ticket.customer_id if ticket else 1
+        cursor = encode_cursor(ticket.created_at, ticket.id) if ticket else None
+        changes_cursor = encode_cursor(ticket.updated_at, ticket.id) if ticket else None
+
+        def admin_feed(query='', page_cursor=None):
+            tickets, _ = admin_ticket_queryset(QueryDict(query))
+            return keyset_queryset(tickets, page_cursor, ADMIN_FEED_PAGE_SIZE)
+
+        return [
+            ('admin_dashboard: first page', admin_feed()),
+            ('admin_dashboard: next page', admin_feed(page_cursor=cursor)),
+            ('admin_dashboard: status=pending', admin_feed('status=pending')),
+            ('admin_dashboard: status=replied', admin_feed('status=replied')),
+            ('admin_dashboard: changes since cursor',
+             changes_queryset(admin_ticket_queryset(QueryDict())[0], changes_cursor, ADMIN_CHANGES_PAGE_SIZE)),
+            ('customer_dashboard: tickets', Ticket.objects.filter(customer_id=customer_id).order_by('-created_at')),
+            ('ticket_detail: ticket', Ticket.objects.filter(id=ticket_id)),
+            ('ticket_detail: replies',
+             Reply.objects.filter(ticket_id=ticket_id).select_related('responder').order_by('created_at')),
+        ]
+
+    def find_full_scans(self, plan):
+        """
+        Return the plan lines that read a whole table instead of an index
+
+        SQLite reports "SCAN <table>" (without "USING ... INDEX") and
+        PostgreSQL reports "Seq Scan on <table>" for a full table scan.
+        """
+        scans = []
+        for line in plan.splitlines():
+            line = line.strip(' -|`')
+            if connection.vendor == 'sqlite':
+                if line.startswith('SCAN ') and 'USING' not in line:
+                    scans.append(line)
+            elif 'Seq Scan' in line:
+                scans.append(line)
+        return scans
@@ -0,0 +1,57 @@
+import sys
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from support.models import Ticket
+from support.transfer import FORMATS, encode_records, export_records
+
+
+class Command(BaseCommand):
+    help = "Stream categories, tickets and replies to a JSONL or CSV file (see import_tickets)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='File to write (default: standard output)')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Output format (default: from the file extension, else jsonl)',
+        )
+        parser.add_argument('--days', type=int, help='Only tickets created in the last N days, with their replies')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or ('csv' if output.endswith('.csv') else 'jsonl')
+        tickets = Ticket.objects.all()
+        if options['days']:
+            tickets = tickets.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+
+        # Progress goes to stderr when the export itself is written to stdout
+        log = self.stderr if output == '-' else self.stdout
+        counts = {}
+        start_time = time.time()
+
+        def counted(records):
+            for record in records:
+                counts[record['type']] = counts.get(record['type'], 0) + 1
+                rows = sum(counts.values())
+                if rows % 10000 == 0:
+                    log.write(f"  {rows} rows ({rows / (time.time() - start_time):.0f} rows/s)")
+                yield record
+
+        lines = encode_records(counted(export_records(tickets, options['chunk_size'])), fmt)
+        if output == '-':
+            sys.stdout.writelines(lines)
+            sys.stdout.flush()
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as file:
+                file.writelines(lines)
+
+        elapsed = time.time() - start_time
+        rows = sum(counts.values())
+        summary = ', '.join(f"{counts.get(kind, 0)} {kind} rows" for kind in ('category', 'ticket', 'reply'))
+        log.write(self.style.SUCCESS(
+            f"Exported {summary} in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
@@ -0,0 +1,99 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from support.duplicates import find_clusters, index_signature, signature, to_bytes, touch_original
+from support.models import AIDraft, Ticket
+
+
+class Command(BaseCommand):
+    help = "Find clusters of near-duplicate tickets (MinHash/LSH), optionally merging each customer's duplicates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only look at tickets created in the last N days')
+        parser.add_argument(
+            '--threshold', type=float, default=getattr(settings, 'DUPLICATE_TICKET_THRESHOLD', 0.8),
+            help='Lowest estimated Jaccard similarity for two tickets to be duplicates',
+        )
+        parser.add_argument(
+            '--link', action='store_true',
+            help="Merge pending duplicates from the same customer into that customer's earliest pending ticket",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tickets signed per transaction')
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        tickets = Ticket.objects.all()
+        if options['days']:
+            tickets = tickets.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+
+        signed = self.sign_missing(tickets, options['batch_size'])
+        if signed:
+            self.stdout.write(f"Computed signatures for {signed} tickets")
+
+        clusters = find_clusters(tickets.values_list('id', 'minhash').iterator(), options['threshold'])
+        clusters.sort(key=len, reverse=True)
+        in_clusters = sum(len(cluster) for cluster in clusters)
+        self.stdout.write(f"{len(clusters)} clusters covering {in_clusters} tickets")
+
+        subjects = dict(Ticket.objects.filter(id__in=[c[0] for c in clusters[:10]]).values_list('id', 'subject'))
+        for cluster in clusters[:10]:
+            self.stdout.write(f"  {len(cluster):>4} tickets like #{cluster[0]} {subjects.get(cluster[0], '')!r}")
+
+        if options['link']:
+            linked = self.link(clusters)
+            self.stdout.write(f"Merged {linked} pending duplicates into their customer's earliest pending ticket")
+
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.time() - start_time:.1f}s"))
+
+    def sign_missing(self, tickets, batch_size):
+        """Compute signatures and LSH buckets for tickets created before duplicate detection"""
+        signed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                tickets.filter(minhash__isnull=True, id__gt=last_id).order_by('id')
+                .only('id', 'subject', 'message')[:batch_size]
+            )
+            if not batch:
+                return signed
+            with transaction.atomic():
+                for ticket in batch:
+                    sig = signature(ticket.subject, ticket.message)
+                    # Tickets without words get an empty signature so they aren't signed again
+                    ticket.minhash = to_bytes(sig) if sig is not None else b''
+                Ticket.objects.bulk_update(batch, ['minhash'])
+                for ticket in batch:
+                    if ticket.minhash:
+                        index_signature(ticket)
+            signed += len(batch)
+            last_id = batch[-1].id
+
+    def link(self, clusters):
+        """Within each cluster, link every customer's later pending tickets to their earliest pending one"""
+        linked = 0
+        for cluster in clusters:
+            by_customer = {}
+            # Only pending tickets: a replied or closed original wouldn't be answered again
+            for ticket in Ticket.objects.filter(id__in=cluster, status='pending', duplicate_of__isnull=True).only(
+                'id', 'customer_id', 'status', 'duplicate_of', 'created_at'
+            ).order_by('created_at', 'id'):
+                by_customer.setdefault(ticket.customer_id, []).append(ticket)
+
+            for original, *later in by_customer.values():
+                if not later:
+                    continue
+                with transaction.atomic():
+                    for ticket in later:
+                        ticket.duplicate_of_id = original.id
+                        ticket.status = 'closed'
+                        # save() so the status counters and caches follow
+                        ticket.save(update_fields=['duplicate_of', 'status', 'updated_at'])
+                        AIDraft.objects.filter(ticket=ticket, status='queued').delete()
+                        linked += 1
+                    touch_original(original.id)
+        return linked
@@ -0,0 +1,110 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from support.models import Category, Reply, Ticket
+from support.search import rebuild_index, search_backend
+from support.services import rebuild_status_counts, refresh_reply_summaries
+from support.transfer import keep_timestamps
+
+SOURCE_ALIAS = 'sqlite_import_source'
+
+# Parents before children, so every foreign key already exists in the target
+MODELS = [User, Category, Ticket, Reply]
+
+
+class Command(BaseCommand):
+    help = "Copy users, categories, tickets and replies from a SQLite file into the configured database (e.g. PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', default=str(Path(settings.BASE_DIR) / 'db.sqlite3'),
+            help='SQLite database to copy from (opened read-only)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows read and inserted per batch',
+        )
+
+    def handle(self, *args, **options):
+        source = Path(options['source']).resolve()
+        if not source.exists():
+            raise CommandError(f"No SQLite database at {source}")
+        target = connections[DEFAULT_DB_ALIAS]
+        if target.vendor == 'sqlite' and Path(target.settings_dict['NAME']).resolve() == source:
+            raise CommandError("The source is the configured database; set DATABASE_URL to the target first")
+
+        # A read-only connection with the stock backend, so nothing is written
+        # to the source file (not even a WAL journal)
+        connections.settings[SOURCE_ALIAS] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'file:{source}?mode=ro'},
+        })[DEFAULT_DB_ALIAS]
+
+        self.stdout.write(f"Copying {source} into the {target.vendor} database '{target.settings_dict['NAME']}'")
+        start_time = time.time()
+        try:
+            for model in MODELS:
+                self.copy_model(model, options['batch_size'])
+        finally:
+            connections[SOURCE_ALIAS].close()
+
+        # Copied primary keys leave PostgreSQL sequences behind the data
+        with target.cursor() as cursor:
+            for sql in target.ops.sequence_reset_sql(no_style(), MODELS):
+                cursor.execute(sql)
+
+        # bulk_create sends no signals, so the counters and the search index
+        # are rebuilt once at the end
+        with transaction.atomic():
+            refresh_reply_summaries(Ticket.objects.all())
+        rebuild_status_counts()
+
+        if search_backend():
+            indexed = 0
+            with transaction.atomic():
+                for indexed in rebuild_index():
+                    pass
+            self.stdout.write(f"Rebuilt the search index ({indexed} tickets)")
+
+        self.stdout.write(self.style.SUCCESS(f"Copied everything in {time.time() - start_time:.1f}s"))
+
+    def copy_model(self, model, batch_size):
+        """
+        Copy one table in primary-key order, one transaction per batch
+
+        Rows whose primary key already exists in the target are skipped, so
+        an interrupted copy can simply be run again. Columns missing from an
+        older source database are left to their model defaults.
+        """
+        label = model._meta.label
+        with connections[SOURCE_ALIAS].cursor() as cursor:
+            columns = {
+                column.name for column in
+                connections[SOURCE_ALIAS].introspection.get_table_description(cursor, model._meta.db_table)
+            }
+        fields = [field.attname for field in model._meta.concrete_fields if field.column in columns]
+
+        rows = model.objects.using(SOURCE_ALIAS).order_by('pk').values(*fields)
+        total = rows.count()
+        copied = 0
+        last_pk = 0
+        batch_start = time.time()
+
+        with keep_timestamps(model):
+            while True:
+                batch = [model(**row) for row in rows.filter(pk__gt=last_pk)[:batch_size]]
+                if not batch:
+                    break
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, ignore_conflicts=True)
+                copied += len(batch)
+                last_pk = batch[-1].pk
+                self.stdout.write(f"  {label}: {copied}/{total}")
+
+        elapsed = time.time() - batch_start
+        self.stdout.write(f"{label}: {copied} rows in {elapsed:.1f}s ({copied / elapsed if elapsed else 0:.0f} rows/s)")
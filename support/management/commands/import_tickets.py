@@ -0,0 +1,169 @@
+import sys
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from support.models import Category, Reply, Ticket
+from support.search import rebuild_index, search_backend
+from support.services import rebuild_status_counts, refresh_reply_summaries
+from support.transfer import FORMATS, keep_timestamps, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream categories, tickets and replies from a JSONL or CSV export into the database, in batches. "
+        "Tickets and replies get new ids; usernames not found here are created without a usable password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Export file to read ("-" for standard input)')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Input format (default: from the file extension, else jsonl)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per transaction')
+
+    def handle(self, *args, **options):
+        path = options['input']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        self.batch_size = options['batch_size']
+
+        # Built once up front, so rows are resolved without a query each
+        self.user_ids = dict(User.objects.values_list('username', 'id').iterator())
+        self.category_ids = {}
+        # Export ticket id -> new id, to attach replies and duplicate links
+        self.ticket_ids = {}
+        # (new ticket id, export id of its original), linked once every ticket is in
+        self.duplicate_links = []
+        categories_by_name = dict(Category.objects.values_list('name', 'id'))
+
+        self.counts = {'category': 0, 'ticket': 0, 'reply': 0}
+        self.ticket_range = None
+        self.start_time = time.time()
+        pending_type, batch = None, []
+
+        try:
+            file = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        with file:
+            for record in read_records(file, fmt):
+                kind = record['type']
+                if kind == 'category':
+                    # Categories are matched by name; the export id only links the tickets
+                    if record['name'] not in categories_by_name:
+                        categories_by_name[record['name']] = Category.objects.create(
+                            name=record['name'], description=record['description'] or '',
+                        ).id
+                    self.category_ids[record['id']] = categories_by_name[record['name']]
+                    self.counts['category'] += 1
+                    continue
+                if kind not in ('ticket', 'reply'):
+                    raise CommandError(f"Unknown record type {kind!r}")
+                # Tickets are written before their replies reach the database
+                if kind != pending_type or len(batch) >= self.batch_size:
+                    self.flush(pending_type, batch)
+                    pending_type, batch = kind, []
+                batch.append(record)
+            self.flush(pending_type, batch)
+
+        linked = self.link_duplicates()
+
+        # bulk_create sends no signals, so the counters and the search index
+        # are rebuilt once at the end
+        if self.ticket_range:
+            with transaction.atomic():
+                refresh_reply_summaries(Ticket.objects.filter(id__range=self.ticket_range))
+        rebuild_status_counts()
+        if search_backend():
+            indexed = 0
+            with transaction.atomic():
+                for indexed in rebuild_index():
+                    pass
+            self.stdout.write(f"Rebuilt the search index ({indexed} tickets)")
+
+        elapsed = time.time() - self.start_time
+        rows = sum(self.counts.values())
+        summary = ', '.join(f"{count} {kind} rows" for kind, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary} in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s); "
+            f"{linked} duplicate links kept"
+        ))
+        self.stdout.write(
+            "Run find_duplicate_tickets and build_similarity_index to cover the imported tickets"
+        )
+
+    def flush(self, kind, records):
+        """Insert one batch of tickets or replies, creating any users they name"""
+        if kind == 'reply':
+            # Replies of tickets outside the export have nothing to attach to
+            records = [record for record in records if record['ticket'] in self.ticket_ids]
+        if not records:
+            return
+        user_field = 'customer' if kind == 'ticket' else 'responder'
+        self.add_users({record[user_field] for record in records})
+
+        if kind == 'ticket':
+            model = Ticket
+            # New ids, so tickets already in this database are never overwritten
+            # or skipped; duplicate_of is set in a second pass
+            objects = [
+                Ticket(
+                    customer_id=self.user_ids[record['customer']],
+                    subject=record['subject'], message=record['message'],
+                    category_id=self.category_ids.get(record['category']), status=record['status'],
+                    priority=record['priority'] or 0, auto_categorized=record['auto_categorized'],
+                    created_at=record['created_at'], updated_at=record['updated_at'],
+                )
+                for record in records
+            ]
+        else:
+            model = Reply
+            objects = [
+                Reply(
+                    ticket_id=self.ticket_ids[record['ticket']], responder_id=self.user_ids[record['responder']],
+                    message=record['message'], is_ai_generated=record['is_ai_generated'],
+                    is_modified=record['is_modified'], created_at=record['created_at'],
+                )
+                for record in records
+            ]
+
+        with keep_timestamps(model), transaction.atomic():
+            model.objects.bulk_create(objects)
+
+        if kind == 'ticket':
+            if any(ticket.id is None for ticket in objects):
+                raise CommandError("The database backend doesn't return ids from bulk inserts")
+            for record, ticket in zip(records, objects):
+                self.ticket_ids[record['id']] = ticket.id
+                if record['duplicate_of'] is not None:
+                    self.duplicate_links.append((ticket.id, record['duplicate_of']))
+            low, high = objects[0].id, objects[-1].id
+            if self.ticket_range:
+                low, high = min(low, self.ticket_range[0]), max(high, self.ticket_range[1])
+            self.ticket_range = (low, high)
+
+        self.counts[kind] += len(objects)
+        rows = sum(self.counts.values())
+        self.stdout.write(f"  {rows} rows ({rows / (time.time() - self.start_time):.0f} rows/s)")
+
+    def link_duplicates(self):
+        """Point imported duplicates at their imported original; originals left out of the export are dropped"""
+        links = [
+            Ticket(id=ticket_id, duplicate_of_id=self.ticket_ids[original])
+            for ticket_id, original in self.duplicate_links if original in self.ticket_ids
+        ]
+        with transaction.atomic():
+            Ticket.objects.bulk_update(links, ['duplicate_of'], batch_size=self.batch_size)
+        return len(links)
+
+    def add_users(self, usernames):
+        missing = usernames - self.user_ids.keys()
+        if not missing:
+            return
+        unusable = make_password(None)
+        User.objects.bulk_create([User(username=username, password=unusable) for username in missing])
+        self.user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from support.models import Ticket
+from support.services import rebuild_status_counts, refresh_reply_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute reply counts, last-reply summaries and per-status ticket counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Tickets updated per UPDATE statement',
+        )
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        batch_size = options['batch_size']
+
+        # Batches of ids keep each write transaction short
+        refreshed = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Ticket.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            refreshed += refresh_reply_summaries(Ticket.objects.filter(id__in=ids))
+            last_id = ids[-1]
+            self.stdout.write(f"Refreshed reply summaries for {refreshed} tickets")
+
+        counts = rebuild_status_counts()
+        summary = ', '.join(f"{status}: {count}" for status, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired counters for {refreshed} tickets ({summary}) in {time.time() - start_time:.1f}s"
+        ))
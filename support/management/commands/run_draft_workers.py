@@ -0,0 +1,69 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from support.drafts import (
+    STALE_DRAFT_AGE, DraftWorkerPool, backfill_drafts, queued_draft_ids, requeue_stale_drafts,
+)
+
+
+class Command(BaseCommand):
+    help = "Run AI draft workers that generate replies for queued tickets"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'AI_DRAFT_WORKERS', 4),
+            help='Number of worker threads',
+        )
+        parser.add_argument(
+            '--backfill', action='store_true',
+            help='Queue drafts for existing pending tickets that do not have one',
+        )
+        parser.add_argument(
+            '--provider', choices=['grok', 'gemini-flash', 'gemini-pro'],
+            help='Provider for backfilled drafts (default: AI_DRAFT_PROVIDER)',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queued drafts have been processed instead of polling',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            created = backfill_drafts(options['provider'])
+            self.stdout.write(f"Queued {created} drafts for pending tickets")
+
+        queue_size = getattr(settings, 'AI_DRAFT_QUEUE_SIZE', 100)
+        pool = DraftWorkerPool(
+            workers=options['workers'],
+            queue_size=queue_size,
+            provider_concurrency=getattr(settings, 'AI_DRAFT_PROVIDER_CONCURRENCY', {}),
+        )
+        self.stdout.write(f"Started {options['workers']} draft workers")
+
+        try:
+            while True:
+                requeued = requeue_stale_drafts(STALE_DRAFT_AGE)
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale drafts")
+
+                draft_ids = queued_draft_ids(queue_size)
+                for draft_id in draft_ids:
+                    # Blocks while the queue is full, so the database is only
+                    # polled as fast as the workers drain it
+                    pool.submit(draft_id, block=True)
+                pool.join()
+
+                if draft_ids:
+                    self.stdout.write(f"Processed {len(draft_ids)} drafts")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping draft workers")
@@ -0,0 +1,90 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from support.classifier import model_path, predict_proba, save_model, train, triage
+from support.dashboard_cache import invalidate_customer
+from support.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Train the ticket category classifier from tickets whose category was chosen by a person"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--epochs', type=int, default=10, help='Passes over the training tickets')
+        parser.add_argument('--dimensions', type=int, default=16384, help='Hash buckets for the n-gram features')
+        parser.add_argument(
+            '--holdout', type=float, default=0.1,
+            help='Share of tickets kept aside to report accuracy (the saved model is trained on all of them)',
+        )
+        parser.add_argument(
+            '--apply', action='store_true',
+            help='Then set priorities of pending tickets and categorize the uncategorized ones',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Tickets updated per transaction with --apply')
+
+    def handle(self, *args, **options):
+        # Predicted categories are left out so the model doesn't learn from itself
+        rows = list(
+            Ticket.objects.filter(category__isnull=False, auto_categorized=False)
+            .values_list('subject', 'message', 'category_id')
+        )
+        classes = sorted({category_id for _, _, category_id in rows})
+        if len(classes) < 2:
+            raise CommandError("Need labelled tickets in at least two categories to train")
+        index = {category_id: i for i, category_id in enumerate(classes)}
+        examples = [(subject, message, index[category_id]) for subject, message, category_id in rows]
+        self.stdout.write(f"{len(examples)} labelled tickets in {len(classes)} categories")
+
+        settings = {'dimensions': options['dimensions'], 'epochs': options['epochs']}
+        random.Random(0).shuffle(examples)
+        held_out = int(len(examples) * options['holdout'])
+        if held_out:
+            start_time = time.time()
+            model = train(examples[held_out:], classes, **settings)
+            correct = sum(
+                int(np.argmax(predict_proba(model, subject, message))) == label
+                for subject, message, label in examples[:held_out]
+            )
+            self.stdout.write(
+                f"Held-out accuracy: {correct / held_out:.1%} on {held_out} tickets "
+                f"(trained in {time.time() - start_time:.1f}s)"
+            )
+
+        model = train(examples, classes, **settings)
+        save_model(model)
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved the classifier to {model_path()} ({model_path().stat().st_size / 1024:.0f} KB)"
+        ))
+
+        if options['apply']:
+            self.apply(options['batch_size'])
+
+    def apply(self, batch_size):
+        """Triage pending tickets as if they had just been submitted"""
+        updated = 0
+        last_id = 0
+        while True:
+            tickets = list(
+                Ticket.objects.filter(status='pending', id__gt=last_id).order_by('id')
+                .only('id', 'customer_id', 'subject', 'message', 'category', 'priority', 'auto_categorized')[:batch_size]
+            )
+            if not tickets:
+                break
+            now = timezone.now()
+            for ticket in tickets:
+                triage(ticket)
+                # bulk_update skips auto_now, so the ETags and the changes feed need it set here
+                ticket.updated_at = now
+            with transaction.atomic():
+                Ticket.objects.bulk_update(tickets, ['priority', 'category', 'auto_categorized', 'updated_at'])
+                # Nor does it send signals, so the customers' cached ticket lists are dropped here
+                for customer_id in {ticket.customer_id for ticket in tickets}:
+                    invalidate_customer(customer_id)
+            updated += len(tickets)
+            last_id = tickets[-1].id
+            self.stdout.write(f"Triaged {updated} pending tickets")
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0002_reply_is_modified'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['ticket', 'created_at'], name='reply_ticket_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['customer', '-created_at'], name='ticket_customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='ticket_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-created_at', '-id'], name='ticket_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-created_at', '-id'], name='ticket_pending_created_idx'),
+        ),
+    ]
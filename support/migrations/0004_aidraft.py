@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0003_ticket_reply_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('ready', 'Ready'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ticket', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ai_draft', to='support.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='aidraft_status_created_idx')],
+            },
+        ),
+    ]
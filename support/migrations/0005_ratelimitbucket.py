@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0004_aidraft'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200, unique=True)),
+                ('tokens', models.FloatField()),
+                ('capacity', models.FloatField()),
+                ('refill_rate', models.FloatField()),
+                ('updated_at', models.FloatField()),
+            ],
+        ),
+    ]
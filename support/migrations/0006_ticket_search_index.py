@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:20
+
+from django.db import migrations
+
+# Full-text index over each ticket's subject, message and replies, kept in
+# sync by support.signals. SQLite uses an FTS5 table keyed by ticket id
+# (rowid); PostgreSQL uses a table with a weighted tsvector and a GIN index.
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE support_ticket_fts USING fts5("
+    "subject, body, tokenize = 'porter unicode61 remove_diacritics 2')",
+    """
+    INSERT INTO support_ticket_fts (rowid, subject, body)
+    SELECT t.id, t.subject,
+           t.message || COALESCE(char(10) || (
+               SELECT group_concat(r.message, char(10))
+               FROM (SELECT message FROM support_reply WHERE ticket_id = t.id ORDER BY created_at) AS r
+           ), '')
+    FROM support_ticket AS t
+    """,
+]
+SQLITE_DROP = ["DROP TABLE IF EXISTS support_ticket_fts"]
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE support_ticket_search (
+        ticket_id bigint PRIMARY KEY REFERENCES support_ticket (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        subject text NOT NULL,
+        body text NOT NULL,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX support_ticket_search_document_idx ON support_ticket_search USING GIN (document)",
+    """
+    INSERT INTO support_ticket_search (ticket_id, subject, body, document)
+    SELECT id, subject, body,
+           setweight(to_tsvector('english', subject), 'A') || setweight(to_tsvector('english', body), 'B')
+    FROM (
+        SELECT t.id, t.subject,
+               concat_ws(E'\\n', t.message, (
+                   SELECT string_agg(r.message, E'\\n' ORDER BY r.created_at)
+                   FROM support_reply AS r WHERE r.ticket_id = t.id
+               )) AS body
+        FROM support_ticket AS t
+    ) AS documents
+    """,
+]
+POSTGRES_DROP = ["DROP TABLE IF EXISTS support_ticket_search"]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0005_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}),
+            run({'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0006_ticket_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reply',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
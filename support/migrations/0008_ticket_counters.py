@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Ticket = apps.get_model('support', 'Ticket')
+    Reply = apps.get_model('support', 'Reply')
+    TicketStatusCount = apps.get_model('support', 'TicketStatusCount')
+
+    replies = Reply.objects.filter(ticket=OuterRef('pk'))
+    latest = replies.order_by('-created_at', '-id')
+    Ticket.objects.update(
+        reply_count=Coalesce(
+            Subquery(replies.order_by().values('ticket').annotate(total=Count('id')).values('total')), 0
+        ),
+        last_reply_at=Subquery(latest.values('created_at')[:1]),
+        last_responder=Subquery(latest.values('responder')[:1]),
+    )
+
+    counts = dict.fromkeys(['pending', 'replied', 'closed'], 0)
+    counts.update(Ticket.objects.order_by().values_list('status').annotate(total=Count('id')))
+    TicketStatusCount.objects.bulk_create([
+        TicketStatusCount(status=status, count=count) for status, count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('support', '0007_reply_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('replied', 'Replied'), ('closed', 'Closed')], max_length=20, unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_reply_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_responder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0008_ticket_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['updated_at', 'id'], name='ticket_updated_idx'),
+        ),
+    ]
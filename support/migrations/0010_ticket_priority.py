@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0009_ticket_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='auto_categorized',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
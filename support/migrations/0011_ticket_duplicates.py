@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0010_ticket_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='support.ticket'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='minhash',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.CreateModel(
+            name='TicketLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='support.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'ticket'], name='lsh_bucket_key_idx')],
+            },
+        ),
+    ]
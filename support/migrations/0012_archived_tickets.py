@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('support', '0011_ticket_duplicates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('replied', 'Replied'), ('closed', 'Closed')], default='closed', max_length=20)),
+                ('priority', models.PositiveSmallIntegerField(default=0)),
+                ('duplicate_of_id', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('reply_count', models.PositiveIntegerField(default=0)),
+                ('last_reply_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='support.category')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedReply',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('message', models.TextField()),
+                ('is_ai_generated', models.BooleanField(default=False)),
+                ('is_modified', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('responder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='support.archivedticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ticket', 'created_at'], name='archived_reply_ticket_idx')],
+            },
+        ),
+    ]
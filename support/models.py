@@ -21,11 +21,73 @@ class Ticket(models.Model):
     message = models.TextField()
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Set at submission by support.classifier: urgency from 0 to 100, and
+    # whether the category was predicted rather than chosen by the customer
+    priority = models.PositiveSmallIntegerField(default=0)
+    auto_categorized = models.BooleanField(default=False)
+    # MinHash signature of subject and message (support.duplicates); a
+    # near-identical earlier ticket from the same customer becomes duplicate_of
+    minhash = models.BinaryField(null=True, editable=False)
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates'
+    )
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Reply summary, kept up to date by support.services and support.signals
+    # (repair with `manage.py repair_ticket_counters`)
+    reply_count = models.PositiveIntegerField(default=0)
+    last_reply_at = models.DateTimeField(null=True, blank=True)
+    last_responder = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    
+    class Meta:
+        indexes = [
+            # Customer dashboard: a customer's tickets, newest first
+            models.Index(fields=['customer', '-created_at'], name='ticket_customer_created_idx'),
+            # Admin feed filtered by status, newest first (id breaks ties for keyset paging)
+            models.Index(fields=['status', '-created_at', '-id'], name='ticket_status_created_idx'),
+            # Unfiltered admin feed, newest first
+            models.Index(fields=['-created_at', '-id'], name='ticket_created_idx'),
+            # Admin dashboard polling for tickets changed since a cursor
+            models.Index(fields=['updated_at', 'id'], name='ticket_updated_idx'),
+            # The pending queue is the one agents work from; keep it small and hot
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='ticket_pending_created_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.subject} - {self.customer.username}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so a save can move the status counters
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        return instance
+
+class TicketLSHBucket(models.Model):
+    """One band of a ticket's MinHash signature; tickets sharing a key are duplicate candidates"""
+    key = models.BigIntegerField()
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='+')
+    
+    class Meta:
+        indexes = [
+            # Candidate lookup reads the ticket ids straight from the index
+            models.Index(fields=['key', 'ticket'], name='lsh_bucket_key_idx'),
+        ]
+
+class TicketStatusCount(models.Model):
+    """Number of tickets per status, so queue sizes are read from one small table"""
+    status = models.CharField(max_length=20, choices=Ticket.STATUS_CHOICES, unique=True)
+    count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.status}: {self.count}"
 
 class Reply(models.Model):
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='replies')
@@ -34,6 +96,91 @@ class Reply(models.Model):
     is_ai_generated = models.BooleanField(default=False)
     is_modified = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
+    # Sent with the reply form so a resubmitted form (double click, retry)
+    # doesn't create the reply twice
+    idempotency_key = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Conversation view: a ticket's replies in order
+            models.Index(fields=['ticket', 'created_at'], name='reply_ticket_created_idx'),
+        ]
     
     def __str__(self):
         return f"Reply to {self.ticket.subject} by {self.responder.username}"
+
+class ArchivedTicket(models.Model):
+    """
+    A closed ticket moved out of Ticket by `manage.py archive_closed_tickets`,
+    keeping its id; shown read-only on the ticket pages
+    """
+    id = models.IntegerField(primary_key=True)
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Ticket.STATUS_CHOICES, default='closed')
+    priority = models.PositiveSmallIntegerField(default=0)
+    # Plain id: the original may be archived or still live
+    duplicate_of_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    reply_count = models.PositiveIntegerField(default=0)
+    last_reply_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.subject} (archived)"
+
+class ArchivedReply(models.Model):
+    id = models.IntegerField(primary_key=True)
+    ticket = models.ForeignKey(ArchivedTicket, on_delete=models.CASCADE, related_name='replies')
+    responder = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    message = models.TextField()
+    is_ai_generated = models.BooleanField(default=False)
+    is_modified = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['ticket', 'created_at'], name='archived_reply_ticket_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Archived reply to {self.ticket_id} by {self.responder_id}"
+
+class AIDraft(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    ticket = models.OneToOneField(Ticket, on_delete=models.CASCADE, related_name='ai_draft')
+    provider = models.CharField(max_length=20)
+    message = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            # Workers poll for the oldest queued drafts
+            models.Index(fields=['status', 'created_at'], name='aidraft_status_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"AI draft for {self.ticket_id} ({self.status})"
+
+class RateLimitBucket(models.Model):
+    """Token bucket shared by all worker processes; see support.rate_limit"""
+    key = models.CharField(max_length=200, unique=True)
+    tokens = models.FloatField()
+    capacity = models.FloatField()
+    refill_rate = models.FloatField()  # tokens per second
+    updated_at = models.FloatField()  # Unix time of the last refill
+    
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.0f}/{self.capacity:.0f}"
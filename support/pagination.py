@@ -0,0 +1,149 @@
+import base64
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+def encode_cursor(created_at, pk):
+    """
+    Encode a (created_at, id) position as an opaque URL-safe cursor
+
+    Args:
+        created_at (datetime): Timestamp of the last row on the page
+        pk (int): Primary key of the last row on the page
+
+    Returns:
+        str: Cursor string to pass back as ?cursor=
+    """
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        tuple: (created_at, id) or None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_queryset(queryset, cursor=None, page_size=25):
+    """
+    Narrow a queryset to the rows of one page, newest first on (created_at, id)
+
+    Instead of OFFSET, rows are located relative to the last row seen, so
+    every page costs the same index range scan no matter how deep it is.
+    One extra row is included so callers can tell whether another page exists.
+
+    Args:
+        queryset (QuerySet): Rows with created_at and id fields
+        cursor (str): Cursor returned with the previous page, if any
+        page_size (int): Maximum number of rows on the page
+
+    Returns:
+        QuerySet: Sliced queryset of at most page_size + 1 rows
+    """
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        # Equivalent to (created_at, id) < (cursor), written so the leading
+        # created_at bound stays a single index range scan
+        queryset = queryset.filter(
+            Q(created_at__lte=created_at),
+            Q(created_at__lt=created_at) | Q(id__lt=pk),
+        )
+    return queryset.order_by('-created_at', '-id')[:page_size + 1]
+
+
+def keyset_page(queryset, cursor=None, page_size=25):
+    """
+    Return one page of a queryset ordered newest first on (created_at, id)
+
+    Args:
+        queryset (QuerySet): Rows with created_at and id fields
+        cursor (str): Cursor returned with the previous page, if any
+        page_size (int): Maximum number of rows to return
+
+    Returns:
+        tuple: (list of rows, next cursor or None when there are no more rows)
+    """
+    rows = list(keyset_queryset(queryset, cursor, page_size))
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
+
+
+def changes_queryset(queryset, cursor=None, page_size=100):
+    """
+    Narrow a queryset to rows changed after a cursor, oldest change first
+
+    Returns:
+        QuerySet: Sliced queryset of at most page_size + 1 rows
+    """
+    position = decode_cursor(cursor)
+    if position:
+        updated_at, pk = position
+        queryset = queryset.filter(
+            Q(updated_at__gte=updated_at),
+            Q(updated_at__gt=updated_at) | Q(id__gt=pk),
+        )
+    return queryset.order_by('updated_at', 'id')[:page_size + 1]
+
+
+def changes_page(queryset, cursor=None, page_size=100, settle_seconds=5):
+    """
+    Return rows changed after a cursor, oldest change first on (updated_at, id)
+
+    The returned cursor is held back settle_seconds behind the current time,
+    so a transaction that commits a little after the timestamp it wrote is
+    still picked up by the next call; rows changed within that window may be
+    returned twice and callers should treat them as upserts.
+
+    Args:
+        queryset (QuerySet): Rows with updated_at and id fields
+        cursor (str): Cursor returned by the previous call or changes_cursor()
+        page_size (int): Maximum number of rows to return
+        settle_seconds (float): How far behind the current time the cursor stays
+
+    Returns:
+        tuple: (list of rows, next cursor, whether more rows are waiting)
+    """
+    position = decode_cursor(cursor)
+    rows = list(changes_queryset(queryset, cursor, page_size))
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not rows:
+        return rows, cursor, False
+
+    last = (rows[-1].updated_at, rows[-1].id)
+    if not more:
+        # Stay behind the settle window, but never move back past the old cursor
+        settled = (timezone.now() - timedelta(seconds=settle_seconds), 0)
+        last = min(last, settled)
+        if position:
+            last = max(last, position)
+    return rows, encode_cursor(*last), more
+
+
+def changes_cursor(queryset):
+    """
+    Cursor positioned at the latest change in a queryset, to start polling from
+
+    Returns:
+        str: Cursor for changes_page, or None for an empty queryset
+    """
+    latest = queryset.order_by('-updated_at', '-id').values_list('updated_at', 'id').first()
+    return encode_cursor(*latest) if latest else None
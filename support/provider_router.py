@@ -0,0 +1,422 @@
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .ai_cache import (
+    acached_response, aget_cached_response, arecord_miss, aset_cached_response, cached_response,
+)
+from .rate_limit import RateLimited, estimate_tokens, get_limiter
+
+STATE_CACHE_ALIAS = 'ai_state'
+TEMPLATE_PROVIDER = 'template'
+
+TEMPLATE_REPLY = (
+    "Thank you for contacting us about \"{subject}\". We have received your request "
+    "and a support agent will get back to you shortly."
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+class AllProvidersFailed(Exception):
+    """Raised when every provider in the chain failed or was skipped"""
+
+class Provider:
+    """
+    One AI provider the router can call
+
+    Args:
+        name (str): Chain name, e.g. 'grok' or 'gemini-flash'
+        cache_name (str): Provider name used in response cache keys
+        model (str): Model name sent to the provider
+        prompt_version (int): Version of the provider's prompt template
+        request (callable): (subject, message) -> str, raising on failure
+        arequest (callable): Async counterpart of request
+        astream (callable): (subject, message) -> async iterator of text chunks
+        char_limit (int): Length the response is clipped to, if any
+    """
+
+    def __init__(self, name, cache_name, model, prompt_version, request, arequest, astream, char_limit=None):
+        self.name = name
+        self.cache_name = cache_name
+        self.model = model
+        self.prompt_version = prompt_version
+        self.request = request
+        self.arequest = arequest
+        self.astream = astream
+        self.char_limit = char_limit
+
+def get_providers():
+    """Return the AI providers by chain name"""
+    from . import async_providers, gemini_integration, grok_integration
+
+    def gemini(model_type):
+        model_name, _ = gemini_integration.get_gemini_model(model_type)
+        return Provider(
+            f'gemini-{model_type}', 'gemini', model_name, gemini_integration.PROMPT_VERSION,
+            lambda subject, message: gemini_integration.request_gemini_completion(subject, message, model_type),
+            lambda subject, message: async_providers.arequest_gemini_completion(subject, message, model_type),
+            lambda subject, message: async_providers.astream_gemini_completion(subject, message, model_type),
+        )
+
+    return {
+        'grok': Provider(
+            'grok', 'grok', grok_integration.GROK_MODEL, grok_integration.PROMPT_VERSION,
+            grok_integration.request_grok_completion,
+            async_providers.arequest_grok_completion,
+            async_providers.astream_grok_completion,
+            char_limit=255,
+        ),
+        'gemini-flash': gemini('flash'),
+        'gemini-pro': gemini('pro'),
+    }
+
+def template_reply(subject):
+    """Canned acknowledgement used when no AI provider is available"""
+    return TEMPLATE_REPLY.format(subject=subject)
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker with state shared through the cache backend
+
+    Closed: calls go through and their outcome and latency are kept in a
+    rolling window. When enough recent calls fail, or are slower than
+    slow_call_seconds, the circuit opens and calls fail fast for cooldown
+    seconds. After that one caller (across all processes sharing the cache)
+    is let through as a half-open probe: success closes the circuit, failure
+    opens it again.
+
+    The state lives in the 'ai_state' cache so every worker process sharing
+    that backend sees the same circuit. Updates to the rolling window are
+    read-modify-write, so concurrent workers may occasionally drop a sample.
+    """
+
+    def __init__(self, name, window=20, window_seconds=60, min_calls=5, error_rate=0.5,
+                 slow_call_seconds=10, slow_rate=0.5, cooldown=30):
+        self.name = name
+        self.window = window
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self.state_key = f'ai-breaker:{name}:state'
+        self.samples_key = f'ai-breaker:{name}:samples'
+        self.probe_key = f'ai-breaker:{name}:probe'
+
+    @property
+    def cache(self):
+        return caches[STATE_CACHE_ALIAS]
+
+    def state(self):
+        """Return 'closed', 'open' or 'half_open'"""
+        stored = self.cache.get(self.state_key)
+        if not stored:
+            return 'closed'
+        if time.time() < stored['opened_at'] + self.cooldown:
+            return 'open'
+        return 'half_open'
+
+    def allow(self):
+        """
+        Whether a call may go to the provider now
+
+        Returns:
+            str: Token to pass to record(): 'closed' for a regular call, or a
+                unique probe token for the one half-open probe; None if the
+                call may not go through
+        """
+        state = self.state()
+        if state == 'closed':
+            return 'closed'
+        if state == 'open':
+            return None
+        # Half-open: add() succeeds for exactly one caller until the probe finishes
+        token = uuid.uuid4().hex
+        return token if self.cache.add(self.probe_key, token, timeout=self.cooldown) else None
+
+    def record(self, ok, latency, token='closed'):
+        """
+        Record the outcome of a call and open or close the circuit accordingly
+
+        Args:
+            ok (bool): Whether the call succeeded
+            latency (float): Seconds the call took
+            token (str): What allow() returned for this call
+        """
+        now = time.time()
+        slow = latency >= self.slow_call_seconds
+
+        if token != 'closed':
+            # Only the probe that won allow() decides; one whose slot expired
+            # and went to another caller is ignored
+            if self.cache.get(self.probe_key) != token:
+                return
+            self.cache.delete(self.probe_key)
+            if ok and not slow:
+                self.cache.delete_many([self.state_key, self.samples_key])
+            else:
+                self._open(now)
+            return
+        if self.cache.get(self.state_key):
+            # Let through before the circuit opened; the probe decides now
+            return
+
+        samples = [
+            sample for sample in self.cache.get(self.samples_key, [])
+            if sample[0] > now - self.window_seconds
+        ][-(self.window - 1):]
+        samples.append((now, ok, latency))
+        self.cache.set(self.samples_key, samples, timeout=self.window_seconds)
+
+        if len(samples) >= self.min_calls:
+            errors = sum(1 for _, sample_ok, _ in samples if not sample_ok)
+            slow_calls = sum(1 for _, _, sample_latency in samples if sample_latency >= self.slow_call_seconds)
+            if errors / len(samples) >= self.error_rate or slow_calls / len(samples) >= self.slow_rate:
+                self._open(now)
+
+    def _open(self, now):
+        print(f"Circuit for AI provider '{self.name}' opened")
+        self.cache.set(self.state_key, {'opened_at': now}, timeout=None)
+        self.cache.delete(self.samples_key)
+
+    def call(self, func):
+        """Run func() through the breaker, raising CircuitOpenError if the circuit is open"""
+        token = self.allow()
+        if not token:
+            raise CircuitOpenError(f"Circuit open for {self.name}")
+        start_time = time.time()
+        try:
+            result = func()
+        except Exception:
+            self.record(False, time.time() - start_time, token)
+            raise
+        self.record(True, time.time() - start_time, token)
+        return result
+
+    async def acall(self, afunc):
+        """Async counterpart of call(); cache access runs in a thread"""
+        token = await sync_to_async(self.allow)()
+        if not token:
+            raise CircuitOpenError(f"Circuit open for {self.name}")
+        start_time = time.time()
+        try:
+            result = await afunc()
+        except Exception:
+            await sync_to_async(self.record)(False, time.time() - start_time, token)
+            raise
+        await sync_to_async(self.record)(True, time.time() - start_time, token)
+        return result
+
+    def snapshot(self):
+        """Current state and rolling-window statistics, for monitoring"""
+        samples = self.cache.get(self.samples_key, [])
+        stored = self.cache.get(self.state_key)
+        return {
+            'state': self.state(),
+            'calls': len(samples),
+            'errors': sum(1 for _, ok, _ in samples if not ok),
+            'slow_calls': sum(1 for _, _, latency in samples if latency >= self.slow_call_seconds),
+            'opened_at': stored['opened_at'] if stored else None,
+        }
+
+def get_breaker(name):
+    return CircuitBreaker(name, **getattr(settings, 'AI_CIRCUIT_BREAKER', {}))
+
+def get_chain(prefer=None, template=True):
+    """
+    Return the provider chain from settings
+
+    Args:
+        prefer (str): Provider to try first, ahead of the configured order
+        template (bool): Whether to end with the template reply
+    """
+    chain = list(getattr(settings, 'AI_PROVIDER_CHAIN', ['grok', 'gemini-flash', 'gemini-pro', TEMPLATE_PROVIDER]))
+    if prefer and prefer in chain:
+        chain.remove(prefer)
+        chain.insert(0, prefer)
+    if not template:
+        chain = [name for name in chain if name != TEMPLATE_PROVIDER]
+    return chain
+
+def route(subject, message, chain=None, regenerate=False, provider_slots=None, max_wait=None):
+    """
+    Generate a response from the first provider in the chain that succeeds
+
+    Cached responses are served without touching the breaker or the rate
+    limits. Providers whose circuit is open, or whose budget would not
+    allow the call within max_wait, are skipped without calling them.
+
+    Args:
+        subject (str): Ticket subject
+        message (str): Customer message
+        chain (list): Provider names in order; defaults to get_chain()
+        regenerate (bool): Skip the response cache
+        provider_slots (dict): Optional semaphores limiting concurrent calls per provider
+        max_wait (float): Seconds to wait for a provider's rate budget;
+            defaults to AI_RATE_LIMIT_MAX_WAIT
+
+    Returns:
+        tuple: (response, provider name)
+
+    Raises:
+        AllProvidersFailed: If no provider in the chain produced a response
+    """
+    providers = get_providers()
+    errors = []
+
+    for name in chain or get_chain():
+        if name == TEMPLATE_PROVIDER:
+            return template_reply(subject), name
+        provider = providers[name]
+        breaker = get_breaker(name)
+        slot = (provider_slots or {}).get(name)
+        limiter = get_limiter(name, provider.model)
+
+        def request():
+            if limiter:
+                # Don't spend budget on a provider that would fail fast anyway
+                if breaker.state() == 'open':
+                    raise CircuitOpenError(f"Circuit open for {name}")
+                limiter.acquire(estimate_tokens(subject, message), _max_wait(max_wait))
+            if slot:
+                with slot:
+                    return breaker.call(lambda: provider.request(subject, message))
+            return breaker.call(lambda: provider.request(subject, message))
+
+        try:
+            response = cached_response(
+                provider.cache_name, provider.model, subject, message,
+                request,
+                prompt_version=provider.prompt_version,
+                bypass=regenerate,
+            )
+            return response, name
+        except Exception as e:
+            print(f"AI provider '{name}' failed: {e}")
+            errors.append(f"{name}: {e}")
+
+    raise AllProvidersFailed('; '.join(errors))
+
+async def aroute(subject, message, chain=None, regenerate=False, max_wait=None):
+    """Async counterpart of route()"""
+    providers = get_providers()
+    errors = []
+
+    for name in chain or get_chain():
+        if name == TEMPLATE_PROVIDER:
+            return template_reply(subject), name
+        provider = providers[name]
+        breaker = get_breaker(name)
+        limiter = await sync_to_async(get_limiter)(name, provider.model)
+
+        async def request():
+            if limiter:
+                if await sync_to_async(breaker.state)() == 'open':
+                    raise CircuitOpenError(f"Circuit open for {name}")
+                await limiter.aacquire(estimate_tokens(subject, message), _max_wait(max_wait))
+            return await breaker.acall(lambda: provider.arequest(subject, message))
+
+        try:
+            response = await acached_response(
+                provider.cache_name, provider.model, subject, message,
+                request,
+                prompt_version=provider.prompt_version,
+                bypass=regenerate,
+            )
+            return response, name
+        except Exception as e:
+            print(f"AI provider '{name}' failed: {e}")
+            errors.append(f"{name}: {e}")
+
+    raise AllProvidersFailed('; '.join(errors))
+
+async def astream(subject, message, chain=None, regenerate=False, max_wait=None):
+    """
+    Stream a response from the first provider in the chain that starts one
+
+    Yields (provider name, text chunk). A provider that fails before its
+    first chunk is skipped for the next one; once text has been sent a
+    failure is raised to the caller, since the chunks cannot be taken back.
+    """
+    from .async_providers import aclip_stream
+
+    providers = get_providers()
+    errors = []
+
+    for name in chain or get_chain():
+        if name == TEMPLATE_PROVIDER:
+            yield name, template_reply(subject)
+            return
+        provider = providers[name]
+
+        if not regenerate:
+            cached = await aget_cached_response(
+                provider.cache_name, provider.model, subject, message, provider.prompt_version
+            )
+            if cached is not None:
+                yield name, cached
+                return
+
+        breaker = get_breaker(name)
+        if await sync_to_async(breaker.state)() == 'open':
+            errors.append(f"{name}: circuit open")
+            continue
+
+        limiter = await sync_to_async(get_limiter)(name, provider.model)
+        if limiter:
+            try:
+                await limiter.aacquire(estimate_tokens(subject, message), _max_wait(max_wait))
+            except RateLimited as e:
+                errors.append(f"{name}: {e}")
+                continue
+
+        token = await sync_to_async(breaker.allow)()
+        if not token:
+            errors.append(f"{name}: circuit open")
+            continue
+
+        await arecord_miss(regenerate)
+        start_time = time.time()
+        parts = []
+        try:
+            async for text in aclip_stream(provider.astream(subject, message), provider.char_limit):
+                parts.append(text)
+                yield name, text
+        except Exception as e:
+            await sync_to_async(breaker.record)(False, time.time() - start_time, token)
+            if parts:
+                raise
+            print(f"AI provider '{name}' failed: {e}")
+            errors.append(f"{name}: {e}")
+            continue
+
+        latency = time.time() - start_time
+        await sync_to_async(breaker.record)(True, latency, token)
+        await aset_cached_response(
+            provider.cache_name, provider.model, subject, message, ''.join(parts).strip(), latency,
+            provider.prompt_version,
+        )
+        return
+
+    raise AllProvidersFailed('; '.join(errors))
+
+def _max_wait(max_wait):
+    return getattr(settings, 'AI_RATE_LIMIT_MAX_WAIT', 2.0) if max_wait is None else max_wait
+
+def breaker_status():
+    """Snapshot of every provider's circuit breaker"""
+    return {name: get_breaker(name).snapshot() for name in get_providers()}
+
+def budget_status():
+    """Current rate budget use of every provider that has limits configured"""
+    status = {}
+    for name, provider in get_providers().items():
+        limiter = get_limiter(name, provider.model)
+        if limiter:
+            status[name] = limiter.status()
+    return status
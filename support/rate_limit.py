@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.db.models.lookups import GreaterThanOrEqual
+
+from .models import RateLimitBucket
+
+# Characters per token, roughly, for English text
+CHARS_PER_TOKEN = 4
+# Prompt template and system message around the ticket text
+PROMPT_OVERHEAD_CHARS = 700
+MAX_COMPLETION_TOKENS = 150
+
+# Buckets this process has already created or checked
+_ensured = set()
+
+class RateLimited(Exception):
+    """Raised when a provider's budget would not allow the call in time"""
+
+def estimate_tokens(subject, message):
+    """Estimate the tokens a completion request will use (prompt plus completion)"""
+    return (len(subject) + len(message) + PROMPT_OVERHEAD_CHARS) // CHARS_PER_TOKEN + MAX_COMPLETION_TOKENS
+
+def _available(now):
+    """SQL expression for the tokens in a bucket after refilling up to now"""
+    return Least(F('capacity'), F('tokens') + (Value(now) - F('updated_at')) * F('refill_rate'))
+
+class TokenBucket:
+    """
+    Token bucket stored in a database row, shared by every worker process
+
+    Each take() is a single conditional UPDATE that refills the bucket for
+    the time elapsed and removes the tokens only if enough are available,
+    so concurrent workers can never overspend the budget.
+
+    Args:
+        key (str): Bucket name, e.g. 'grok:llama:rpm'
+        per_minute (float): Budget per minute; also the burst capacity
+    """
+
+    def __init__(self, key, per_minute):
+        self.key = key
+        self.capacity = float(per_minute)
+        self.refill_rate = self.capacity / 60
+
+    def ensure(self):
+        """Create the bucket full, or update its budget if the settings changed"""
+        if (self.key, self.capacity) in _ensured:
+            return
+        bucket, created = RateLimitBucket.objects.get_or_create(
+            key=self.key,
+            defaults={
+                'tokens': self.capacity,
+                'capacity': self.capacity,
+                'refill_rate': self.refill_rate,
+                'updated_at': time.time(),
+            },
+        )
+        if not created and bucket.capacity != self.capacity:
+            RateLimitBucket.objects.filter(key=self.key).update(
+                capacity=self.capacity, refill_rate=self.refill_rate
+            )
+        _ensured.add((self.key, self.capacity))
+
+    def take(self, amount):
+        """
+        Remove tokens if available
+
+        Returns:
+            bool: Whether the tokens were taken
+        """
+        now = time.time()
+        return bool(
+            RateLimitBucket.objects
+            .filter(GreaterThanOrEqual(_available(now), amount), key=self.key)
+            .update(tokens=_available(now) - amount, updated_at=now)
+        )
+
+    def give_back(self, amount):
+        """Return tokens taken for a call that was not made"""
+        RateLimitBucket.objects.filter(key=self.key).update(
+            tokens=Least(F('capacity'), F('tokens') + amount)
+        )
+
+    def wait_time(self, amount):
+        """Seconds until amount tokens will be available (inf if above capacity)"""
+        if amount > self.capacity:
+            return float('inf')
+        bucket = RateLimitBucket.objects.filter(key=self.key).values('tokens', 'updated_at').first()
+        if bucket is None:
+            return 0.0
+        available = min(self.capacity, bucket['tokens'] + (time.time() - bucket['updated_at']) * self.refill_rate)
+        return max(0.0, (amount - available) / self.refill_rate)
+
+    def status(self):
+        bucket = RateLimitBucket.objects.filter(key=self.key).values('tokens', 'updated_at').first()
+        available = self.capacity
+        if bucket:
+            available = min(self.capacity, bucket['tokens'] + (time.time() - bucket['updated_at']) * self.refill_rate)
+        return {
+            'available': round(available, 1),
+            'capacity': self.capacity,
+            'used': round(1 - available / self.capacity, 3) if self.capacity else 0.0,
+        }
+
+class ProviderLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets for one provider and model
+
+    Args:
+        provider (str): Chain name, e.g. 'grok'
+        model (str): Model name the budget applies to
+        rpm (int): Requests per minute
+        tpm (int): Tokens per minute
+    """
+
+    def __init__(self, provider, model, rpm, tpm):
+        self.provider = provider
+        self.requests = TokenBucket(f'{provider}:{model}:rpm', rpm)
+        self.tokens = TokenBucket(f'{provider}:{model}:tpm', tpm)
+        self.requests.ensure()
+        self.tokens.ensure()
+
+    def try_acquire(self, tokens):
+        """Take one request and the given tokens from the budget, all or nothing"""
+        if not self.requests.take(1):
+            return False
+        if not self.tokens.take(tokens):
+            self.requests.give_back(1)
+            return False
+        return True
+
+    def wait_time(self, tokens):
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def acquire(self, tokens, max_wait=0.0):
+        """
+        Take budget for a call, waiting up to max_wait seconds for it to refill
+
+        Raises:
+            RateLimited: If the budget will not allow the call within max_wait,
+            so the caller can shed the call instead of having it rejected
+        """
+        deadline = time.time() + max_wait
+        while not self.try_acquire(tokens):
+            wait = self.wait_time(tokens)
+            if time.time() + wait > deadline:
+                raise RateLimited(f"{self.provider} budget exhausted (retry in {wait:.1f}s)")
+            time.sleep(max(wait, 0.05))
+
+    async def aacquire(self, tokens, max_wait=0.0):
+        """Async counterpart of acquire()"""
+        deadline = time.time() + max_wait
+        while not await sync_to_async(self.try_acquire)(tokens):
+            wait = await sync_to_async(self.wait_time)(tokens)
+            if time.time() + wait > deadline:
+                raise RateLimited(f"{self.provider} budget exhausted (retry in {wait:.1f}s)")
+            await asyncio.sleep(max(wait, 0.05))
+
+    def status(self):
+        return {'rpm': self.requests.status(), 'tpm': self.tokens.status()}
+
+def get_limiter(provider, model):
+    """
+    Return the limiter for a provider, or None if it has no budget configured
+    """
+    budget = getattr(settings, 'AI_RATE_LIMITS', {}).get(provider)
+    if not budget:
+        return None
+    return ProviderLimiter(provider, model, budget['rpm'], budget['tpm'])
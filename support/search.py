@@ -0,0 +1,236 @@
+import html
+import re
+
+from django.db import connection, transaction
+from django.utils.safestring import mark_safe
+
+from .models import Reply, Ticket
+
+# Created by migration 0006_ticket_search_index
+SQLITE_TABLE = 'support_ticket_fts'
+POSTGRES_TABLE = 'support_ticket_search'
+POSTGRES_CONFIG = 'english'
+
+# Subject matches count for more than matches in the message or replies
+SUBJECT_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+SNIPPET_WORDS = 16
+
+# Private-use characters mark matches in the raw text, so the text can be
+# HTML-escaped before the markers become <mark> tags
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+
+def search_backend():
+    """Return 'sqlite', 'postgresql', or None if the database has no full-text index"""
+    if connection.vendor in ('sqlite', 'postgresql'):
+        return connection.vendor
+    return None
+
+def ticket_document(ticket_id):
+    """
+    Build the indexed text of a ticket: its subject, and its message followed by every reply
+
+    Returns:
+        tuple: (subject, body), or None if the ticket does not exist
+    """
+    ticket = Ticket.objects.filter(id=ticket_id).values('subject', 'message').first()
+    if ticket is None:
+        return None
+    replies = Reply.objects.filter(ticket_id=ticket_id).order_by('created_at').values_list('message', flat=True)
+    return ticket['subject'], '\n'.join([ticket['message'], *replies])
+
+def index_ticket(ticket_id):
+    """Add or refresh one ticket in the search index"""
+    backend = search_backend()
+    if backend is None:
+        return
+    document = ticket_document(ticket_id)
+    if document is None:
+        remove_ticket(ticket_id)
+        return
+
+    # One transaction, so concurrent refreshes of a ticket cannot interleave
+    with transaction.atomic(), connection.cursor() as cursor:
+        if backend == 'sqlite':
+            # FTS5 tables have no upsert
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [ticket_id])
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, subject, body) VALUES (%s, %s, %s)",
+                [ticket_id, *document],
+            )
+        else:
+            cursor.execute(
+                f"""
+                INSERT INTO {POSTGRES_TABLE} (ticket_id, subject, body, document)
+                VALUES (%s, %s, %s, {_postgres_document('%s', '%s')})
+                ON CONFLICT (ticket_id) DO UPDATE SET
+                    subject = EXCLUDED.subject, body = EXCLUDED.body, document = EXCLUDED.document
+                """,
+                [ticket_id, *document, *document],
+            )
+
+def remove_ticket(ticket_id):
+    """Drop a ticket from the search index"""
+    remove_tickets([ticket_id])
+
+def remove_tickets(ticket_ids):
+    """Drop several tickets from the search index with one statement"""
+    backend = search_backend()
+    if backend is None or not ticket_ids:
+        return
+    table, column = (SQLITE_TABLE, 'rowid') if backend == 'sqlite' else (POSTGRES_TABLE, 'ticket_id')
+    placeholders = ', '.join(['%s'] * len(ticket_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", list(ticket_ids))
+
+def rebuild_index(batch_size=500):
+    """
+    Empty the search index and index every ticket again, in batches of ticket ids
+
+    Yields:
+        int: Number of tickets indexed so far, after each batch
+    """
+    backend = search_backend()
+    if backend is None:
+        return
+    table = SQLITE_TABLE if backend == 'sqlite' else POSTGRES_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+
+    indexed = 0
+    last_id = 0
+    while True:
+        ticket_ids = list(
+            Ticket.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ticket_ids:
+            break
+        _index_batch(backend, ticket_ids)
+        indexed += len(ticket_ids)
+        last_id = ticket_ids[-1]
+        yield indexed
+
+    if backend == 'sqlite':
+        # Merge the index b-trees written by the batches into one
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {SQLITE_TABLE} ({SQLITE_TABLE}) VALUES ('optimize')")
+
+def _index_batch(backend, ticket_ids):
+    subjects = {}
+    bodies = {}
+    for ticket_id, subject, message in Ticket.objects.filter(id__in=ticket_ids).values_list('id', 'subject', 'message'):
+        subjects[ticket_id] = subject
+        bodies[ticket_id] = [message]
+    replies = (
+        Reply.objects.filter(ticket_id__in=ticket_ids)
+        .order_by('ticket_id', 'created_at')
+        .values_list('ticket_id', 'message')
+    )
+    for ticket_id, message in replies:
+        bodies[ticket_id].append(message)
+
+    rows = [(ticket_id, subjects[ticket_id], '\n'.join(parts)) for ticket_id, parts in bodies.items()]
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.executemany(f"INSERT INTO {SQLITE_TABLE} (rowid, subject, body) VALUES (%s, %s, %s)", rows)
+        else:
+            cursor.executemany(
+                f"""
+                INSERT INTO {POSTGRES_TABLE} (ticket_id, subject, body, document)
+                VALUES (%s, %s, %s, {_postgres_document('%s', '%s')})
+                """,
+                [(ticket_id, subject, body, subject, body) for ticket_id, subject, body in rows],
+            )
+
+def _postgres_document(subject, body):
+    return (
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', {subject}), 'A') || "
+        f"setweight(to_tsvector('{POSTGRES_CONFIG}', {body}), 'B')"
+    )
+
+def fts5_query(query):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one as a prefix
+
+    Quoting each word keeps FTS5 syntax (AND, NEAR, quotes, column filters)
+    typed by the user from being interpreted.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+def highlight(text):
+    """HTML-escape indexed text and turn the match markers into <mark> tags"""
+    return mark_safe(
+        html.escape(text).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+    )
+
+def search_tickets(query, limit=50):
+    """
+    Search tickets and their replies, best matches first
+
+    Args:
+        query (str): Words typed by the user
+        limit (int): Maximum number of results
+
+    Returns:
+        list: Dicts with ticket_id, rank (higher is better), and subject and
+        snippet as safe HTML with the matched words in <mark> tags
+    """
+    backend = search_backend()
+    if backend is None or not query.strip():
+        return []
+
+    with connection.cursor() as cursor:
+        if backend == 'sqlite':
+            match = fts5_query(query)
+            if not match:
+                return []
+            cursor.execute(
+                f"""
+                SELECT rowid,
+                       bm25({SQLITE_TABLE}, %s, %s) AS rank,
+                       highlight({SQLITE_TABLE}, 0, %s, %s),
+                       snippet({SQLITE_TABLE}, 1, %s, %s, '...', %s)
+                FROM {SQLITE_TABLE}
+                WHERE {SQLITE_TABLE} MATCH %s
+                ORDER BY rank
+                LIMIT %s
+                """,
+                [SUBJECT_WEIGHT, BODY_WEIGHT, MATCH_START, MATCH_END,
+                 MATCH_START, MATCH_END, SNIPPET_WORDS, match, limit],
+            )
+            # bm25() is lower for better matches
+            rows = [(ticket_id, -rank, subject, snippet) for ticket_id, rank, subject, snippet in cursor.fetchall()]
+        else:
+            headline = f'StartSel={MATCH_START}, StopSel={MATCH_END}'
+            cursor.execute(
+                f"""
+                SELECT ticket_id,
+                       ts_rank_cd(document, query) AS rank,
+                       ts_headline('{POSTGRES_CONFIG}', subject, query, %s),
+                       ts_headline('{POSTGRES_CONFIG}', body, query, %s)
+                FROM {POSTGRES_TABLE}, websearch_to_tsquery('{POSTGRES_CONFIG}', %s) AS query
+                WHERE document @@ query
+                ORDER BY rank DESC
+                LIMIT %s
+                """,
+                [headline + ', HighlightAll=true', f'{headline}, MaxWords={SNIPPET_WORDS}, MinWords=5', query, limit],
+            )
+            rows = cursor.fetchall()
+
+    return [
+        {
+            'ticket_id': ticket_id,
+            'rank': round(rank, 4),
+            'subject': highlight(subject),
+            'snippet': highlight(snippet),
+        }
+        for ticket_id, rank, subject, snippet in rows
+    ]
+
+def search_ticket_ids(query, limit=1000):
+    """Ids of the tickets matching a search, best matches first"""
+    return [hit['ticket_id'] for hit in search_tickets(query, limit)]
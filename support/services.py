@@ -0,0 +1,129 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Reply, Ticket, TicketStatusCount
+
+def submit_reply(ticket, responder, message, is_ai_generated=False, idempotency_key=None):
+    """
+    Add a reply to a ticket and mark the ticket replied, as one transaction
+
+    Args:
+        ticket (Ticket): Ticket being answered
+        responder (User): Author of the reply
+        message (str): Reply text
+        is_ai_generated (bool): Whether the text came from an AI suggestion
+        idempotency_key (UUID): Key sent with the reply form; a second
+            submission with the same key returns the first reply instead of
+            creating another
+
+    Returns:
+        tuple: (Reply, created)
+    """
+    if idempotency_key:
+        existing = Reply.objects.filter(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing, False
+
+    try:
+        with transaction.atomic():
+            # Insert first: a duplicate key fails here, before the ticket row is touched
+            reply = Reply.objects.create(
+                ticket=ticket,
+                responder=responder,
+                message=message,
+                is_ai_generated=is_ai_generated,
+                idempotency_key=idempotency_key,
+            )
+            # Lock the ticket row (on PostgreSQL; SQLite already holds the
+            # write lock) so concurrent replies agree on the previous status
+            previous_status = (
+                Ticket.objects.select_for_update().filter(pk=ticket.pk).values_list('status', flat=True).get()
+            )
+            Ticket.objects.filter(pk=ticket.pk).update(
+                status='replied',
+                updated_at=timezone.now(),
+                reply_count=F('reply_count') + 1,
+                last_reply_at=reply.created_at,
+                last_responder=responder,
+            )
+            move_status_count(previous_status, 'replied')
+    except IntegrityError:
+        # A concurrent submission with the same key committed first
+        existing = idempotency_key and Reply.objects.filter(idempotency_key=idempotency_key).first()
+        if not existing:
+            raise
+        return existing, False
+
+    ticket.status = ticket._loaded_status = 'replied'
+    ticket.last_reply_at = reply.created_at
+    ticket.last_responder = responder
+    ticket.refresh_from_db(fields=['reply_count', 'updated_at'])
+    return reply, True
+
+def move_status_count(old_status, new_status, tickets=1):
+    """
+    Move tickets between status counters
+
+    Args:
+        old_status (str): Previous status, or None for new tickets
+        new_status (str): New status, or None for deleted tickets
+        tickets (int): Number of tickets moved
+    """
+    if old_status == new_status or not tickets:
+        return
+    if old_status:
+        _add_to_status_count(old_status, -tickets)
+    if new_status:
+        _add_to_status_count(new_status, tickets)
+
+def _add_to_status_count(status, amount):
+    if not TicketStatusCount.objects.filter(status=status).update(count=F('count') + amount):
+        # No row yet for this status
+        TicketStatusCount.objects.get_or_create(status=status)
+        TicketStatusCount.objects.filter(status=status).update(count=F('count') + amount)
+
+def status_counts():
+    """
+    Number of tickets per status, read from the counter table
+
+    Returns:
+        dict: Count for every status in Ticket.STATUS_CHOICES
+    """
+    counts = dict.fromkeys(dict(Ticket.STATUS_CHOICES), 0)
+    counts.update(TicketStatusCount.objects.values_list('status', 'count'))
+    return counts
+
+def reply_summary_expressions():
+    """Subquery expressions that recompute a ticket's reply summary in an UPDATE"""
+    replies = Reply.objects.filter(ticket=OuterRef('pk'))
+    latest = replies.order_by('-created_at', '-id')
+    return {
+        'reply_count': Coalesce(
+            Subquery(replies.order_by().values('ticket').annotate(total=Count('id')).values('total')), 0
+        ),
+        'last_reply_at': Subquery(latest.values('created_at')[:1]),
+        'last_responder': Subquery(latest.values('responder')[:1]),
+    }
+
+def refresh_reply_summaries(tickets):
+    """
+    Recompute reply_count, last_reply_at and last_responder with one UPDATE
+
+    Args:
+        tickets (QuerySet): Tickets to refresh
+
+    Returns:
+        int: Number of tickets updated
+    """
+    return tickets.update(**reply_summary_expressions())
+
+def rebuild_status_counts():
+    """Recount tickets per status from the Ticket table"""
+    counts = dict.fromkeys(dict(Ticket.STATUS_CHOICES), 0)
+    counts.update(Ticket.objects.order_by().values_list('status').annotate(total=Count('id')))
+    with transaction.atomic():
+        for status, count in counts.items():
+            TicketStatusCount.objects.update_or_create(status=status, defaults={'count': count})
+    return counts
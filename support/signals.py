@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .dashboard_cache import invalidate_customer
+from .duplicates import index_signature
+from .models import Reply, Ticket
+from .search import index_ticket, remove_ticket
+from .services import move_status_count, reply_summary_expressions
+from .similarity import add_ticket as add_similar_ticket
+
+# Fields that make up a ticket's search document
+INDEXED_TICKET_FIELDS = {'subject', 'message'}
+
+@receiver(post_save, sender=Ticket, dispatch_uid='support.index_ticket')
+def ticket_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Status changes saved with update_fields don't touch the indexed text
+    if update_fields and not INDEXED_TICKET_FIELDS & set(update_fields):
+        return
+    index_ticket(instance.id)
+
+@receiver(post_delete, sender=Ticket, dispatch_uid='support.unindex_ticket')
+def ticket_deleted(sender, instance, **kwargs):
+    remove_ticket(instance.id)
+
+@receiver(post_save, sender=Reply, dispatch_uid='support.index_reply')
+@receiver(post_delete, sender=Reply, dispatch_uid='support.unindex_reply')
+def reply_changed(sender, instance, origin=None, **kwargs):
+    # Nothing to reindex when the ticket itself is being deleted
+    if isinstance(origin, Ticket):
+        return
+    # Replies are indexed as part of their ticket's document
+    index_ticket(instance.ticket_id)
+
+@receiver(post_save, sender=Ticket, dispatch_uid='support.count_ticket_status')
+def ticket_status_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        move_status_count(None, instance.status)
+    elif update_fields is None or 'status' in update_fields:
+        previous = getattr(instance, '_loaded_status', None)
+        if previous is not None:
+            move_status_count(previous, instance.status)
+    instance._loaded_status = instance.status
+
+@receiver(post_delete, sender=Ticket, dispatch_uid='support.uncount_ticket_status')
+def ticket_status_deleted(sender, instance, **kwargs):
+    move_status_count(getattr(instance, '_loaded_status', instance.status), None)
+
+@receiver(post_delete, sender=Reply, dispatch_uid='support.reply_summary')
+def reply_deleted(sender, instance, origin=None, **kwargs):
+    # submit_reply keeps the summary current for new replies; a deleted
+    # reply may have been the latest, so recompute it from what is left
+    # (and touch updated_at for the dashboard changes feed and page ETags)
+    if isinstance(origin, Ticket):
+        return
+    Ticket.objects.filter(pk=instance.ticket_id).update(updated_at=timezone.now(), **reply_summary_expressions())
+
+@receiver(post_save, sender=Ticket, dispatch_uid='support.invalidate_dashboard_ticket')
+@receiver(post_delete, sender=Ticket, dispatch_uid='support.invalidate_dashboard_ticket_delete')
+def ticket_changed_for_dashboard(sender, instance, **kwargs):
+    invalidate_customer(instance.customer_id)
+
+@receiver(post_save, sender=Reply, dispatch_uid='support.invalidate_dashboard_reply')
+@receiver(post_delete, sender=Reply, dispatch_uid='support.invalidate_dashboard_reply_delete')
+def reply_changed_for_dashboard(sender, instance, origin=None, **kwargs):
+    # A reply changes the ticket's status on the customer's list; a ticket
+    # deletion already invalidated it
+    if isinstance(origin, Ticket):
+        return
+    invalidate_customer(instance.ticket.customer_id)
+
+@receiver(post_save, sender=Ticket, dispatch_uid='support.index_similar_ticket')
+def ticket_created_for_similarity(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    def add():
+        try:
+            add_similar_ticket(instance)
+        except Exception as e:
+            # The index is rebuilt by build_similarity_index; never fail the request over it
+            print(f"Similar-ticket index update failed for ticket {instance.id}: {e}")
+
+    transaction.on_commit(add)
+
+@receiver(post_save, sender=Ticket, dispatch_uid='support.index_ticket_signature')
+def ticket_created_for_duplicates(sender, instance, created, **kwargs):
+    if created:
+        index_signature(instance)
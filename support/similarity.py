@@ -0,0 +1,338 @@
+"""
+Similar-ticket index: hashed TF-IDF vectors of ticket subject and message
+in a memory-mapped NumPy matrix, searched by cosine similarity.
+
+Files in SIMILAR_TICKETS_INDEX_DIR:
+
+    meta.json           dimensions, row count, capacity and file generation
+    vectors-<gen>.npy   capacity x dimensions float32 matrix, rows L2-normalized
+    ids-<gen>.npy       ticket id of each row
+    idf.npy             inverse document frequency of each hash bucket
+
+`manage.py build_similarity_index` writes a fresh index; new tickets are
+appended as they are created, weighted with the IDF of the last build.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .models import ArchivedReply, ArchivedTicket, Reply, Ticket
+from .text_features import hashed_counts, ticket_text, tokenize, word_ngrams
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from several processes aren't serialized
+    fcntl = None
+
+META_FILE = 'meta.json'
+IDF_FILE = 'idf.npy'
+# Nearest tickets considered before keeping the answered ones
+CANDIDATES = 200
+
+_reader = None
+_reader_lock = threading.Lock()
+
+def index_dir():
+    return Path(getattr(settings, 'SIMILAR_TICKETS_INDEX_DIR', Path(settings.BASE_DIR) / '.cache' / 'similar_tickets'))
+
+def dimensions():
+    return getattr(settings, 'SIMILAR_TICKETS_DIMENSIONS', 512)
+
+def features(subject, message):
+    # Order numbers and the like make tickets about the same issue look different
+    tokens = [token for token in tokenize(ticket_text(subject, message)) if not token.isdigit()]
+    return word_ngrams(tokens, 2)
+
+def vectorize(subject, message, idf):
+    """
+    Hashed TF-IDF vector of a ticket, L2-normalized
+
+    Args:
+        subject (str): Ticket subject
+        message (str): Ticket message
+        idf (ndarray): Inverse document frequency per bucket
+
+    Returns:
+        ndarray: float32 vector of len(idf) values (all zero for an empty text)
+    """
+    vector = np.zeros(len(idf), dtype=np.float32)
+    buckets, signs, counts = hashed_counts(features(subject, message), len(idf))
+    # Sublinear term frequency, so a repeated word doesn't dominate
+    np.add.at(vector, buckets, signs * (1 + np.log(counts)) * idf[buckets])
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def build_index(load_batches, progress=None):
+    """
+    Write a new index from every ticket and swap it in
+
+    Args:
+        load_batches (callable): Returns an iterable of lists of
+            (ticket_id, subject, message); called twice, once to count
+            document frequencies and once to write the vectors
+        progress (callable): Called with the number of tickets written so far
+
+    Returns:
+        int: Number of tickets indexed
+    """
+    size = dimensions()
+    document_frequency = np.zeros(size, dtype=np.float64)
+    documents = 0
+    for batch in load_batches():
+        for _, subject, message in batch:
+            buckets, _, _ = hashed_counts(features(subject, message), size)
+            document_frequency[buckets] += 1
+        documents += len(batch)
+    idf = (np.log((1 + documents) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    path = index_dir()
+    path.mkdir(parents=True, exist_ok=True)
+    with _write_lock(path):
+        old_meta = _read_meta(path)
+        generation = (old_meta['generation'] + 1) if old_meta else 1
+        capacity = max(documents * 2, 1024)
+        vectors, ids = _create_arrays(path, generation, capacity, size)
+
+        count = 0
+        for batch in load_batches():
+            for ticket_id, subject, message in batch:
+                vectors[count] = vectorize(subject, message, idf)
+                ids[count] = ticket_id
+                count += 1
+            if progress:
+                progress(count)
+        vectors.flush()
+        ids.flush()
+
+        np.save(path / IDF_FILE, idf)
+        _write_meta(path, {
+            'dimensions': size, 'count': count, 'capacity': capacity,
+            'documents': documents, 'generation': generation,
+        })
+        if old_meta:
+            _remove_generation(path, old_meta['generation'])
+    return count
+
+def add_ticket(ticket):
+    """
+    Append a ticket to the index, if one has been built
+
+    Args:
+        ticket (Ticket): Ticket with id, subject and message
+    """
+    path = index_dir()
+    if not (path / META_FILE).exists():
+        return
+    with _write_lock(path):
+        meta = _read_meta(path)
+        idf = np.load(path / IDF_FILE)
+        vectors, ids = _open_arrays(path, meta['generation'], 'r+')
+        if meta['count'] == meta['capacity']:
+            # Full: copy into arrays twice the size under a new generation
+            old_generation = meta['generation']
+            meta['generation'] += 1
+            meta['capacity'] *= 2
+            new_vectors, new_ids = _create_arrays(path, meta['generation'], meta['capacity'], meta['dimensions'])
+            new_vectors[:meta['count']] = vectors[:meta['count']]
+            new_ids[:meta['count']] = ids[:meta['count']]
+            del vectors, ids
+            vectors, ids = new_vectors, new_ids
+        else:
+            old_generation = None
+
+        vectors[meta['count']] = vectorize(ticket.subject, ticket.message, idf)
+        ids[meta['count']] = ticket.id
+        vectors.flush()
+        ids.flush()
+        meta['count'] += 1
+        _write_meta(path, meta)
+        if old_generation:
+            _remove_generation(path, old_generation)
+
+def similar_ticket_ids(subject, message, limit=5, exclude=()):
+    """
+    Ids of the indexed tickets most similar to a text, best first
+
+    Args:
+        subject (str): Subject to compare
+        message (str): Message to compare
+        limit (int): Maximum number of results
+        exclude (iterable): Ticket ids to leave out, e.g. the ticket itself
+
+    Returns:
+        list: (ticket_id, cosine similarity) tuples
+    """
+    reader = _get_reader()
+    if reader is None or reader['count'] == 0:
+        return []
+    query = vectorize(subject, message, reader['idf'])
+    if not query.any():
+        return []
+
+    count = reader['count']
+    scores = reader['vectors'][:count] @ query
+    exclude = set(exclude)
+    wanted = min(count, limit + len(exclude))
+    # Partial sort: only the top rows are ordered
+    top = np.argpartition(-scores, wanted - 1)[:wanted]
+    top = top[np.argsort(-scores[top])]
+
+    results = []
+    for row in top:
+        ticket_id = int(reader['ids'][row])
+        if ticket_id in exclude or scores[row] <= 0:
+            continue
+        results.append((ticket_id, float(scores[row])))
+    return results[:limit]
+
+def similar_resolved_tickets(ticket, limit=3, min_score=None):
+    """
+    Answered tickets most similar to a ticket, each with its latest staff reply
+
+    Args:
+        ticket (Ticket): Ticket to find matches for
+        limit (int): Maximum number of tickets
+        min_score (float): Lowest similarity shown (SIMILAR_TICKETS_MIN_SCORE)
+
+    Returns:
+        list: Tickets with `similarity` and `suggested_reply` attributes
+    """
+    if min_score is None:
+        min_score = getattr(settings, 'SIMILAR_TICKETS_MIN_SCORE', 0.3)
+    # Over-fetch: deleted and unanswered tickets are dropped below, and a
+    # common issue can have many unanswered copies ranked above the answered ones
+    matches = [
+        (ticket_id, score)
+        for ticket_id, score in similar_ticket_ids(ticket.subject, ticket.message, CANDIDATES, exclude=[ticket.id])
+        if score >= min_score
+    ]
+    if not matches:
+        return []
+
+    match_ids = [ticket_id for ticket_id, _ in matches]
+    tickets = Ticket.objects.filter(
+        id__in=match_ids, status__in=['replied', 'closed'], reply_count__gt=0,
+    ).only('id', 'subject', 'status', 'last_reply_at').in_bulk()
+    # Answered tickets moved out by archive_closed_tickets keep their ids
+    archived = ArchivedTicket.objects.filter(
+        id__in=set(match_ids) - tickets.keys(), reply_count__gt=0,
+    ).only('id', 'subject', 'status', 'last_reply_at').in_bulk()
+    tickets.update(archived)
+    found = [(tickets[ticket_id], score) for ticket_id, score in matches if ticket_id in tickets][:limit]
+
+    replies = {}
+    for model, ids in (
+        (Reply, [match.id for match, _ in found if match.id not in archived]),
+        (ArchivedReply, [match.id for match, _ in found if match.id in archived]),
+    ):
+        if not ids:
+            continue
+        for reply in (
+            model.objects.filter(ticket_id__in=ids, responder__is_staff=True)
+            .only('id', 'ticket_id', 'message', 'created_at').order_by('ticket_id', '-created_at')
+        ):
+            replies.setdefault(reply.ticket_id, reply)
+
+    results = []
+    for match, score in found:
+        match.similarity = score
+        match.suggested_reply = replies.get(match.id)
+        results.append(match)
+    return results
+
+def reusable_reply(ticket):
+    """
+    A past staff reply good enough to draft from without calling an LLM
+
+    Returns:
+        tuple: (message, source Ticket) of the closest answered ticket scoring
+        at least SIMILAR_REPLY_REUSE_THRESHOLD, or None
+    """
+    threshold = getattr(settings, 'SIMILAR_REPLY_REUSE_THRESHOLD', 0.85)
+    for match in similar_resolved_tickets(ticket, limit=1, min_score=threshold):
+        if match.suggested_reply:
+            return match.suggested_reply.message, match
+    return None
+
+def index_status():
+    """Row count and size of the index, or None if it hasn't been built"""
+    reader = _get_reader()
+    if reader is None:
+        return None
+    return {
+        'tickets': reader['count'],
+        'dimensions': reader['vectors'].shape[1],
+        'capacity': reader['vectors'].shape[0],
+    }
+
+def _get_reader():
+    """Memory-mapped arrays of the current index, reopened when meta.json changes"""
+    global _reader
+    path = index_dir()
+    try:
+        stamp = (path / META_FILE).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _reader_lock:
+        if _reader is None or _reader['stamp'] != stamp:
+            meta = _read_meta(path)
+            try:
+                vectors, ids = _open_arrays(path, meta['generation'], 'r')
+                idf = np.load(path / IDF_FILE)
+            except FileNotFoundError:
+                # Replaced by a rebuild while we were reading meta.json
+                return _reader
+            _reader = {'stamp': stamp, 'count': meta['count'], 'vectors': vectors, 'ids': ids, 'idf': idf}
+        return _reader
+
+def _read_meta(path):
+    try:
+        return json.loads((path / META_FILE).read_text())
+    except FileNotFoundError:
+        return None
+
+def _write_meta(path, meta):
+    # Write then rename, so readers never see a half-written file
+    tmp = path / f'{META_FILE}.tmp'
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, path / META_FILE)
+
+def _array_paths(path, generation):
+    return path / f'vectors-{generation}.npy', path / f'ids-{generation}.npy'
+
+def _create_arrays(path, generation, capacity, size):
+    vectors_path, ids_path = _array_paths(path, generation)
+    vectors = np.lib.format.open_memmap(vectors_path, mode='w+', dtype=np.float32, shape=(capacity, size))
+    ids = np.lib.format.open_memmap(ids_path, mode='w+', dtype=np.int64, shape=(capacity,))
+    return vectors, ids
+
+def _open_arrays(path, generation, mode):
+    vectors_path, ids_path = _array_paths(path, generation)
+    return np.load(vectors_path, mmap_mode=mode), np.load(ids_path, mmap_mode=mode)
+
+def _remove_generation(path, generation):
+    # Readers that still map the old files keep them until they reopen
+    for file in _array_paths(path, generation):
+        try:
+            file.unlink(missing_ok=True)
+        except OSError:
+            # Windows won't delete a file that is still mapped
+            pass
+
+@contextmanager
+def _write_lock(path):
+    """Exclusive lock on the index directory, shared by all processes on the host"""
+    with open(path / 'lock', 'a') as file:
+        if fcntl:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_UN)
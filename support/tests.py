@@ -0,0 +1,224 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import rate_limit
+from .models import RateLimitBucket
+from .provider_router import CircuitBreaker, CircuitOpenError
+from .rate_limit import ProviderLimiter, RateLimited, TokenBucket
+
+# A private in-memory circuit store, so tests never share state with each
+# other or with a running server's file cache
+AI_STATE_CACHES = {
+    **settings.CACHES,
+    'ai_state': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'support-tests-ai-state',
+    },
+}
+
+
+class FakeClock:
+    """Stands in for time.time() so cooldowns pass without sleeping"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@override_settings(CACHES=AI_STATE_CACHES)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('support.provider_router.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(
+            'test', window=10, window_seconds=60, min_calls=3, error_rate=0.5,
+            slow_call_seconds=5, slow_rate=0.5, cooldown=30,
+        )
+        self.breaker.cache.clear()
+
+    def fail(self, times=1, latency=0.1):
+        for _ in range(times):
+            self.breaker.record(False, latency, self.breaker.allow())
+
+    def open_circuit(self):
+        self.fail(self.breaker.min_calls)
+        self.assertEqual(self.breaker.state(), 'open')
+
+    def test_stays_closed_below_min_calls(self):
+        self.fail(self.breaker.min_calls - 1)
+        self.assertEqual(self.breaker.state(), 'closed')
+        self.assertEqual(self.breaker.allow(), 'closed')
+
+    def test_opens_after_enough_failures(self):
+        self.breaker.record(True, 0.1, self.breaker.allow())
+        self.fail(2)
+        self.assertEqual(self.breaker.state(), 'open')
+        self.assertIsNone(self.breaker.allow())
+
+    def test_opens_after_enough_slow_calls(self):
+        for _ in range(self.breaker.min_calls):
+            self.breaker.record(True, self.breaker.slow_call_seconds, self.breaker.allow())
+        self.assertEqual(self.breaker.state(), 'open')
+
+    def test_old_failures_leave_the_window(self):
+        self.fail(self.breaker.min_calls - 1)
+        self.clock.advance(self.breaker.window_seconds + 1)
+        self.fail()
+        self.assertEqual(self.breaker.state(), 'closed')
+
+    def test_open_circuit_fails_fast(self):
+        self.open_circuit()
+        func = mock.Mock()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(func)
+        func.assert_not_called()
+
+    def test_single_probe_while_half_open(self):
+        self.open_circuit()
+        self.clock.advance(self.breaker.cooldown)
+        self.assertEqual(self.breaker.state(), 'half_open')
+        probe = self.breaker.allow()
+        self.assertTrue(probe)
+        self.assertNotEqual(probe, 'closed')
+        self.assertIsNone(self.breaker.allow())
+
+    def test_probe_success_closes_the_circuit(self):
+        self.open_circuit()
+        self.clock.advance(self.breaker.cooldown)
+        self.breaker.record(True, 0.1, self.breaker.allow())
+        self.assertEqual(self.breaker.state(), 'closed')
+        self.assertEqual(self.breaker.snapshot()['calls'], 0)
+
+    def test_slow_probe_reopens_the_circuit(self):
+        self.open_circuit()
+        self.clock.advance(self.breaker.cooldown)
+        self.breaker.record(True, self.breaker.slow_call_seconds, self.breaker.allow())
+        self.assertEqual(self.breaker.state(), 'open')
+
+    def test_probe_failure_reopens_the_circuit(self):
+        self.open_circuit()
+        self.clock.advance(self.breaker.cooldown)
+        self.breaker.record(False, 0.1, self.breaker.allow())
+        self.assertEqual(self.breaker.state(), 'open')
+        self.assertEqual(self.breaker.snapshot()['opened_at'], self.clock.now)
+        # A new probe after the next cooldown
+        self.clock.advance(self.breaker.cooldown)
+        self.assertTrue(self.breaker.allow())
+
+    def test_call_started_before_opening_does_not_decide(self):
+        in_flight = self.breaker.allow()
+        self.open_circuit()
+        self.clock.advance(self.breaker.cooldown)
+        probe = self.breaker.allow()
+        self.breaker.record(True, 0.1, in_flight)
+        self.assertEqual(self.breaker.state(), 'half_open')
+        self.breaker.record(False, 0.1, probe)
+        self.assertEqual(self.breaker.state(), 'open')
+
+    def test_expired_probe_does_not_decide(self):
+        self.open_circuit()
+        self.clock.advance(self.breaker.cooldown)
+        stale_probe = self.breaker.allow()
+        # The probe slot expires after a cooldown and goes to the next caller
+        self.breaker.cache.delete(self.breaker.probe_key)
+        probe = self.breaker.allow()
+        self.breaker.record(True, 0.1, stale_probe)
+        self.assertEqual(self.breaker.state(), 'half_open')
+        self.breaker.record(True, 0.1, probe)
+        self.assertEqual(self.breaker.state(), 'closed')
+
+    def test_call_records_the_outcome(self):
+        self.breaker.call(lambda: 'ok')
+        with self.assertRaises(ValueError):
+            self.breaker.call(mock.Mock(side_effect=ValueError))
+        snapshot = self.breaker.snapshot()
+        self.assertEqual((snapshot['calls'], snapshot['errors']), (2, 1))
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('support.rate_limit.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Rows are rolled back after every test, so forget which were created
+        rate_limit._ensured.clear()
+        self.addCleanup(rate_limit._ensured.clear)
+        self.bucket = TokenBucket('test:model:rpm', 60)
+        self.bucket.ensure()
+
+    def tokens(self):
+        return RateLimitBucket.objects.get(key=self.bucket.key).tokens
+
+    def test_starts_full(self):
+        self.assertEqual(self.tokens(), 60)
+
+    def test_takes_until_empty(self):
+        self.assertTrue(self.bucket.take(59))
+        self.assertTrue(self.bucket.take(1))
+        self.assertFalse(self.bucket.take(1))
+
+    def test_refused_take_leaves_the_bucket_unchanged(self):
+        self.assertTrue(self.bucket.take(50))
+        self.assertFalse(self.bucket.take(20))
+        self.assertEqual(self.tokens(), 10)
+        self.assertTrue(self.bucket.take(10))
+
+    def test_refills_over_time_up_to_capacity(self):
+        self.assertTrue(self.bucket.take(60))
+        self.clock.advance(10)
+        self.assertFalse(self.bucket.take(11))
+        self.assertTrue(self.bucket.take(10))
+        self.clock.advance(3600)
+        self.assertFalse(self.bucket.take(61))
+        self.assertTrue(self.bucket.take(60))
+
+    def test_stale_reader_cannot_overspend(self):
+        # A second worker with its own instance sees the same row
+        other = TokenBucket(self.bucket.key, 60)
+        self.assertTrue(self.bucket.take(40))
+        self.assertFalse(other.take(40))
+        self.assertTrue(other.take(20))
+        self.assertFalse(self.bucket.take(1))
+
+    def test_wait_time(self):
+        self.assertEqual(self.bucket.wait_time(60), 0)
+        self.bucket.take(60)
+        self.assertAlmostEqual(self.bucket.wait_time(30), 30)
+        self.assertEqual(self.bucket.wait_time(61), float('inf'))
+
+    def test_ensure_updates_a_changed_budget(self):
+        TokenBucket(self.bucket.key, 120).ensure()
+        bucket = RateLimitBucket.objects.get(key=self.bucket.key)
+        self.assertEqual((bucket.capacity, bucket.refill_rate), (120, 2))
+
+
+class ProviderLimiterTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('support.rate_limit.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        rate_limit._ensured.clear()
+        self.addCleanup(rate_limit._ensured.clear)
+        self.limiter = ProviderLimiter('test', 'model', rpm=10, tpm=1000)
+
+    def test_token_shortage_gives_the_request_back(self):
+        self.assertFalse(self.limiter.try_acquire(1001))
+        self.assertEqual(RateLimitBucket.objects.get(key=self.limiter.requests.key).tokens, 10)
+        self.assertTrue(self.limiter.try_acquire(1000))
+
+    def test_acquire_sheds_calls_that_would_wait_too_long(self):
+        for _ in range(10):
+            self.limiter.acquire(10)
+        with self.assertRaises(RateLimited):
+            self.limiter.acquire(10, max_wait=1)
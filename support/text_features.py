@@ -0,0 +1,46 @@
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text):
+    """Lowercase words and numbers of a text, in order"""
+    return WORD_RE.findall((text or '').lower())
+
+def ticket_text(subject, message):
+    """The text features are computed from: subject and message"""
+    return f"{subject or ''}\n{message or ''}"
+
+def word_ngrams(tokens, n=2):
+    """Words plus runs of up to n consecutive words, joined with spaces"""
+    features = list(tokens)
+    for size in range(2, n + 1):
+        features.extend(' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+    return features
+
+def stable_hash(feature):
+    """32-bit hash that is the same in every process (unlike hash())"""
+    return zlib.crc32(feature.encode())
+
+def hashed_counts(features, dimensions):
+    """
+    Map features to (bucket, sign, count) triples with the hashing trick
+
+    The sign is taken from a bit the bucket index doesn't use, so two
+    features colliding in a bucket tend to cancel out rather than add up.
+
+    Args:
+        features (iterable): Feature strings, repeated as often as they occur
+        dimensions (int): Number of buckets
+
+    Returns:
+        tuple: (bucket indices, signs, counts) as NumPy arrays
+    """
+    counts = Counter(features)
+    hashes = np.fromiter((stable_hash(feature) for feature in counts), dtype=np.uint32, count=len(counts))
+    buckets = (hashes % dimensions).astype(np.int64)
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+    return buckets, signs, np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
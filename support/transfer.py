@@ -0,0 +1,155 @@
+"""
+Streaming export and import of categories, tickets and replies as JSONL or
+CSV, used by `manage.py export_tickets`/`import_tickets` and the staff
+export download.
+
+Every record is a flat dict with a "type" of category, ticket or reply, in
+that order, so a reader meets each category and ticket before the rows that
+refer to it. Users are written as usernames and categories as their export
+id (resolved by name on import). Rows are read with .iterator() and written
+one line at a time, so memory use doesn't grow with the number of tickets.
+"""
+
+import csv
+import json
+from contextlib import contextmanager
+
+from django.utils.dateparse import parse_datetime
+
+from .models import Category, Reply, Ticket
+
+FORMATS = ('jsonl', 'csv')
+
+CATEGORY_FIELDS = ['id', 'name', 'description']
+TICKET_FIELDS = [
+    'id', 'customer', 'subject', 'message', 'category', 'status', 'priority', 'auto_categorized',
+    'duplicate_of', 'created_at', 'updated_at',
+]
+REPLY_FIELDS = ['id', 'ticket', 'responder', 'message', 'is_ai_generated', 'is_modified', 'created_at']
+
+# One CSV header for all three record types; a row leaves the other types' columns empty
+CSV_COLUMNS = ['type'] + list(dict.fromkeys(CATEGORY_FIELDS + TICKET_FIELDS + REPLY_FIELDS))
+
+# How CSV cells (all strings) are turned back into values
+_INTEGER_FIELDS = {'id', 'category', 'priority', 'duplicate_of', 'ticket'}
+_BOOLEAN_FIELDS = {'auto_categorized', 'is_ai_generated', 'is_modified'}
+_DATETIME_FIELDS = {'created_at', 'updated_at'}
+
+def export_records(tickets=None, chunk_size=2000):
+    """
+    Generate the records of every category, then the tickets, then their replies
+
+    Args:
+        tickets (QuerySet): Tickets to export (default: all)
+        chunk_size (int): Rows fetched from the database at a time
+
+    Yields:
+        dict: One record with a "type" key
+    """
+    for row in Category.objects.order_by('id').values(*CATEGORY_FIELDS).iterator(chunk_size=chunk_size):
+        yield {'type': 'category', **row}
+
+    if tickets is None:
+        tickets = Ticket.objects.all()
+    ticket_rows = tickets.order_by('id').values(
+        'id', 'customer__username', 'subject', 'message', 'category_id', 'status', 'priority',
+        'auto_categorized', 'duplicate_of_id', 'created_at', 'updated_at',
+    )
+    for row in ticket_rows.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'ticket', 'id': row['id'], 'customer': row['customer__username'],
+            'subject': row['subject'], 'message': row['message'], 'category': row['category_id'],
+            'status': row['status'], 'priority': row['priority'], 'auto_categorized': row['auto_categorized'],
+            'duplicate_of': row['duplicate_of_id'],
+            'created_at': row['created_at'].isoformat(), 'updated_at': row['updated_at'].isoformat(),
+        }
+
+    reply_rows = Reply.objects.filter(ticket__in=tickets.values('id')).order_by('id').values(
+        'id', 'ticket_id', 'responder__username', 'message', 'is_ai_generated', 'is_modified', 'created_at',
+    )
+    for row in reply_rows.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'reply', 'id': row['id'], 'ticket': row['ticket_id'], 'responder': row['responder__username'],
+            'message': row['message'], 'is_ai_generated': row['is_ai_generated'],
+            'is_modified': row['is_modified'], 'created_at': row['created_at'].isoformat(),
+        }
+
+class _Echo:
+    """File-like object whose write() returns the text, for csv.writer in a generator"""
+    def write(self, value):
+        return value
+
+def encode_records(records, fmt):
+    """
+    Generate the text lines of records in JSONL or CSV (header first)
+
+    Args:
+        records (iterable): Records from export_records
+        fmt (str): 'jsonl' or 'csv'
+
+    Yields:
+        str: One line, newline included
+    """
+    if fmt == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+
+    writer = csv.DictWriter(_Echo(), fieldnames=CSV_COLUMNS, lineterminator='\n')
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+def read_records(file, fmt):
+    """
+    Generate the records of a JSONL or CSV export, one line at a time
+
+    Args:
+        file: Text file opened for reading (newline='' for CSV)
+        fmt (str): 'jsonl' or 'csv'
+
+    Yields:
+        dict: Record with values of the same types as export_records
+        (timestamps as aware datetimes)
+    """
+    if fmt == 'jsonl':
+        rows = (json.loads(line) for line in file if line.strip())
+    else:
+        rows = (_from_csv(row) for row in csv.DictReader(file))
+    for row in rows:
+        for field in _DATETIME_FIELDS & row.keys():
+            if isinstance(row[field], str):
+                row[field] = parse_datetime(row[field])
+        yield row
+
+def _from_csv(row):
+    fields = {
+        'category': CATEGORY_FIELDS, 'ticket': TICKET_FIELDS, 'reply': REPLY_FIELDS,
+    }.get(row['type'], [])
+    record = {'type': row['type']}
+    for field in fields:
+        value = row.get(field, '')
+        if field in _INTEGER_FIELDS:
+            value = int(value) if value else None
+        elif field in _BOOLEAN_FIELDS:
+            value = value == 'True'
+        elif field in _DATETIME_FIELDS:
+            value = value or None
+        record[field] = value
+    return record
+
+@contextmanager
+def keep_timestamps(model):
+    """Stop auto_now/auto_now_add from overwriting the copied timestamps"""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
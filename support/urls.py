@@ -5,9 +5,17 @@ from . import views
 urlpatterns = [
     path('', views.customer_dashboard, name='customer_dashboard'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/feed/', views.admin_ticket_feed, name='admin_ticket_feed'),
+    path('admin-dashboard/changes/', views.admin_ticket_changes, name='admin_ticket_changes'),
+    path('admin-dashboard/export/', views.admin_ticket_export, name='admin_ticket_export'),
+    path('admin-dashboard/search/', views.admin_ticket_search, name='admin_ticket_search'),
     path('ticket/<int:ticket_id>/', views.ticket_detail, name='ticket_detail'),
     path('customer-ticket/<int:ticket_id>/', views.customer_ticket_details, name='customer_ticket_details'),
     path('generate-ai-reply/<int:ticket_id>/', views.generate_ai_reply, name='generate_ai_reply'),
+    path('generate-ai-reply/<int:ticket_id>/stream/', views.generate_ai_reply_stream, name='generate_ai_reply_stream'),
+    path('ai-cache-stats/', views.ai_cache_stats, name='ai_cache_stats'),
+    path('dashboard-cache-stats/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
+    path('ai-provider-status/', views.ai_provider_status, name='ai_provider_status'),
     path('register/', views.register, name='register'),
     path('login/', views.custom_login, name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
@@ -1,11 +1,42 @@
+import hashlib
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404, QueryDict, StreamingHttpResponse
 from django.contrib.auth import login, authenticate
-from .models import Ticket, Category, Reply
+from django.middleware.csrf import get_token
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateformat import format as format_date
+from django.utils.http import urlencode
+from django.utils.text import Truncator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .models import Ticket, Category, Reply, AIDraft, ArchivedTicket
 from .forms import TicketForm
+from .classifier import triage
+from .dashboard_cache import customer_ticket_list
+from .duplicates import check_duplicate, touch_original
+from .drafts import enqueue_draft
+from .pagination import changes_cursor, changes_page, keyset_page
+from .search import search_tickets
+from .services import status_counts, submit_reply
+from .similarity import similar_resolved_tickets
+from .transfer import FORMATS, encode_records, export_records
+
+ADMIN_FEED_PAGE_SIZE = 25
+ADMIN_CHANGES_PAGE_SIZE = 100
+# Columns the admin feed renders
+ADMIN_FEED_FIELDS = [
+    'id', 'subject', 'message', 'status', 'priority', 'created_at', 'updated_at',
+    'reply_count', 'last_reply_at', 'last_responder__username',
+    'customer__username', 'category__name',
+]
+SEARCH_RESULT_LIMIT = 50
 
 @login_required
 def customer_dashboard(request):
@@ -13,24 +44,42 @@ def customer_dashboard(request):
     if request.user.is_staff:
         return redirect('admin_dashboard')
     
-    tickets = Ticket.objects.filter(customer=request.user).order_by('-created_at')
-    
     if request.method == 'POST':
         form = TicketForm(request.POST)
         if form.is_valid():
             ticket = form.save(commit=False)
             ticket.customer = request.user
+            # Category (when left blank) and priority from the local classifier
+            triage(ticket)
+            original = check_duplicate(ticket)
+            if original:
+                # Answered once, on the original ticket
+                ticket.status = 'closed'
             ticket.save()
+            if original:
+                touch_original(original.id)
+                messages.info(request, f'This looks like your earlier ticket "{original.subject}", so we merged them. '
+                                       'We will answer there.')
+                return redirect('customer_dashboard')
+            # Have an AI draft ready by the time an agent opens the ticket
+            enqueue_draft(ticket)
             messages.success(request, 'Ticket submitted successfully!')
             return redirect('customer_dashboard')
     else:
         form = TicketForm()
     
     return render(request, 'support/customer_dashboard.html', {
-        'tickets': tickets,
+        'ticket_list': customer_ticket_list(request),
         'form': form
     })
 
+def _reply_submitted_message(request, created):
+    if created:
+        messages.success(request, 'Response submitted successfully!')
+    else:
+        # The same form was submitted twice (double click or resend)
+        messages.info(request, 'This response was already submitted.')
+
 @login_required
 def submit_response(request, ticket_id):
     if not request.user.is_staff:
@@ -51,19 +100,13 @@ def submit_response(request, ticket_id):
             messages.error(request, 'Response cannot be empty. Please provide a proper message.')
             return redirect('admin_dashboard')
         
-        # Create a reply for the ticket
-        ticket.status = 'replied'
-        ticket.save()
-        
-        # Save the response
-        Reply.objects.create(
-            ticket=ticket, 
-            responder=request.user, 
-            message=response,
-            is_ai_generated=form.cleaned_data.get('is_ai_generated', False)
+        _, created = submit_reply(
+            ticket, request.user, response,
+            is_ai_generated=form.cleaned_data.get('is_ai_generated', False),
+            idempotency_key=form.cleaned_data.get('idempotency_key'),
         )
         
-        messages.success(request, 'Response submitted successfully!')
+        _reply_submitted_message(request, created)
         return redirect('admin_dashboard')
     else:
         # If form is invalid, show errors
@@ -77,7 +120,6 @@ def admin_dashboard(request):
         messages.error(request, 'Access denied. Admin privileges required.')
         return redirect('customer_dashboard')
     
-    tickets = Ticket.objects.all().order_by('-created_at')
     if request.method == 'POST':
         # Use the form to handle the response
         from .forms import ReplyForm
@@ -93,19 +135,13 @@ def admin_dashboard(request):
                 messages.error(request, 'Response cannot be empty. Please provide a proper message.')
                 return redirect('admin_dashboard')
             
-            # Create a reply for the ticket
-            ticket.status = 'replied'
-            ticket.save()
-            
-            # Save the response
-            Reply.objects.create(
-                ticket=ticket, 
-                responder=request.user, 
-                message=response,
-                is_ai_generated=form.cleaned_data.get('is_ai_generated', False)
+            _, created = submit_reply(
+                ticket, request.user, response,
+                is_ai_generated=form.cleaned_data.get('is_ai_generated', False),
+                idempotency_key=form.cleaned_data.get('idempotency_key'),
             )
             
-            messages.success(request, 'Response submitted successfully!')
+            _reply_submitted_message(request, created)
             return redirect('admin_dashboard')
         else:
             # If form is invalid, show errors
@@ -116,21 +152,276 @@ def admin_dashboard(request):
     from .forms import ReplyForm
     form = ReplyForm()
     
+    # Taken before the feed query: a change in between is sent again by the
+    # first poll rather than missed
+    poll_cursor = changes_cursor(Ticket.objects.all())
+    
+    tickets, filters = admin_ticket_queryset(request.GET)
+    query = request.GET.get('q', '').strip()
+    if query:
+        # Ranked search results replace the date-ordered feed
+        tickets, next_cursor = search_admin_tickets(tickets, query), None
+    else:
+        tickets, next_cursor = keyset_page(tickets, request.GET.get('cursor'), ADMIN_FEED_PAGE_SIZE)
+    
+    # Read from the counter table instead of counting the Ticket table
+    counts = status_counts()
+    queue_sizes = [(value, label, counts[value]) for value, label in Ticket.STATUS_CHOICES]
+    
     return render(request, 'support/admin_dashboard.html', {
         'tickets': tickets,
+        'next_cursor': next_cursor,
+        'poll_cursor': poll_cursor,
+        'poll_interval': getattr(settings, 'ADMIN_DASHBOARD_POLL_SECONDS', 10),
+        'query': query,
+        'filters': filters,
+        'export_query': urlencode(filters),
+        'status_choices': Ticket.STATUS_CHOICES,
+        'queue_sizes': queue_sizes,
+        'categories': Category.objects.only('id', 'name').order_by('name'),
         'form': form
     })
 
 @login_required
+def admin_ticket_search(request):
+    """JSON full-text search over tickets and their replies, best matches first"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    tickets, filters = admin_ticket_queryset(request.GET)
+    query = request.GET.get('q', '').strip()
+    results = search_admin_tickets(tickets, query) if query else []
+    
+    return JsonResponse({
+        'query': query,
+        'tickets': [
+            {
+                **_serialize_feed_ticket(ticket),
+                'rank': ticket.search_rank,
+                'subject_html': ticket.search_subject,
+                'snippet_html': ticket.search_snippet,
+            }
+            for ticket in results
+        ],
+    })
+
+@login_required
+def admin_ticket_feed(request):
+    """JSON page of the admin ticket feed, used to scroll in more tickets"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    tickets, filters = admin_ticket_queryset(request.GET)
+    tickets, next_cursor = keyset_page(tickets, request.GET.get('cursor'), ADMIN_FEED_PAGE_SIZE)
+    
+    return JsonResponse({
+        'tickets': [_serialize_feed_ticket(ticket) for ticket in tickets],
+        'next_cursor': next_cursor,
+    })
+
+@login_required
+def admin_ticket_changes(request):
+    """
+    JSON list of tickets created or updated since a cursor, for the
+    dashboard to patch its feed instead of reloading the page
+    
+    A new reply updates its ticket, so replies arrive as changed tickets.
+    Every changed ticket is returned, with matches_filters telling the page
+    whether it belongs in the filtered feed (a ticket may have left it).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    # Unfiltered, so tickets that moved out of the page's filters are seen too
+    tickets, _ = admin_ticket_queryset(QueryDict())
+    tickets, cursor, more = changes_page(
+        tickets, request.GET.get('cursor'), ADMIN_CHANGES_PAGE_SIZE,
+        getattr(settings, 'ADMIN_DASHBOARD_POLL_SETTLE_SECONDS', 5),
+    )
+    _, filters = admin_ticket_queryset(request.GET)
+    
+    return JsonResponse({
+        'tickets': [
+            {**_serialize_feed_ticket(ticket), 'matches_filters': _matches_feed_filters(ticket, filters)}
+            for ticket in tickets
+        ],
+        'cursor': cursor,
+        'more': more,
+        'queue_sizes': status_counts(),
+    })
+
+@login_required
+def admin_ticket_export(request):
+    """
+    Download the tickets matching the feed filters, with their replies and
+    every category, as JSONL or CSV (?format=csv)
+    
+    The file is streamed as it is read from the database, so a full export
+    neither holds the table in memory nor waits for it before starting.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in FORMATS:
+        return JsonResponse({'error': f'Unknown format: {fmt}'}, status=400)
+    tickets, _ = admin_ticket_queryset(request.GET)
+    
+    response = StreamingHttpResponse(
+        encode_records(export_records(tickets), fmt),
+        content_type='text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8',
+    )
+    filename = f"tickets-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _matches_feed_filters(ticket, filters):
+    if 'status' in filters and ticket.status != filters['status']:
+        return False
+    if filters.get('category') == 'none':
+        return ticket.category_id is None
+    if 'category' in filters:
+        return str(ticket.category_id) == filters['category']
+    return True
+
+def admin_ticket_queryset(params):
+    """
+    Build the admin feed queryset from the status/category query parameters
+    
+    Args:
+        params (QueryDict): Query parameters, normally request.GET
+    
+    Returns:
+        tuple: (QuerySet, dict of the filters that were applied)
+    """
+    # Join customer and category up front and load only the columns the
+    # feed renders, so a page costs a single query
+    tickets = Ticket.objects.select_related('customer', 'category', 'last_responder').only(*ADMIN_FEED_FIELDS)
+    filters = {}
+    
+    status = params.get('status')
+    if status in dict(Ticket.STATUS_CHOICES):
+        tickets = tickets.filter(status=status)
+        filters['status'] = status
+    
+    category = params.get('category')
+    if category == 'none':
+        tickets = tickets.filter(category__isnull=True)
+        filters['category'] = category
+    elif category and category.isdigit():
+        tickets = tickets.filter(category_id=int(category))
+        filters['category'] = category
+    
+    return tickets, filters
+
+def search_admin_tickets(tickets, query, limit=SEARCH_RESULT_LIMIT):
+    """
+    Full-text search restricted to the tickets of an admin feed queryset
+    
+    Args:
+        tickets (QuerySet): Feed queryset from admin_ticket_queryset
+        query (str): Words to search for
+        limit (int): Maximum number of results
+    
+    Returns:
+        list: Tickets, best match first, with search_rank, search_subject
+        and search_snippet (highlighted HTML) set
+    """
+    # Over-fetch so that status/category filters still leave a full page
+    hits = search_tickets(query, limit * 4)
+    by_id = tickets.in_bulk([hit['ticket_id'] for hit in hits])
+    
+    results = []
+    for hit in hits:
+        ticket = by_id.get(hit['ticket_id'])
+        if ticket is None:
+            continue
+        ticket.search_rank = hit['rank']
+        ticket.search_subject = hit['subject']
+        ticket.search_snippet = hit['snippet']
+        results.append(ticket)
+    return results[:limit]
+
+def _serialize_feed_ticket(ticket):
+    return {
+        'id': ticket.id,
+        'subject': ticket.subject,
+        'message': Truncator(ticket.message).words(15),
+        'status': ticket.status,
+        'status_display': ticket.get_status_display(),
+        'priority': ticket.priority,
+        'customer': ticket.customer.username,
+        'category': ticket.category.name if ticket.category else None,
+        'created_at': ticket.created_at.isoformat(),
+        'created_display': format_date(timezone.localtime(ticket.created_at), 'M d, Y H:i'),
+        'updated_at': ticket.updated_at.isoformat(),
+        'reply_count': ticket.reply_count,
+        'last_reply_at': ticket.last_reply_at.isoformat() if ticket.last_reply_at else None,
+        'last_responder': ticket.last_responder.username if ticket.last_responder else None,
+        'detail_url': reverse('ticket_detail', args=[ticket.id]),
+        'delete_url': reverse('delete_ticket', args=[ticket.id]),
+    }
+
+def _ticket_page_state(request, ticket_id):
+    """
+    The columns a ticket page depends on, read once per request for the
+    ETag and Last-Modified checks
+
+    Returns:
+        dict: customer_id, updated_at, reply_count and last_reply_at, or
+        None when no conditional response should be made
+    """
+    if not hasattr(request, '_ticket_page_state'):
+        state = Ticket.objects.filter(id=ticket_id).values(
+            'customer_id', 'updated_at', 'reply_count', 'last_reply_at'
+        ).first()
+        # A page carrying flash messages must be rendered, and only the
+        # ticket's customer or staff may get a 304 for it
+        if state and (messages.get_messages(request) or (
+            not request.user.is_staff and state['customer_id'] != request.user.id
+        )):
+            state = None
+        request._ticket_page_state = state
+    return request._ticket_page_state
+
+def _ticket_page_etag(request, ticket_id):
+    state = _ticket_page_state(request, ticket_id)
+    if state is None:
+        return None
+    # The page also shows who is logged in and embeds a CSRF token, which
+    # stays valid as long as the CSRF secret does (get_token creates the
+    # secret on a first visit, so that response's ETag already includes it)
+    get_token(request)
+    parts = [
+        ticket_id, state['updated_at'], state['reply_count'], state['last_reply_at'],
+        request.user.id, request.user.is_staff, request.META.get('CSRF_COOKIE', ''),
+    ]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def _ticket_page_last_modified(request, ticket_id):
+    state = _ticket_page_state(request, ticket_id)
+    if state is None:
+        return None
+    return max(filter(None, [state['updated_at'], state['last_reply_at']]))
+
+# Answer refreshes of an unchanged ticket with 304 Not Modified after one
+# single-row query; browsers revalidate every time and proxies don't store
+ticket_page_conditional = condition(etag_func=_ticket_page_etag, last_modified_func=_ticket_page_last_modified)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@ticket_page_conditional
 def ticket_detail(request, ticket_id):
-    ticket = get_object_or_404(Ticket, id=ticket_id)
+    ticket = Ticket.objects.filter(id=ticket_id).first()
+    if ticket is None:
+        return archived_ticket_detail(request, ticket_id)
     
     # Check if user has permission to view this ticket
     if not request.user.is_staff and ticket.customer != request.user:
         messages.error(request, 'Access denied.')
         return redirect('customer_dashboard')
     
-    replies = ticket.replies.all()
+    replies = ticket.replies.select_related('responder').order_by('created_at')
     
     # Handle form submission
     if request.method == 'POST':
@@ -145,19 +436,13 @@ def ticket_detail(request, ticket_id):
                 messages.error(request, 'Response cannot be empty. Please provide a proper message.')
                 return redirect('ticket_detail', ticket_id=ticket_id)
             
-            # Create a reply for the ticket
-            ticket.status = 'replied'
-            ticket.save()
-            
-            # Save the response
-            Reply.objects.create(
-                ticket=ticket, 
-                responder=request.user, 
-                message=response,
-                is_ai_generated=form.cleaned_data.get('is_ai_generated', False)
+            _, created = submit_reply(
+                ticket, request.user, response,
+                is_ai_generated=form.cleaned_data.get('is_ai_generated', False),
+                idempotency_key=form.cleaned_data.get('idempotency_key'),
             )
             
-            messages.success(request, 'Response submitted successfully!')
+            _reply_submitted_message(request, created)
             return redirect('ticket_detail', ticket_id=ticket_id)
         else:
             # If form is invalid, show errors
@@ -168,39 +453,161 @@ def ticket_detail(request, ticket_id):
         from .forms import ReplyForm
         form = ReplyForm()
     
+    # Answered tickets like this one, with the reply that resolved them;
+    # staff only, since they belong to other customers
+    similar_tickets = similar_resolved_tickets(ticket) if request.user.is_staff else []
+    duplicates = ticket.duplicates.only('id', 'created_at').order_by('created_at') if request.user.is_staff else []
+    
     return render(request, 'support/ticket_detail.html', {
         'ticket': ticket, 
         'replies': replies,
+        'similar_tickets': similar_tickets,
+        'duplicates': duplicates,
         'form': form
     })
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@ticket_page_conditional
 def customer_ticket_details(request, ticket_id):
-    ticket = get_object_or_404(Ticket, id=ticket_id)
+    ticket = Ticket.objects.filter(id=ticket_id).first()
+    if ticket is None:
+        return archived_ticket_detail(request, ticket_id)
     
     # Check if user has permission to view this ticket
     if ticket.customer != request.user:
         messages.error(request, 'Access denied.')
         return redirect('customer_dashboard')
     
-    replies = ticket.replies.all()
+    replies = ticket.replies.select_related('responder').order_by('created_at')
     return render(request, 'support/customer_ticket_details.html', {'ticket': ticket, 'replies': replies})
 
-def generate_ai_reply(request, ticket_id):
-    if not request.user.is_staff:
+def archived_ticket_detail(request, ticket_id):
+    """Read-only page of a ticket moved to the archive tables by archive_closed_tickets"""
+    ticket = get_object_or_404(ArchivedTicket.objects.select_related('customer', 'category'), id=ticket_id)
+    
+    if not request.user.is_staff and ticket.customer_id != request.user.id:
+        messages.error(request, 'Access denied.')
+        return redirect('customer_dashboard')
+    if request.method == 'POST':
+        messages.error(request, 'This ticket is archived and can no longer be replied to.')
+        return redirect('ticket_detail', ticket_id=ticket_id)
+    
+    replies = ticket.replies.select_related('responder').order_by('created_at')
+    return render(request, 'support/customer_ticket_details.html', {
+        'ticket': ticket, 'replies': replies, 'archived': True,
+    })
+
+async def generate_ai_reply(request, ticket_id):
+    # Async view: while the provider call is in flight the worker serves
+    # other requests instead of holding a thread for up to 30 s
+    # request.user is loaded lazily from the session with a sync DB query
+    is_staff = await sync_to_async(lambda: request.user.is_staff)()
+    if not is_staff:
         return JsonResponse({'error': 'Access denied'}, status=403)
     
-    ticket = get_object_or_404(Ticket, id=ticket_id)
+    try:
+        ticket = await Ticket.objects.only('id', 'subject', 'message').aget(id=ticket_id)
+    except Ticket.DoesNotExist:
+        raise Http404('No Ticket matches the given query.')
+    
+    # A repeated click asks for a fresh response instead of the cached one
+    regenerate = request.GET.get('regenerate') == '1'
+    
+    # Serve the draft pre-generated when the ticket was created
+    if not regenerate:
+        draft = await AIDraft.objects.filter(ticket=ticket, status='ready').only('message').afirst()
+        if draft:
+            return JsonResponse({'success': True, 'reply': draft.message, 'draft': True})
     
     try:
-        # Use Grok API integration instead of Gemini
-        from .grok_integration import generate_grok_response
-        ai_reply = generate_grok_response(ticket.subject, ticket.message)
-        return JsonResponse({'success': True, 'reply': ai_reply})
+        # Grok first, failing over along AI_PROVIDER_CHAIN when it is down
+        from .provider_router import aroute, get_chain
+        ai_reply, provider = await aroute(
+            ticket.subject, ticket.message,
+            chain=get_chain(prefer=request.GET.get('provider')),
+            regenerate=regenerate,
+        )
+        return JsonResponse({'success': True, 'reply': ai_reply, 'provider': provider})
     except Exception as e:
         # Return a proper error message
         return JsonResponse({'success': False, 'error': str(e)})
 
+async def generate_ai_reply_stream(request, ticket_id):
+    """
+    Stream an AI reply as Server-Sent Events while the model generates it
+    
+    Events: "token" with {"text": ...} for each chunk, then "done", or
+    "error" with {"error": ...}. Under WSGI the stream is buffered and sent
+    at the end; serve the app with ASGI to stream tokens as they arrive.
+    """
+    is_staff = await sync_to_async(lambda: request.user.is_staff)()
+    if not is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    try:
+        ticket = await Ticket.objects.only('id', 'subject', 'message').aget(id=ticket_id)
+    except Ticket.DoesNotExist:
+        raise Http404('No Ticket matches the given query.')
+    
+    from .provider_router import astream, get_chain, get_providers
+    provider = request.GET.get('provider')
+    if provider and provider not in get_providers():
+        return JsonResponse({'error': f'Unknown provider: {provider}'}, status=400)
+    regenerate = request.GET.get('regenerate') == '1'
+    
+    draft = None
+    if not regenerate:
+        draft = await AIDraft.objects.filter(ticket=ticket, status='ready').only('message').afirst()
+    
+    def event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+    
+    async def events():
+        if draft:
+            yield event('token', {'text': draft.message})
+            yield event('done', {'draft': True})
+            return
+        served_by = None
+        try:
+            chain = get_chain(prefer=provider)
+            async for served_by, text in astream(ticket.subject, ticket.message, chain, regenerate):
+                yield event('token', {'text': text})
+            yield event('done', {'provider': served_by})
+        except Exception as e:
+            print(f"AI stream error ({served_by or provider}): {e}")
+            yield event('error', {'error': 'An error occurred while generating the AI response. Please try again.'})
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+def ai_cache_stats(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    from .ai_cache import cache_stats
+    return JsonResponse(cache_stats())
+
+@login_required
+def dashboard_cache_stats(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    from .dashboard_cache import cache_stats
+    return JsonResponse(cache_stats())
+
+@login_required
+def ai_provider_status(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    from .provider_router import breaker_status, budget_status, get_chain
+    return JsonResponse({'chain': get_chain(), 'breakers': breaker_status(), 'budgets': budget_status()})
+
 def register(request):
     if request.method == 'POST':
         username = request.POST['username']